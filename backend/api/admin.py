@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Event, SwapRequest
+from .models import User, Event, EventSeries, SwapRequest
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -45,6 +45,14 @@ class EventAdmin(admin.ModelAdmin):
     
     readonly_fields = ('created_at', 'updated_at')
 
+@admin.register(EventSeries)
+class EventSeriesAdmin(admin.ModelAdmin):
+    """Admin configuration for EventSeries model"""
+    list_display = ('title', 'owner', 'start_time', 'rrule', 'ends_at', 'created_at')
+    search_fields = ('title', 'owner__email', 'owner__first_name', 'owner__last_name')
+    ordering = ('-start_time',)
+    readonly_fields = ('ends_at', 'created_at', 'updated_at')
+
 @admin.register(SwapRequest)
 class SwapRequestAdmin(admin.ModelAdmin):
     """Admin configuration for SwapRequest model"""
@@ -0,0 +1,116 @@
+"""
+Async variants of the read-heavy endpoints, used when ASYNC_READ_VIEWS is on
+and the app runs under ASGI (swap_calendar/asgi.py).
+
+ASGIHandler runs each request in its own ThreadSensitiveContext, so the
+async ORM and sync_to_async() calls below run on a sync thread belonging to
+that request, with its own database connection. Slow queries for different
+requests overlap while the event loop stays free.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed
+
+from .authentication import JWTAuthentication
+from .pagination import SwapRequestPagination
+from .serializers import SwapRequestSerializer, UserProfileSerializer
+from . import views
+
+
+def async_api_view(etag_func=None, methods=('GET',)):
+    """
+    Async counterpart of @api_view + IsAuthenticated (+ @condition when an
+    etag_func is given), answering with the same status codes and bodies
+    """
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            try:
+                result = await JWTAuthentication().aauthenticate(request)
+            except AuthenticationFailed as e:
+                return JsonResponse({'detail': str(e.detail)}, status=status.HTTP_403_FORBIDDEN)
+            if result is None:
+                return JsonResponse(
+                    {'detail': 'Authentication credentials were not provided.'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            request.user, request.auth = result
+
+            etag = None
+            if etag_func and request.method == 'GET':
+                etag = await sync_to_async(etag_func)(request)
+                not_modified = get_conditional_response(request, etag=etag)
+                if not_modified is not None:
+                    return not_modified
+
+            try:
+                response = await view(request, *args, **kwargs)
+            except APIException as e:
+                # e.g. ValidationError for a bad ?start=; same body as DRF
+                detail = e.detail if isinstance(e.detail, (list, dict)) else {'detail': e.detail}
+                return JsonResponse(detail, status=e.status_code, safe=False)
+            if etag and response.status_code == 200:
+                response.headers.setdefault('ETag', etag)
+            return response
+        # Token auth only, like the DRF views; @csrf_exempt would hide the coroutine
+        inner.csrf_exempt = True
+        return inner
+    return decorator
+
+
+async def health_check(request):
+    """Health check endpoint"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    return JsonResponse(views.health_data())
+
+
+@async_api_view(methods=('GET', 'PUT'))
+async def profile(request):
+    """User profile endpoint; updates are delegated to the sync view"""
+    if request.method == 'PUT':
+        return await sync_to_async(views.profile)(request)
+    return JsonResponse(UserProfileSerializer(request.user).data)
+
+
+@async_api_view(etag_func=views.marketplace_etag)
+async def swappable_slots(request):
+    """Get all swappable slots from other users"""
+    # Mostly served from the marketplace cache; the search, window and
+    # compatibility paths share the sync view's code on this request's thread
+    return JsonResponse(await sync_to_async(views.swappable_slots_data)(request), safe=False)
+
+
+async def list_swap_requests(request, **filters):
+    """Async counterpart of views.list_swap_requests"""
+    swap_requests, error = views.swap_requests_queryset(request, **filters)
+    if error:
+        return JsonResponse(error, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = SwapRequestPagination()
+    page = await paginator.apaginate_queryset(swap_requests, request)
+    if page is not None:
+        data = SwapRequestSerializer(page, many=True).data
+        return JsonResponse(paginator.get_paginated_data(data))
+
+    # select_related covers every field the serializer reads
+    swap_requests = [swap_request async for swap_request in swap_requests]
+    return JsonResponse(SwapRequestSerializer(swap_requests, many=True).data, safe=False)
+
+
+@async_api_view(etag_func=views.swap_requests_etag)
+async def incoming_swap_requests(request):
+    """Get incoming swap requests for the user"""
+    return await list_swap_requests(request, receiver=request.user)
+
+
+@async_api_view(etag_func=views.swap_requests_etag)
+async def outgoing_swap_requests(request):
+    """Get outgoing swap requests from the user"""
+    return await list_swap_requests(request, requester=request.user)
@@ -1,43 +1,192 @@
+import copy
+import threading
+import time
+import uuid
 import jwt
-from datetime import datetime, timedelta
+from asgiref.sync import sync_to_async
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
+from .models import RevokedToken
+
 User = get_user_model()
 
 
+class UserCache:
+    """
+    Bounded, thread-safe LRU cache of User rows keyed by id with a TTL.
+
+    Entries are dropped by the User post_save/post_delete signals (see
+    api/signals.py). Those only reach the current process, so the TTL bounds
+    how long another worker can keep serving a stale record.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, user_id):
+        """Return a private copy of the cached user, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return copy.copy(entry[0])
+            self.misses += 1
+        return None
+
+    def store(self, user):
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[user.id] = (copy.copy(user), time.monotonic() + self.ttl)
+                self._entries.move_to_end(user.id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+    def get(self, user_id):
+        """Return the user from the cache, loading it on a miss"""
+        user = self.lookup(user_id)
+        if user is None:
+            user = User.objects.get(id=user_id)
+            self.store(user)
+        return user
+
+    async def aget(self, user_id):
+        """Async get() for the ASGI code paths"""
+        user = self.lookup(user_id)
+        if user is None:
+            user = await User.objects.aget(id=user_id)
+            self.store(user)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+user_cache = UserCache(settings.JWT_USER_CACHE_SIZE, settings.JWT_USER_CACHE_TTL)
+
+
 class JWTAuthentication(BaseAuthentication):
-    """Custom JWT Authentication class"""
-    
+    """
+    Custom JWT Authentication class
+
+    The outcome is memoized on the underlying HttpRequest, so when
+    JWTAuthenticationMiddleware has already verified the token, DRF's pass
+    reuses that principal instead of decoding and loading the user again.
+    """
+    request_attr = '_jwt_auth_result'
+
     def authenticate(self, request):
+        result = self.get_memo(request)
+        if result is None:
+            try:
+                result = self.authenticate_token(request)
+            except AuthenticationFailed as e:
+                result = e
+            self.set_memo(request, result)
+        return self.unwrap(result)
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views and middleware, sharing the same memo"""
+        result = self.get_memo(request)
+        if result is None:
+            try:
+                token = self.get_token(request)
+                result = token and (await auser_for_access_token(token), token)
+            except AuthenticationFailed as e:
+                result = e
+            self.set_memo(request, result)
+        return self.unwrap(result)
+
+    def get_memo(self, request):
+        return getattr(getattr(request, '_request', request), self.request_attr, None)
+
+    def set_memo(self, request, result):
+        setattr(getattr(request, '_request', request), self.request_attr, result)
+
+    @staticmethod
+    def unwrap(result):
+        if isinstance(result, AuthenticationFailed):
+            raise result
+        return result or None
+
+    def get_token(self, request):
+        """Bearer token from the Authorization header, or False without one"""
         auth_header = request.META.get('HTTP_AUTHORIZATION')
         
         if not auth_header or not auth_header.startswith('Bearer '):
-            return None
-        
-        token = auth_header.split(' ')[1]
-        
-        try:
-            payload = jwt.decode(
-                token, 
-                settings.JWT_SECRET_KEY, 
-                algorithms=[settings.JWT_ALGORITHM]
-            )
-            user_id = payload.get('user_id')
-            if not user_id:
-                raise AuthenticationFailed('Invalid token payload')
-            
-            user = User.objects.get(id=user_id)
-            return (user, token)
+            return False
         
-        except jwt.ExpiredSignatureError:
-            raise AuthenticationFailed('Token has expired')
-        except jwt.InvalidTokenError:
-            raise AuthenticationFailed('Invalid token')
-        except User.DoesNotExist:
-            raise AuthenticationFailed('User not found')
+        return auth_header.split(' ')[1]
+
+    def authenticate_token(self, request):
+        """Verify the bearer token and load its user; returns False without one"""
+        token = self.get_token(request)
+        return token and (user_for_access_token(token), token)
+
+
+def decode_token(token, token_type):
+    """Verify a token of token_type and return its payload, raising AuthenticationFailed"""
+    try:
+        payload = jwt.decode(
+            token, 
+            settings.JWT_SECRET_KEY, 
+            algorithms=[settings.JWT_ALGORITHM]
+        )
+    except jwt.ExpiredSignatureError:
+        raise AuthenticationFailed('Token has expired')
+    except jwt.InvalidTokenError:
+        raise AuthenticationFailed('Invalid token')
+    
+    if not payload.get('user_id'):
+        raise AuthenticationFailed('Invalid token payload')
+    if payload.get('type') != token_type:
+        raise AuthenticationFailed('Invalid token type')
+    return payload
+
+
+def decode_access_token(token):
+    """Verify an access token and return its user id, raising AuthenticationFailed"""
+    return decode_token(token, 'access')['user_id']
+
+
+def user_for_access_token(token):
+    """Verify an access token and return its user, raising AuthenticationFailed"""
+    user_id = decode_access_token(token)
+    try:
+        return user_cache.get(user_id)
+    except User.DoesNotExist:
+        raise AuthenticationFailed('User not found')
+
+
+async def auser_for_access_token(token):
+    """Async user_for_access_token()"""
+    user_id = decode_access_token(token)
+    try:
+        return await user_cache.aget(user_id)
+    except User.DoesNotExist:
+        raise AuthenticationFailed('User not found')
 
 
 def generate_tokens(user):
@@ -55,6 +204,7 @@ def generate_tokens(user):
         'email': user.email,
         'exp': datetime.utcnow() + timedelta(seconds=settings.JWT_REFRESH_TOKEN_LIFETIME),
         'iat': datetime.utcnow(),
+        'jti': uuid.uuid4().hex,
         'type': 'refresh'
     }
     
@@ -74,4 +224,79 @@ def generate_tokens(user):
         'access_token': access_token,
         'refresh_token': refresh_token,
         'expires_in': settings.JWT_ACCESS_TOKEN_LIFETIME
-    }
\ No newline at end of file
+    }
+
+
+def generate_stream_ticket(user):
+    """
+    Ticket for ?ticket= on the notification stream, which EventSource
+    cannot send headers to: valid for NOTIFICATION_TICKET_LIFETIME seconds
+    and for one connection, so one that ends up in an access log is useless
+    """
+    now = datetime.utcnow()
+    return jwt.encode({
+        'user_id': user.id,
+        'exp': now + timedelta(seconds=settings.NOTIFICATION_TICKET_LIFETIME),
+        'iat': now,
+        'jti': uuid.uuid4().hex,
+        'type': 'stream'
+    }, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+
+async def auser_for_stream_ticket(ticket):
+    """Redeem a stream ticket and return its user, raising AuthenticationFailed"""
+    payload = decode_token(ticket, 'stream')
+    if not payload.get('jti') or not await sync_to_async(revoke_token)(payload):
+        raise AuthenticationFailed('Ticket has already been used')
+    try:
+        return await user_cache.aget(payload['user_id'])
+    except User.DoesNotExist:
+        raise AuthenticationFailed('User not found')
+
+
+def revoke_token(payload):
+    """
+    Mark a refresh token's or stream ticket's jti as used until it would
+    expire anyway.
+
+    Returns False if it was already revoked. The jti is the primary key of
+    RevokedToken, so two concurrent refreshes with the same token cannot
+    both insert it. Rows of expired tokens are deleted by
+    prune_revoked_tokens, which keeps the table bounded by live tokens.
+    """
+    if payload['exp'] <= time.time():
+        return False
+    _, created = RevokedToken.objects.get_or_create(
+        jti=payload['jti'],
+        defaults={'expires_at': datetime.fromtimestamp(payload['exp'], dt_timezone.utc)}
+    )
+    return created
+
+
+def refresh_tokens(refresh_token):
+    """Exchange a refresh token for a new token pair, rotating the refresh token"""
+    try:
+        payload = jwt.decode(
+            refresh_token,
+            settings.JWT_SECRET_KEY,
+            algorithms=[settings.JWT_ALGORITHM]
+        )
+    except jwt.ExpiredSignatureError:
+        raise AuthenticationFailed('Token has expired')
+    except jwt.InvalidTokenError:
+        raise AuthenticationFailed('Invalid token')
+
+    if payload.get('type') != 'refresh' or not payload.get('user_id') or not payload.get('jti'):
+        raise AuthenticationFailed('Invalid token payload')
+
+    if not revoke_token(payload):
+        raise AuthenticationFailed('Token has been revoked')
+
+    try:
+        user = user_cache.get(payload['user_id'])
+    except User.DoesNotExist:
+        raise AuthenticationFailed('User not found')
+    if not user.is_active:
+        raise AuthenticationFailed('User account is disabled')
+
+    return generate_tokens(user)
@@ -0,0 +1,405 @@
+"""
+Streaming calendar import and export in iCalendar (RFC 5545) and JSON-lines
+formats.
+
+Readers take any iterable of lines (bytes or str), such as an uploaded
+request body, and yield one (row, data) pair per event without holding the
+file in memory. data is a dict of Event fields, or a RowError for a row that
+could not be parsed. Writers turn an iterable of events into an iterable of
+text chunks for a StreamingHttpResponse.
+"""
+import itertools
+import json
+import re
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .freebusy import refresh as refresh_freebusy
+from .models import Event, EventSeries, is_overlap_violation, lock_calendars
+from .versioning import bump_on_commit
+
+ICS_CONTENT_TYPES = {'text/calendar'}
+JSONL_CONTENT_TYPES = {'application/x-ndjson', 'application/jsonl', 'application/x-jsonlines'}
+
+EXPORT_FIELDS = ('id', 'title', 'description', 'start_time', 'end_time', 'status', 'created_at', 'updated_at')
+
+DURATION_RE = re.compile(
+    r'^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+    r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$'
+)
+TEXT_ESCAPES = re.compile(r'\\([\\;,nN])')
+
+
+class RowError(ValueError):
+    """A single imported row is invalid; the rest of the import continues"""
+
+
+class ImportConflict(Exception):
+    """The calendar changed while an import was being written"""
+
+
+class ImportTooLarge(Exception):
+    """The upload has more rows than EVENT_IMPORT_MAX_ROWS"""
+
+
+def decoded(lines):
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8-sig' if line.startswith(b'\xef\xbb\xbf') else 'utf-8', errors='replace')
+        yield line.rstrip('\r\n')
+
+
+def unfold(lines):
+    """Join RFC 5545 folded lines (continuations start with a space or tab)"""
+    current = None
+    for line in decoded(lines):
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_content_line(line):
+    """'DTSTART;TZID=Europe/Paris:20250101T090000' -> ('DTSTART', {'TZID': ...}, '2025...')"""
+    head, sep, value = line.partition(':')
+    if not sep:
+        raise RowError(f'Malformed line: {line[:80]}')
+    name, *params = head.split(';')
+    return name.upper(), dict(
+        (key.upper(), val.strip('"')) for key, _, val in (param.partition('=') for param in params)
+    ), value
+
+
+def unescape_text(value):
+    return TEXT_ESCAPES.sub(lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+
+def parse_ics_datetime(value, params):
+    """DATE or DATE-TIME value (UTC, TZID or floating) as an aware datetime"""
+    try:
+        if params.get('VALUE') == 'DATE' or len(value) == 8:
+            day = datetime.strptime(value, '%Y%m%d')
+            return timezone.make_aware(day), True
+        if value.endswith('Z'):
+            return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=ZoneInfo('UTC')), False
+        local = datetime.strptime(value, '%Y%m%dT%H%M%S')
+    except ValueError:
+        raise RowError(f'Invalid date: {value}')
+
+    if 'TZID' in params:
+        try:
+            return local.replace(tzinfo=ZoneInfo(params['TZID'])), False
+        except (ZoneInfoNotFoundError, ValueError):
+            raise RowError(f"Unknown time zone: {params['TZID']}")
+    return timezone.make_aware(local), False
+
+
+def parse_ics_duration(value):
+    match = DURATION_RE.match(value)
+    if not match or value in ('P', 'PT'):
+        raise RowError(f'Invalid duration: {value}')
+    parts = {key: int(val) for key, val in match.groupdict().items() if val and key != 'sign'}
+    duration = timedelta(**parts)
+    return -duration if match.group('sign') == '-' else duration
+
+
+def parse_ics(lines):
+    """Yield (row, data) for each VEVENT; rows are numbered from 1"""
+    row = 0
+    event = None
+    nested = 0
+    for line in unfold(lines):
+        if not line:
+            continue
+        upper = line.upper()
+        if event is None:
+            if upper == 'BEGIN:VEVENT':
+                row += 1
+                event = {}
+            continue
+
+        # Components inside the event (VALARM) have properties of their own
+        if upper.startswith('BEGIN:'):
+            nested += 1
+            continue
+        if nested:
+            nested -= upper.startswith('END:')
+            continue
+
+        if upper == 'END:VEVENT':
+            try:
+                yield row, ics_event_data(event)
+            except RowError as e:
+                yield row, e
+            event = None
+            continue
+        try:
+            name, params, value = parse_content_line(line)
+        except RowError as e:
+            event.setdefault('error', e)
+            continue
+        event.setdefault(name, (params, value))
+
+
+def ics_event_data(event):
+    if 'error' in event:
+        raise event['error']
+    if 'DTSTART' not in event:
+        raise RowError('Missing DTSTART')
+
+    start, all_day = parse_ics_datetime(event['DTSTART'][1], event['DTSTART'][0])
+    if 'DTEND' in event:
+        end, _ = parse_ics_datetime(event['DTEND'][1], event['DTEND'][0])
+    elif 'DURATION' in event:
+        end = start + parse_ics_duration(event['DURATION'][1])
+    else:
+        # RFC 5545: an all-day event without an end lasts one day
+        end = start + timedelta(days=1) if all_day else start
+
+    status = event.get('STATUS', ({}, ''))[1].upper()
+    return clean_row({
+        'title': unescape_text(event.get('SUMMARY', ({}, ''))[1]).strip() or 'Untitled',
+        'description': unescape_text(event['DESCRIPTION'][1]) if 'DESCRIPTION' in event else None,
+        'start_time': start,
+        'end_time': end,
+        # Tentative or free-time entries become open slots; everything else is busy
+        'status': Event.StatusChoices.SWAPPABLE if status == 'TENTATIVE' else Event.StatusChoices.BUSY,
+        'cancelled': status == 'CANCELLED',
+    })
+
+
+def parse_jsonl(lines):
+    """Yield (row, data) for each non-blank line; rows are line numbers"""
+    for row, line in enumerate(decoded(lines), start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict):
+                raise RowError('Each line must be a JSON object')
+            yield row, clean_row({
+                'title': str(item.get('title') or '').strip(),
+                'description': item.get('description'),
+                'start_time': parse_json_datetime(item.get('start_time')),
+                'end_time': parse_json_datetime(item.get('end_time')),
+                'status': item.get('status') or Event.StatusChoices.BUSY,
+            })
+        except ValueError as e:
+            # json.JSONDecodeError and RowError are both ValueErrors
+            yield row, e if isinstance(e, RowError) else RowError(f"Invalid JSON: {getattr(e, 'msg', e)}")
+
+
+def parse_json_datetime(value):
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise RowError(f'Invalid datetime: {value!r}')
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+def clean_row(data):
+    if not data['title']:
+        raise RowError('Title is required')
+    if len(data['title']) > 200:
+        raise RowError('Title is longer than 200 characters')
+    if data['status'] not in (Event.StatusChoices.BUSY, Event.StatusChoices.SWAPPABLE):
+        raise RowError(f"Invalid status: {data['status']}")
+    if data['end_time'] <= data['start_time']:
+        raise RowError('End time must be after start time')
+    return data
+
+
+def import_events(user, rows, chunk_size=None):
+    """
+    Insert parsed rows for user and return the per-row report.
+
+    Overlaps, within the batch and with the user's existing events and
+    recurring-event occurrences, are found in one sweep over both sets sorted
+    by start time; the earlier-starting event wins. Valid rows are then
+    inserted with bulk_create in chunks, in the same transaction, which holds
+    the user's calendar lock throughout.
+    """
+    chunk_size = chunk_size or settings.EVENT_IMPORT_CHUNK_SIZE
+    report = {}
+    candidates = []
+    for row, data in rows:
+        if len(report) + len(candidates) >= settings.EVENT_IMPORT_MAX_ROWS:
+            raise ImportTooLarge(f'At most {settings.EVENT_IMPORT_MAX_ROWS} events can be imported at once')
+        if isinstance(data, RowError):
+            report[row] = {'row': row, 'status': 'error', 'error': str(data)}
+        elif data.pop('cancelled', False):
+            report[row] = {'row': row, 'status': 'skipped', 'error': 'Event is cancelled'}
+        else:
+            candidates.append((data['start_time'], data['end_time'], row, data))
+
+    candidates.sort(key=lambda candidate: candidate[:3])
+    created = []
+    if candidates:
+        try:
+            with transaction.atomic():
+                lock_calendars([user.id])
+                accepted = sweep_overlaps(candidates, calendar_between(
+                    user, candidates[0][0], max(end for _, end, _, _ in candidates)
+                ), report)
+                for i in range(0, len(accepted), chunk_size):
+                    created += Event.objects.bulk_create([
+                        Event(owner=user, **data) for _, data in accepted[i:i + chunk_size]
+                    ])
+                # bulk_create bypasses the signals that keep caches and
+                # free/busy bitmaps fresh
+                if created:
+                    refresh_freebusy([(user.id, event.start_time, event.end_time) for event in created])
+                    bump_on_commit('marketplace', f'events:{user.id}')
+        except IntegrityError as e:
+            if is_overlap_violation(e):
+                raise ImportConflict('Your calendar changed during the import; nothing was imported')
+            raise
+        for (row, _), event in zip(accepted, created):
+            report[row] = {'row': row, 'status': 'created', 'id': event.id}
+
+    rows = [report[row] for row in sorted(report)]
+    return {
+        'created': len(created),
+        'failed': len(rows) - len(created),
+        'rows': rows,
+    }
+
+
+def calendar_between(user, start, end):
+    """
+    (start, end, description) of user's events and recurring-event
+    occurrences overlapping [start, end), sorted by start
+    """
+    existing = [
+        (event_start, event_end, f'existing event {event_id}')
+        for event_start, event_end, event_id in Event.objects.filter(
+            owner=user, start_time__lt=end, end_time__gt=start
+        ).order_by('start_time').values_list('start_time', 'end_time', 'id')
+    ]
+    series_list = list(EventSeries.objects.filter(owner=user).overlapping(start, end))
+    if series_list:
+        overridden = EventSeries.objects.filter(id__in=[series.id for series in series_list]).overridden()
+        existing += [
+            (*occurrence, f'recurring event {series.id}')
+            for series in series_list
+            for occurrence in series.occurrences(start, end, overridden.get(series.id, ()))
+        ]
+        existing.sort(key=lambda entry: entry[0])
+    return existing
+
+
+def sweep_overlaps(candidates, existing, report):
+    """
+    Accept candidates (sorted by start) that overlap neither an earlier
+    accepted candidate nor an existing entry (start, end, description),
+    sorted by start; record the rest in report. Returns [(row, data)] in
+    start order.
+    """
+    accepted = []
+    # Latest end among everything kept so far that starts at or before the
+    # current candidate, and what it belongs to
+    reach, holder = None, None
+    position = 0
+    for start, end, row, data in candidates:
+        # Existing events starting before this candidate join the sweep
+        while position < len(existing) and existing[position][0] <= start:
+            existing_start, existing_end, description = existing[position]
+            if reach is None or existing_end > reach:
+                reach, holder = existing_end, description
+            position += 1
+
+        if reach is not None and start < reach:
+            conflict = holder
+        elif position < len(existing) and existing[position][0] < end:
+            conflict = existing[position][2]
+        else:
+            conflict = None
+
+        if conflict:
+            report[row] = {'row': row, 'status': 'error', 'error': f'Overlaps {conflict}'}
+            continue
+        accepted.append((row, data))
+        if reach is None or end > reach:
+            reach, holder = end, f'row {row}'
+    return accepted
+
+
+def escape_text(value):
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces, continuations starting with a space"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    pieces = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def format_ics_datetime(value):
+    return value.astimezone(ZoneInfo('UTC')).strftime('%Y%m%dT%H%M%SZ')
+
+
+def ics_event(event):
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:event-{event['id']}@slotswapper",
+        f"DTSTAMP:{format_ics_datetime(event['updated_at'])}",
+        f"DTSTART:{format_ics_datetime(event['start_time'])}",
+        f"DTEND:{format_ics_datetime(event['end_time'])}",
+        f"SUMMARY:{escape_text(event['title'])}",
+    ]
+    if event['description']:
+        lines.append(f"DESCRIPTION:{escape_text(event['description'])}")
+    # The inverse of the import mapping: open slots are tentative
+    lines.append('STATUS:TENTATIVE' if event['status'] == Event.StatusChoices.SWAPPABLE else 'STATUS:CONFIRMED')
+    lines.append(f"X-SLOTSWAPPER-STATUS:{event['status']}")
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+
+def ndjson_event(event):
+    return json.dumps({
+        field: value.isoformat() if isinstance(value, datetime) else value
+        for field, value in event.items()
+    }) + '\n'
+
+
+def write_ics(events, batch_size=500):
+    """iCalendar document for events (dicts of EXPORT_FIELDS), in text chunks"""
+    yield 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//SlotSwapper//Calendar Export//EN\r\nCALSCALE:GREGORIAN\r\n'
+    yield from batched_text(map(ics_event, events), batch_size)
+    yield 'END:VCALENDAR\r\n'
+
+
+def write_ndjson(events, batch_size=500):
+    """One JSON object per event (dicts of EXPORT_FIELDS), in text chunks"""
+    yield from batched_text(map(ndjson_event, events), batch_size)
+
+
+def batched_text(pieces, batch_size):
+    # One chunk per batch keeps per-chunk overhead (and ASGI thread hops) low
+    pieces = iter(pieces)
+    while batch := ''.join(itertools.islice(pieces, batch_size)):
+        yield batch
@@ -0,0 +1,208 @@
+"""
+Per-user free/busy bitmaps.
+
+A user's busy time is kept as one FreeBusyDay row per UTC day that has
+events: bit i of the row is set when any of their events covers part of the
+i-th BUCKET of that day. When an event is written, only the rows of the days
+it left and the days it now covers are recomputed (refresh()).
+
+Availability over a window then comes down to a few operations on Python
+ints holding one bit per bucket of the whole window, which run a machine word
+at a time: OR over the users for "someone is busy", NOT for common free time.
+Recurring events are not stored, since a series may never end; their
+occurrences inside the window are ORed in when the bitmaps are read.
+
+Bitmaps are conservative: a bucket an event only partly covers counts as
+busy. Exact overlap checks stay with the exclusion constraint.
+"""
+import re
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import models
+
+from .models import Event, EventSeries, FreeBusyDay, lock_calendars
+
+BUCKET = timedelta(minutes=15)
+DAY = timedelta(days=1)
+BUCKETS_PER_DAY = DAY // BUCKET
+BYTES_PER_DAY = (BUCKETS_PER_DAY + 7) // 8
+
+
+def day_start(day):
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def days_between(start, end):
+    """The UTC days that [start, end) touches"""
+    day = start.astimezone(dt_timezone.utc).date()
+    while day_start(day) < end:
+        yield day
+        day += DAY
+
+
+def floor_bucket(moment):
+    origin = day_start(moment.astimezone(dt_timezone.utc).date())
+    return origin + (moment - origin) // BUCKET * BUCKET
+
+
+def ceil_bucket(moment):
+    floor = floor_bucket(moment)
+    return floor if floor == moment else floor + BUCKET
+
+
+def span_bits(start, end, origin):
+    """Bits of the buckets, counted from origin, that [start, end) touches"""
+    first = max(0, (start - origin) // BUCKET)
+    last = -((origin - end) // BUCKET)
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+def day_bits(start, end, day):
+    """Bits of the buckets of day that [start, end) touches"""
+    origin = day_start(day)
+    return span_bits(max(start, origin), min(end, origin + DAY), origin)
+
+
+def to_bytes(bits):
+    return bits.to_bytes(BYTES_PER_DAY, 'little')
+
+
+def from_bytes(data):
+    return int.from_bytes(data, 'little')
+
+
+def day_runs(days):
+    """Merge sorted days into [(first, last)] runs of consecutive days"""
+    runs = []
+    for day in days:
+        if runs and runs[-1][1] + DAY == day:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def refresh(spans):
+    """
+    Recompute the bitmaps of every day touched by the (owner id, start, end)
+    spans: where an event was and where it is now. Takes the owners' calendar
+    locks, so concurrent writers cannot store bitmaps computed from stale
+    snapshots.
+    """
+    days = defaultdict(set)
+    for owner_id, start, end in spans:
+        days[owner_id].update(days_between(start, end))
+    if not days:
+        return
+    lock_calendars(days)
+
+    # One range condition per run of consecutive days of each owner
+    covering = models.Q()
+    for owner_id, owner_days in days.items():
+        for first, last in day_runs(sorted(owner_days)):
+            covering |= models.Q(owner=owner_id, start_time__lt=day_start(last + DAY), end_time__gt=day_start(first))
+
+    bitmaps = defaultdict(int)
+    for owner_id, start, end in Event.objects.filter(covering).values_list('owner_id', 'start_time', 'end_time'):
+        for day in days_between(start, end):
+            if day in days[owner_id]:
+                bitmaps[owner_id, day] |= day_bits(start, end, day)
+
+    FreeBusyDay.objects.bulk_create(
+        [FreeBusyDay(owner_id=owner_id, day=day, bits=to_bytes(bits)) for (owner_id, day), bits in bitmaps.items()],
+        update_conflicts=True, unique_fields=['owner', 'day'], update_fields=['bits']
+    )
+    emptied = models.Q()
+    for owner_id, owner_days in days.items():
+        cleared = [day for day in owner_days if (owner_id, day) not in bitmaps]
+        if cleared:
+            emptied |= models.Q(owner=owner_id, day__in=cleared)
+    if emptied:
+        FreeBusyDay.objects.filter(emptied).delete()
+
+
+def rebuild(batch_size=5000):
+    """Recompute every bitmap from scratch, e.g. after rows were written with raw SQL"""
+    FreeBusyDay.objects.all().delete()
+    bitmaps = defaultdict(int)
+    events = Event.objects.order_by('owner_id', 'start_time').values_list('owner_id', 'start_time', 'end_time')
+    written = 0
+    for owner_id, start, end in events.iterator(chunk_size=batch_size):
+        for day in days_between(start, end):
+            bitmaps[owner_id, day] |= day_bits(start, end, day)
+        if len(bitmaps) >= batch_size:
+            # Later events are the same owner's from this day on, or someone else's
+            written += flush(bitmaps, keep=(owner_id, start.astimezone(dt_timezone.utc).date()))
+    return written + flush(bitmaps)
+
+
+def flush(bitmaps, keep=None):
+    """Insert and drop the bitmaps that are complete: all but keep's owner's from keep's day on"""
+    done = [key for key in bitmaps if keep is None or key[0] != keep[0] or key[1] < keep[1]]
+    FreeBusyDay.objects.bulk_create([
+        FreeBusyDay(owner_id=owner_id, day=day, bits=to_bytes(bitmaps.pop((owner_id, day))))
+        for owner_id, day in done
+    ])
+    return len(done)
+
+
+def busy_bitmaps(user_ids, start, end):
+    """
+    {user id: bits} over the bucket-aligned window [start, end): bit i is set
+    when the user is busy during the i-th bucket from start
+    """
+    origin = day_start(start.astimezone(dt_timezone.utc).date())
+    bitmaps = dict.fromkeys(user_ids, 0)
+    rows = FreeBusyDay.objects.filter(
+        owner__in=user_ids, day__gte=origin.date(), day__lt=ceil_bucket(end).date() + DAY
+    ).values_list('owner_id', 'day', 'bits')
+    for owner_id, day, bits in rows:
+        bitmaps[owner_id] |= from_bytes(bits) << ((day - origin.date()).days * BUCKETS_PER_DAY)
+
+    series_list = list(EventSeries.objects.filter(owner__in=user_ids).overlapping(start, end))
+    if series_list:
+        overridden = EventSeries.objects.filter(id__in=[series.id for series in series_list]).overridden()
+        for series in series_list:
+            for occurrence_start, occurrence_end in series.occurrences(start, end, overridden.get(series.id, ())):
+                bitmaps[series.owner_id] |= span_bits(occurrence_start, occurrence_end, origin)
+
+    shift = (start - origin) // BUCKET
+    window = (1 << ((end - start) // BUCKET)) - 1
+    return {user_id: (bits >> shift) & window for user_id, bits in bitmaps.items()}
+
+
+def runs(bits, length, min_length=1):
+    """[(first, last)] bucket ranges of the runs of at least min_length set bits"""
+    # Most significant bit first, so reverse to put bucket 0 at index 0
+    text = format(bits, 'b').zfill(length)[::-1]
+    return [match.span() for match in re.finditer('1{%d,}' % min_length, text)]
+
+
+def availability(user_ids, start, end, min_free=BUCKET):
+    """
+    Busy periods of each user and the periods of at least min_free when all
+    of them are free, over [start, end) widened to whole buckets
+    """
+    start, end = floor_bucket(start), ceil_bucket(end)
+    length = (end - start) // BUCKET
+    bitmaps = busy_bitmaps(user_ids, start, end)
+
+    anyone_busy = 0
+    for bits in bitmaps.values():
+        anyone_busy |= bits
+    all_free = ~anyone_busy & ((1 << length) - 1)
+
+    def periods(bits, min_length=1):
+        return [
+            {'start': start + first * BUCKET, 'end': start + last * BUCKET}
+            for first, last in runs(bits, length, min_length)
+        ]
+
+    return {
+        'start': start,
+        'end': end,
+        'bucket_minutes': BUCKET // timedelta(minutes=1),
+        'busy': {user_id: periods(bits) for user_id, bits in bitmaps.items()},
+        'free': periods(all_free, max(1, -(-min_free // BUCKET))),
+    }
@@ -0,0 +1,120 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """
+    scrypt with its cost taken from settings.
+
+    Stored hashes made with a different work factor (or another algorithm)
+    are upgraded on the next successful login, see verify_password().
+    """
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+
+class PasswordHashPoolBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many concurrent logins, please retry shortly.'
+    default_code = 'password_hash_pool_busy'
+
+
+class PasswordHashPool:
+    """
+    Bounded thread pool for password hashing.
+
+    At most max_workers hashes run at once and at most max_queue more may wait;
+    anything beyond that is rejected with PasswordHashPoolBusy instead of
+    tying up the worker. Only pure hashing runs in the pool, never ORM calls,
+    since database connections are per-thread.
+    """
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHashPoolBusy()
+
+        with self._lock:
+            self.pending += 1
+        try:
+            return self._executor.submit(self._call, func, *args).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+
+    def _call(self, func, *args):
+        with self._lock:
+            self.active += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': self.active,
+                'queued': self.pending - self.active,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+            }
+
+
+password_hash_pool = PasswordHashPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE)
+
+
+def hash_password(raw_password):
+    """make_password() run in the hashing pool"""
+    return password_hash_pool.run(hashers.make_password, raw_password)
+
+
+def verify_password(user, raw_password):
+    """
+    Check a password in the hashing pool and upgrade the stored hash in place
+    when it was made with an outdated algorithm or cost.
+    """
+    outdated = []
+    valid = password_hash_pool.run(
+        hashers.check_password, raw_password, user.password, outdated.append
+    )
+    if valid and outdated:
+        user.password = hash_password(raw_password)
+        user.save(update_fields=['password'])
+    return valid
+
+
+def authenticate_password(email, raw_password):
+    """Email/password login with hashing bounded by the hashing pool"""
+    User = get_user_model()
+    try:
+        user = User._default_manager.get_by_natural_key(email)
+    except User.DoesNotExist:
+        # Hash anyway so unknown emails take as long as wrong passwords
+        hash_password(raw_password)
+        return None
+    return user if verify_password(user, raw_password) else None
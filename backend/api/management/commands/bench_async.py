@@ -0,0 +1,211 @@
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.utils import timezone
+
+from api.authentication import generate_tokens
+from api.models import Event
+
+User = get_user_model()
+
+ENDPOINTS = {
+    'swappable_slots': '/api/swappable-slots/?page_size=50',
+    'incoming_swap_requests': '/api/swap-requests/incoming/',
+}
+
+BENCH_EMAIL = 'bench-async@example.com'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync views behind WSGIHandler with the async views behind '
+        'ASGIHandler under many concurrent clients, with an artificial delay '
+        'added to every database round-trip'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument(
+            '--threads', type=int, default=2 * (os.cpu_count() or 1) + 1,
+            help='Threads serving the WSGI handler, as in a threaded worker'
+        )
+        parser.add_argument('--latency', type=float, default=50, help='Added per query, in ms')
+        parser.add_argument('--endpoint', choices=ENDPOINTS, default='swappable_slots')
+        parser.add_argument('--variant', choices=('sync', 'async'), help='Run one side in this process')
+
+    def handle(self, *args, **options):
+        if options['variant']:
+            return self.run_variant(options)
+
+        self.seed()
+        connections.close_all()
+        self.stdout.write(
+            f"{options['requests']} requests to {ENDPOINTS[options['endpoint']]} from "
+            f"{options['clients']} clients, +{options['latency']:.0f} ms per query"
+        )
+        # urls.py picks the view module at import time, so each side gets its own process
+        for variant, async_views in (('sync', '0'), ('async', '1')):
+            command = [
+                sys.executable, '-m', 'django', 'bench_async', '--variant', variant,
+                '--clients', str(options['clients']), '--requests', str(options['requests']),
+                '--threads', str(options['threads']), '--latency', str(options['latency']),
+                '--endpoint', options['endpoint'],
+            ]
+            env = {**os.environ, 'ASYNC_READ_VIEWS': async_views}
+            env.setdefault('DJANGO_SETTINGS_MODULE', 'swap_calendar.settings')
+            result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+            if result.returncode:
+                raise CommandError(f'{variant} run failed:\n{result.stderr}')
+            self.stdout.write(result.stdout, ending='')
+
+    def seed(self):
+        User.objects.get_or_create(
+            email=BENCH_EMAIL,
+            defaults={'username': 'bench-async', 'first_name': 'Bench', 'last_name': 'Async'}
+        )
+        owner, created = User.objects.get_or_create(
+            email='bench-async-owner@example.com',
+            defaults={'username': 'bench-async-owner', 'first_name': 'Bench', 'last_name': 'Owner'}
+        )
+        if created:
+            start = timezone.now() + timedelta(days=1)
+            Event.objects.bulk_create([
+                Event(
+                    title=f'Bench slot {i}', owner=owner,
+                    start_time=start + timedelta(hours=i),
+                    end_time=start + timedelta(hours=i, minutes=30),
+                    status=Event.StatusChoices.SWAPPABLE
+                )
+                for i in range(200)
+            ])
+
+    def run_variant(self, options):
+        token = generate_tokens(User.objects.get(email=BENCH_EMAIL))['access_token']
+        connections.close_all()
+        self.add_latency(options['latency'] / 1000)
+
+        path = ENDPOINTS[options['endpoint']]
+        counts = self.split(options['requests'], options['clients'])
+        if options['variant'] == 'sync':
+            latencies, elapsed = self.run_wsgi(path, token, counts, options['threads'])
+            label = f"sync ({options['threads']} threads)"
+        else:
+            latencies, elapsed = asyncio.run(self.run_asgi(path, token, counts))
+            label = 'async (ASGI)'
+        self.report(label, latencies, elapsed)
+
+    def add_latency(self, seconds):
+        """Stand in for a remote database by delaying every query on every connection"""
+        def delay(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        def install(connection, **kwargs):
+            connection.execute_wrappers.append(delay)
+
+        connection_created.connect(install, weak=False)
+
+    def run_wsgi(self, path, token, counts, threads):
+        """Clients queue for the handler threads, as they would for a threaded WSGI worker"""
+        handler = WSGIHandler()
+        factory = RequestFactory()
+
+        def serve():
+            environ = factory.get(path, HTTP_AUTHORIZATION=f'Bearer {token}').environ
+            statuses = []
+            response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+            return statuses[0]
+
+        def client(count):
+            results = []
+            for _ in range(count):
+                started = time.perf_counter()
+                self.check_status(workers.submit(serve).result())
+                results.append(time.perf_counter() - started)
+            return results
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as workers, \
+                ThreadPoolExecutor(max_workers=len(counts)) as clients:
+            batches = list(clients.map(client, counts))
+        elapsed = time.perf_counter() - started
+        return [latency for batch in batches for latency in batch], elapsed
+
+    async def run_asgi(self, path, token, counts):
+        handler = ASGIHandler()
+        route, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': route, 'raw_path': route.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+
+        async def serve():
+            received = False
+            statuses = []
+
+            async def receive():
+                nonlocal received
+                if not received:
+                    received = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The client stays connected; the handler cancels this wait when done
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            await handler(dict(scope), receive, send)
+            return statuses[0]
+
+        async def client(count):
+            results = []
+            for _ in range(count):
+                started = time.perf_counter()
+                self.check_status(await serve())
+                results.append(time.perf_counter() - started)
+            return results
+
+        started = time.perf_counter()
+        batches = await asyncio.gather(*(client(count) for count in counts))
+        elapsed = time.perf_counter() - started
+        return [latency for batch in batches for latency in batch], elapsed
+
+    @staticmethod
+    def check_status(status):
+        if str(status).split()[0] != '200':
+            raise CommandError(f'Expected 200, got {status}')
+
+    @staticmethod
+    def split(total, parts):
+        return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+    def report(self, label, latencies, elapsed):
+        latencies.sort()
+        p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000
+        self.stdout.write(
+            f'{label:16} {len(latencies) / elapsed:8.1f} req/s   '
+            f'median {statistics.median(latencies) * 1000:8.1f} ms   p99 {p99:8.1f} ms'
+        )
@@ -0,0 +1,50 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from api.authentication import JWTAuthentication, generate_tokens, user_cache
+from api.middleware import JWTAuthenticationMiddleware
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-request JWT authentication cost (middleware + DRF pass)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        user, _ = User.objects.get_or_create(
+            email='bench-auth@example.com',
+            defaults={'username': 'bench-auth', 'first_name': 'Bench', 'last_name': 'Auth'}
+        )
+        token = generate_tokens(user)['access_token']
+        factory = RequestFactory()
+        middleware = JWTAuthenticationMiddleware(lambda request: None)
+        authenticator = JWTAuthentication()
+
+        def run(single_pass):
+            user_cache.clear()
+            started = time.perf_counter()
+            for _ in range(count):
+                request = factory.get('/api/events/', HTTP_AUTHORIZATION=f'Bearer {token}')
+                middleware.process_request(request)
+                if not single_pass:
+                    # What DRF did before the middleware result was reused
+                    delattr(request, JWTAuthentication.request_attr)
+                authenticator.authenticate(request)
+            return (time.perf_counter() - started) / count * 1e6
+
+        double = run(single_pass=False)
+        single = run(single_pass=True)
+
+        self.stdout.write(f'Requests:           {count}')
+        self.stdout.write(f'Two-pass auth:      {double:.1f} us/request')
+        self.stdout.write(f'Single-pass auth:   {single:.1f} us/request')
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved {double - single:.1f} us/request ({(1 - single / double) * 100:.0f}%)'
+        ))
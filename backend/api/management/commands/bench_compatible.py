@@ -0,0 +1,120 @@
+import random
+import time
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.marketplace import exclude_clashing, marketplace_slots_for, without_clashes
+from api.models import Event
+from api.versioning import bump_versions
+
+User = get_user_model()
+
+HOUR = 3600
+
+
+def calendar(count, rng, start=0, spacing=3 * HOUR):
+    """count non-overlapping one-hour (start, end) timestamps, sorted, with gaps of about spacing"""
+    intervals = []
+    position = start
+    for _ in range(count):
+        position += rng.uniform(HOUR, 2 * spacing - HOUR)
+        intervals.append((position, position + HOUR))
+        position += HOUR
+    return intervals
+
+
+def per_slot_bisect(slots, blocking):
+    """Baseline: an independent lookup per slot, like an indexed query per slot would do"""
+    starts = [interval[0] for interval in blocking]
+    kept = []
+    for slot in slots:
+        i = bisect_right(starts, slot[0]) - 1
+        clash = (i >= 0 and blocking[i][1] > slot[0]) or (i + 1 < len(blocking) and blocking[i + 1][0] < slot[1])
+        if not clash:
+            kept.append(slot)
+    return kept
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the compatible-slots marketplace filter: the in-memory sweep, '
+        'and with --database the cached feed and the SQL anti-join on seeded rows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=10000, help="Caller's BUSY events")
+        parser.add_argument('--slots', type=int, default=100000, help='Marketplace slots')
+        parser.add_argument('--owners', type=int, default=100, help='Users offering the slots')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--database', action='store_true', help='Also seed rows (rolled back) and time the endpoints')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        blocking = calendar(options['events'], rng)
+        # Spread each owner's slots over the same span as the caller's events
+        per_owner = options['slots'] // options['owners']
+        spacing = blocking[-1][1] / per_owner - HOUR
+        slots = sorted(
+            slot for _ in range(options['owners'])
+            for slot in calendar(per_owner, rng, spacing=spacing)
+        )
+        self.stdout.write(f"{len(blocking)} caller events x {len(slots)} marketplace slots")
+
+        kept = self.time('sweep', lambda: without_clashes(slots, blocking, span=lambda slot: slot), options)
+        baseline = self.time('per-slot bisect', lambda: per_slot_bisect(slots, blocking), options)
+        if kept != baseline:
+            raise CommandError('The sweep and the baseline disagree')
+        self.stdout.write(f'{len(kept)} compatible slots ({len(kept) / len(slots):.0%})')
+
+        if options['database']:
+            with transaction.atomic():
+                self.bench_database(blocking, slots, options)
+                transaction.set_rollback(True)
+
+    def time(self, label, func, options):
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(f'{label:28} best {min(timings) * 1000:9.1f} ms')
+        return result
+
+    def bench_database(self, blocking, slots, options):
+        origin = timezone.now() + timedelta(days=1)
+        at = lambda timestamp: origin + timedelta(seconds=timestamp)
+        users = User.objects.bulk_create([
+            User(email=f'bench-compatible{i}@example.com', username=f'bench-compatible{i}',
+                 first_name='Bench', last_name=str(i), password='!')
+            for i in range(options['owners'] + 1)
+        ])
+        caller, owners = users[0], users[1:]
+        Event.objects.bulk_create([
+            Event(title='Busy', owner=caller, start_time=at(start), end_time=at(end))
+            for start, end in blocking
+        ], batch_size=5000)
+        # Round-robin over owners keeps each owner's slots apart
+        Event.objects.bulk_create([
+            Event(title='Slot', owner=owners[i % len(owners)], start_time=at(start), end_time=at(end),
+                  status=Event.StatusChoices.SWAPPABLE)
+            for i, (start, end) in enumerate(slots)
+        ], batch_size=5000)
+        self.stdout.write('seeded; timings below include queries')
+
+        # bulk_create skips the signals; build the cached feed from the seeded rows once
+        bump_versions('marketplace')
+        marketplace_slots_for(caller)
+        self.time('cached feed, all', lambda: marketplace_slots_for(caller), options)
+        self.time('cached feed, compatible', lambda: marketplace_slots_for(caller, compatible=True), options)
+
+        feed = Event.objects.filter(
+            status=Event.StatusChoices.SWAPPABLE, end_time__gt=timezone.now()
+        ).exclude(owner=caller).order_by('start_time', 'id')
+        self.time('anti-join, first page', lambda: list(exclude_clashing(feed, caller)[:51]), options)
+        self.time('anti-join, count', lambda: exclude_clashing(feed, caller).count(), options)
@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import check_password
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from api.hashers import PasswordHashPool
+
+HASHERS = {
+    'scrypt': 'api.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark password verification throughput (logins/sec per worker) for each hasher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--clients', type=int, default=16, help='Concurrent login attempts')
+        parser.add_argument('--workers', type=int, default=2, help='Hashing pool size')
+        parser.add_argument('--queue', type=int, default=64, help='Hashing pool queue depth')
+
+    def handle(self, *args, **options):
+        logins = options['logins']
+        self.stdout.write(
+            f"{logins} logins, {options['clients']} concurrent clients, "
+            f"pool of {options['workers']} (+{options['queue']} queued)"
+        )
+
+        for name, path in HASHERS.items():
+            hasher = import_string(path)()
+            encoded = hasher.encode('SecurePassword123!', hasher.salt())
+            pool = PasswordHashPool(options['workers'], options['queue'])
+            peak_queue = 0
+
+            def login(_):
+                nonlocal peak_queue
+                peak_queue = max(peak_queue, pool.stats()['queued'])
+                started = time.perf_counter()
+                pool.run(check_password, 'SecurePassword123!', encoded)
+                return time.perf_counter() - started
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['clients']) as clients:
+                latencies = sorted(clients.map(login, range(logins)))
+            elapsed = time.perf_counter() - started
+
+            p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+            self.stdout.write(
+                f'{name:8} {logins / elapsed:8.1f} logins/sec   '
+                f'p99 {p99:7.1f} ms   peak queue {peak_queue}'
+            )
+
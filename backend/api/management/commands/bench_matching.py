@@ -0,0 +1,88 @@
+import itertools
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.matching import find_swap_cycles
+
+
+def uniform_graph(nodes, degree, rng):
+    """Every node accepts `degree` nodes chosen uniformly at random"""
+    return {node: rng.sample(range(nodes), degree) for node in range(nodes)}
+
+
+def popular_graph(nodes, degree, rng):
+    """Demand concentrates on a few slots (Zipf-like), giving long pointer chains"""
+    population = list(range(nodes))
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in population))
+    return {
+        node: list(dict.fromkeys(rng.choices(population, cum_weights=cum_weights, k=degree)))
+        for node in range(nodes)
+    }
+
+
+def planted_graph(nodes, degree, rng, length=3):
+    """Hidden cycles of the given length, each node's true choice buried among random ones"""
+    order = rng.sample(range(nodes), nodes)
+    graph = {}
+    for start in range(0, nodes - length + 1, length):
+        cycle = order[start:start + length]
+        for i, node in enumerate(cycle):
+            choices = rng.sample(range(nodes), degree - 1)
+            choices.insert(rng.randrange(degree), cycle[(i + 1) % length])
+            graph[node] = choices
+    return graph
+
+
+GRAPHS = {
+    'uniform': uniform_graph,
+    'popular': popular_graph,
+    'planted': planted_graph,
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the swap cycle matcher on synthetic preference graphs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nodes', type=int, default=100000)
+        parser.add_argument('--degree', type=int, default=5, help='Preferences per slot')
+        parser.add_argument('--graph', choices=GRAPHS, action='append', help='Default: all')
+        parser.add_argument('--max-length', type=int, default=settings.SWAP_MATCHING_MAX_CYCLE, help='0 for unbounded')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        for name in options['graph'] or GRAPHS:
+            preferences = GRAPHS[name](options['nodes'], options['degree'], rng)
+            # Drop self-preferences, which the database never produces
+            for node, choices in preferences.items():
+                choices[:] = [choice for choice in choices if choice != node]
+            edges = sum(len(choices) for choices in preferences.values())
+
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                cycles = find_swap_cycles(preferences, max_length=options['max_length'])
+                timings.append(time.perf_counter() - started)
+            self.verify(preferences, cycles)
+
+            matched = sum(len(cycle) for cycle in cycles)
+            self.stdout.write(
+                f'{name:8} {len(preferences):7} slots {edges:8} edges   '
+                f'best {min(timings) * 1000:8.1f} ms   '
+                f'{len(cycles):6} cycles, {matched:7} slots matched '
+                f'({matched / len(preferences):.0%}), longest {max(map(len, cycles), default=0)}'
+            )
+
+    def verify(self, preferences, cycles):
+        """Fail loudly if the matcher returned overlapping or unwanted exchanges"""
+        seen = set()
+        for cycle in cycles:
+            for i, node in enumerate(cycle):
+                assert node not in seen, f'{node} appears in two cycles'
+                assert cycle[(i + 1) % len(cycle)] in preferences[node], f'{node} receives an unlisted slot'
+                seen.add(node)
@@ -0,0 +1,63 @@
+import heapq
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.suggestions import Columns
+
+HOUR = 3600
+
+
+def full_scan(columns, start, duration, exclude_owner, limit, now):
+    """Baseline: score every slot, then take the top limit"""
+    return heapq.nlargest(limit, columns.score(0, len(columns.slots), start, duration, exclude_owner, now))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ranked swap suggestions: the pruned block scan against scoring every slot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slots', type=int, default=100000, help='Marketplace slots')
+        parser.add_argument('--owners', type=int, default=1000, help='Users offering the slots')
+        parser.add_argument('--days', type=int, default=365, help='Days the slots are spread over')
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--queries', type=int, default=50, help='Offered events to rank for')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        horizon = options['days'] * 24 * HOUR
+        slots = []
+        for i in range(options['slots']):
+            start = rng.uniform(0, horizon)
+            slots.append((rng.randrange(options['owners']), start, start + rng.choice([1, 2, 3, 4]) * HOUR / 2, {'id': i}))
+        slots.sort(key=lambda slot: slot[1])
+        rates = {owner: rng.random() for owner in range(options['owners'])}
+
+        started = time.perf_counter()
+        columns = Columns(0, slots, rates)
+        self.stdout.write(f'{len(slots)} slots, columns built in {(time.perf_counter() - started) * 1000:.1f} ms')
+
+        queries = [
+            (rng.uniform(0, horizon), rng.choice([1, 2, 3, 4]) * HOUR / 2, rng.randrange(options['owners']))
+            for _ in range(options['queries'])
+        ]
+        results = []
+        for label, func in (('pruned', columns.top), ('full scan', lambda *args, **kwargs: full_scan(columns, *args, **kwargs))):
+            timings = []
+            tops = []
+            for start, duration, owner in queries:
+                began = time.perf_counter()
+                tops.append(func(start, duration, exclude_owner=owner, limit=options['limit'], now=0))
+                timings.append(time.perf_counter() - began)
+            results.append(tops)
+            timings.sort()
+            self.stdout.write(
+                f'{label:10} median {timings[len(timings) // 2] * 1000:7.1f} ms   '
+                f'worst {timings[-1] * 1000:7.1f} ms'
+            )
+
+        pruned, full = results
+        if pruned != full:
+            raise CommandError('The pruned scan and the full scan disagree')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.matching import run_matching
+
+
+class Command(BaseCommand):
+    help = 'Find and commit multi-party swap cycles from declared swap preferences'
+
+    def handle(self, *args, **options):
+        result = run_matching()
+        self.stdout.write(
+            f"{result['events']} events, {result['edges']} preferences: "
+            f"{result['cycles_committed']}/{result['cycles_found']} cycles committed, "
+            f"{result['events_swapped']} events swapped"
+        )
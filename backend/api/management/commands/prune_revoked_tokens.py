@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = 'Delete the revoked refresh token ids of tokens that have expired; run it periodically'
+
+    def handle(self, *args, **options):
+        deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(f'{deleted} expired revoked tokens deleted')
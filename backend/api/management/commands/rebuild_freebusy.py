@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.freebusy import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute every free/busy bitmap from the events table, e.g. after '
+        'migrating or after events were written with raw SQL'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            days = rebuild()
+        self.stdout.write(f'{days} free/busy days written')
@@ -0,0 +1,137 @@
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.postgres.fields import RangeBoundary
+from django.core.cache import caches
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Event, EventSeries, TsTzRange
+from .serializers import SwappableEventSerializer
+from .versioning import bump_on_commit, get_version
+
+SLOTS_KEY = 'marketplace:slots:v2:{version}'
+
+
+def get_cache():
+    return caches[settings.MARKETPLACE_CACHE]
+
+
+def marketplace_version():
+    """Current version of the global SWAPPABLE set"""
+    return get_version('marketplace')
+
+
+def invalidate_marketplace():
+    """Invalidate the cached marketplace once the current transaction commits"""
+    bump_on_commit('marketplace')
+
+
+def build_marketplace_slots():
+    """Serialize every future SWAPPABLE event once, for all callers"""
+    events = Event.objects.filter(
+        status=Event.StatusChoices.SWAPPABLE,
+        end_time__gt=timezone.now()
+    ).select_related('owner').order_by('start_time', 'id')
+    return [
+        (event.owner_id, event.start_time.timestamp(), event.end_time.timestamp(), dict(data))
+        for event, data in zip(events, SwappableEventSerializer(events, many=True).data)
+    ]
+
+
+def cached_slots(version):
+    """The (owner id, start, end, data) slots of one marketplace version, sorted by start"""
+    cache = get_cache()
+    key = SLOTS_KEY.format(version=version)
+    slots = cache.get(key)
+    if slots is None:
+        slots = build_marketplace_slots()
+        cache.set(key, slots, timeout=settings.MARKETPLACE_CACHE_TTL)
+    return slots
+
+
+def marketplace_slots_for(user, start=None, end=None, compatible=False):
+    """
+    Serialized marketplace for one user: the shared global set minus the
+    user's own events and anything that has ended since it was cached,
+    optionally limited to slots overlapping [start, end) and, if compatible,
+    to slots that fit the user's calendar (see blocking_intervals()).
+    """
+    slots = cached_slots(marketplace_version())
+    after = max(time.time(), start.timestamp() if start else 0)
+    if end is not None:
+        # Slots are sorted by start time, so everything past the window is one slice
+        slots = slots[:bisect_left(slots, end.timestamp(), key=lambda slot: slot[1])]
+    slots = [slot for slot in slots if slot[0] != user.id and slot[2] > after]
+    if compatible and slots:
+        blocking = blocking_intervals(
+            user, datetime.fromtimestamp(after, dt_timezone.utc),
+            datetime.fromtimestamp(max(slot[2] for slot in slots), dt_timezone.utc)
+        )
+        slots = without_clashes(slots, blocking, span=lambda slot: slot[1:3])
+    return [slot[3] for slot in slots]
+
+
+def blocking_intervals(user, start, end, recurring_only=False):
+    """
+    What a slot the user swaps into must not overlap within [start, end):
+    their BUSY events and the occurrences of their recurring events, as
+    sorted, disjoint (start, end) timestamps. Their SWAPPABLE and
+    SWAP_PENDING events do not count, since they may be what they give up.
+    """
+    intervals = []
+    if not recurring_only:
+        busy = Event.objects.filter(
+            owner=user, status=Event.StatusChoices.BUSY, start_time__lt=end, end_time__gt=start
+        ).values_list('start_time', 'end_time')
+        intervals += [(busy_start.timestamp(), busy_end.timestamp()) for busy_start, busy_end in busy]
+
+    series_list = list(EventSeries.objects.filter(owner=user).overlapping(start, end))
+    if series_list:
+        overridden = EventSeries.objects.filter(id__in=[series.id for series in series_list]).overridden()
+        intervals += [
+            (occurrence_start.timestamp(), occurrence_end.timestamp())
+            for series in series_list
+            for occurrence_start, occurrence_end in series.occurrences(start, end, overridden.get(series.id, ()))
+        ]
+
+    intervals.sort()
+    merged = []
+    for interval_start, interval_end in intervals:
+        if merged and interval_start < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], interval_end)
+        else:
+            merged.append([interval_start, interval_end])
+    return merged
+
+
+def without_clashes(items, blocking, span):
+    """
+    The items, sorted by start, whose span(item) = (start, end) overlaps no
+    interval of blocking (sorted and disjoint). One sweep over both lists:
+    blocking intervals that end before a slot starts cannot reach any later
+    slot, so the pointer into blocking only moves forward.
+    """
+    kept = []
+    position = 0
+    for item in items:
+        item_start, item_end = span(item)
+        while position < len(blocking) and blocking[position][1] <= item_start:
+            position += 1
+        if position == len(blocking) or blocking[position][0] >= item_end:
+            kept.append(item)
+    return kept
+
+
+def exclude_clashing(queryset, user):
+    """
+    Anti-join for the paginated marketplace: drop events that overlap one of
+    the user's BUSY events. The probe is a range overlap on the owner, which
+    the GiST index of the non-overlap constraint answers directly.
+    """
+    clashes = Event.objects.filter(owner=user, status=Event.StatusChoices.BUSY).annotate(
+        span=Event.span()
+    ).filter(span__overlap=TsTzRange(OuterRef('start_time'), OuterRef('end_time'), RangeBoundary()))
+    return queryset.filter(~Exists(clashes))
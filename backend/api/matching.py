@@ -0,0 +1,189 @@
+"""
+Multi-party swap matching.
+
+Users declare which SWAPPABLE events they would accept in exchange for one of
+their own (SwapPreference, ranked). Every event is a node of a directed
+graph with an edge to each event its owner would accept. A cycle
+e1 -> e2 -> ... -> ek -> e1 is a valid exchange: the owner of each event
+receives the next one.
+
+Disjoint cycles are found with Gale's top trading cycles: every node points
+at its most preferred remaining choice, cycles of pointers trade and leave,
+and nodes that run out of choices leave unmatched. The result is individually
+rational (nobody receives an event they did not list) and Pareto efficient.
+find_swap_cycles() does this in one O(nodes + edges) walk, so 100k open slots
+match in well under a second; loading the graph dominates.
+
+On sparse preferences TTC clears most of the market through long cycles
+(hundreds of events), each committed in one transaction. SWAP_MATCHING_MAX_CYCLE
+caps the length if that is undesirable: a pointer that would close a longer
+cycle is treated as a rejected choice and its node moves on. The walk stays
+linear but far fewer events trade (see bench_matching), so it is off by default.
+"""
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from .models import (
+    Event, SwapCycle, SwapPreference, SwapRequest, is_overlap_violation, lock_calendars, transfer_events
+)
+
+logger = logging.getLogger(__name__)
+
+
+def find_swap_cycles(preferences, max_length=None):
+    """
+    Top trading cycles over preferences: {node: [acceptable nodes, best first]}.
+
+    Returns a list of disjoint cycles, each a list of nodes where every node
+    receives the next one and the last receives the first. Nodes without an
+    entry in preferences accept nothing and never trade. No cycle is longer
+    than max_length, if given.
+    """
+    # Index of the best choice not yet known to be gone, per node
+    position = dict.fromkeys(preferences, 0)
+    gone = set()
+    on_path = {}
+    cycles = []
+
+    for root in preferences:
+        if root in gone:
+            continue
+        # Follow top-choice pointers from root until they close a cycle or
+        # reach a node with nothing left to accept
+        path = [root]
+        on_path[root] = 0
+        while path:
+            node = path[-1]
+            choices = preferences[node]
+            i = position[node]
+            while i < len(choices) and (choices[i] in gone or choices[i] not in preferences):
+                i += 1
+            position[node] = i
+
+            if i == len(choices):
+                # Nothing this node would accept is left: it leaves unmatched
+                # and whoever pointed at it moves on to their next choice
+                path.pop()
+                del on_path[node]
+                gone.add(node)
+                continue
+
+            target = choices[i]
+            if target in on_path:
+                start = on_path[target]
+                if max_length and len(path) - start > max_length:
+                    # Too long to commit as one exchange; try the next choice
+                    position[node] = i + 1
+                    continue
+                cycle = path[start:]
+                del path[start:]
+                for member in cycle:
+                    del on_path[member]
+                    gone.add(member)
+                cycles.append(cycle)
+            else:
+                on_path[target] = len(path)
+                path.append(target)
+
+    return cycles
+
+
+def load_preferences():
+    """
+    Build the preference graph from the database.
+
+    Returns (preferences, owners): preferences as taken by find_swap_cycles()
+    and the current owner of every node. Only future SWAPPABLE events take
+    part, and an edge is dropped when the wanted event would clash with
+    another event in the offering owner's calendar.
+    """
+    now = timezone.now()
+    clashes = Event.objects.filter(
+        owner=models.OuterRef('offered_event__owner'),
+        start_time__lt=models.OuterRef('wanted_event__end_time'),
+        end_time__gt=models.OuterRef('wanted_event__start_time'),
+    ).exclude(id=models.OuterRef('offered_event'))
+
+    edges = SwapPreference.objects.filter(
+        offered_event__status=Event.StatusChoices.SWAPPABLE,
+        offered_event__end_time__gt=now,
+        wanted_event__status=Event.StatusChoices.SWAPPABLE,
+        wanted_event__end_time__gt=now,
+    ).exclude(
+        offered_event__owner=models.F('wanted_event__owner')
+    ).filter(
+        ~models.Exists(clashes)
+    ).order_by('offered_event_id', 'rank', 'id').values_list(
+        'offered_event_id', 'offered_event__owner_id', 'wanted_event_id'
+    )
+
+    preferences = {}
+    owners = {}
+    for offered_id, owner_id, wanted_id in edges.iterator(chunk_size=10000):
+        preferences.setdefault(offered_id, []).append(wanted_id)
+        owners[offered_id] = owner_id
+    return preferences, owners
+
+
+def commit_cycle(cycle, owners):
+    """
+    Execute one cycle atomically: every owner receives the next event.
+
+    Returns the SwapCycle, or None if the cycle no longer applies (an event
+    changed hands or left the marketplace since the graph was loaded) or
+    would leave someone with overlapping events, recurring ones included;
+    nothing is changed then.
+    """
+    try:
+        with transaction.atomic():
+            # Lock in id order so concurrent accepts cannot deadlock with us
+            lock_calendars(owners[event_id] for event_id in cycle)
+            events = list(
+                Event.objects.select_for_update(no_key=True).filter(id__in=cycle).order_by('id')
+                .values_list('id', 'owner_id', 'status')
+            )
+            if len(events) != len(cycle) or any(
+                owner_id != owners[event_id] or status != Event.StatusChoices.SWAPPABLE
+                for event_id, owner_id, status in events
+            ):
+                return None
+
+            now = timezone.now()
+            swap_cycle = SwapCycle.objects.create(size=len(cycle))
+            legs = list(zip(cycle, cycle[1:] + cycle[:1]))
+            accepted = SwapRequest.objects.bulk_create([
+                SwapRequest(
+                    requester_id=owners[given],
+                    receiver_id=owners[received],
+                    requester_event_id=given,
+                    receiver_event_id=received,
+                    status=SwapRequest.StatusChoices.ACCEPTED,
+                    responded_at=now,
+                    cycle=swap_cycle
+                )
+                for given, received in legs
+            ])
+            transfer_events({received: owners[given] for given, received in legs}, accepted)
+            return swap_cycle
+    except IntegrityError as e:
+        if not is_overlap_violation(e):
+            raise
+        logger.info('Skipping swap cycle %s: it no longer fits its owners\' calendars', cycle)
+        return None
+
+
+def run_matching():
+    """Find and commit every swap cycle currently available"""
+    preferences, owners = load_preferences()
+    cycles = find_swap_cycles(preferences, max_length=settings.SWAP_MATCHING_MAX_CYCLE)
+    committed = [swap_cycle for swap_cycle in (commit_cycle(cycle, owners) for cycle in cycles) if swap_cycle]
+    return {
+        'events': len(preferences),
+        'edges': sum(len(choices) for choices in preferences.values()),
+        'cycles_found': len(cycles),
+        'cycles_committed': len(committed),
+        'events_swapped': sum(swap_cycle.size for swap_cycle in committed),
+    }
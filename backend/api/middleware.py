@@ -7,36 +7,64 @@ logger = logging.getLogger(__name__)
 
 
 class JWTAuthenticationMiddleware(MiddlewareMixin):
-    """Middleware to handle JWT authentication"""
-    
-    def process_request(self, request):
-        # Skip authentication for certain paths
-        skip_paths = [
-            '/api/auth/login/',
-            '/api/auth/register/',
-            '/api/health/',
-            '/admin/',
-        ]
-        
+    """
+    Middleware to handle JWT authentication
+
+    Runs natively in both WSGI and ASGI mode; under ASGI the user lookup goes
+    through the async ORM instead of a thread hop.
+    """
+
+    # Skip authentication for certain paths
+    skip_paths = [
+        '/api/auth/login/',
+        '/api/auth/register/',
+        '/api/auth/refresh/',
+        '/api/health/',
+        '/admin/',
+    ]
+
+    def should_authenticate(self, request):
         # Check if the path should skip authentication
-        for path in skip_paths:
+        for path in self.skip_paths:
             if request.path.startswith(path):
-                return None
-        
+                return False
+
         # Only apply JWT auth to API endpoints
-        if not request.path.startswith('/api/'):
+        return request.path.startswith('/api/')
+
+    def process_request(self, request):
+        if not self.should_authenticate(request):
             return None
-        
+
         try:
+            # The result is memoized on the request and reused by DRF's
+            # JWTAuthentication, so the token is only verified once
             auth = JWTAuthentication()
             result = auth.authenticate(request)
-            
+
             if result:
                 request.user, request.auth = result
-            
+
         except Exception as e:
             logger.error(f"JWT Authentication error: {str(e)}")
             # Don't block the request, let the view handle it
             pass
-        
-        return None
\ No newline at end of file
+
+        return None
+
+    async def aprocess_request(self, request):
+        if not self.should_authenticate(request):
+            return
+
+        try:
+            result = await JWTAuthentication().aauthenticate(request)
+
+            if result:
+                request.user, request.auth = result
+
+        except Exception as e:
+            logger.error(f"JWT Authentication error: {str(e)}")
+
+    async def __acall__(self, request):
+        await self.aprocess_request(request)
+        return await self.get_response(request)
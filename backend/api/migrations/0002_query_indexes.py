@@ -0,0 +1,29 @@
+# Generated by Django 4.2.25 on 2026-10-17 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('status', 'SWAPPABLE')), fields=['start_time', 'id'], include=('end_time', 'owner'), name='event_swappable_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['owner', 'start_time'], include=('end_time',), name='event_owner_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='swaprequest',
+            index=models.Index(fields=['receiver', '-created_at', '-id'], name='swaprequest_receiver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='swaprequest',
+            index=models.Index(fields=['requester', '-created_at', '-id'], name='swaprequest_requester_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.25 on 2026-10-17 05:54
+
+import api.models
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+import django.db.models.constraints
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_query_indexes'),
+    ]
+
+    operations = [
+        # Needed for the owner equality operator inside the GiST exclusion index
+        BtreeGistExtension(),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(deferrable=django.db.models.constraints.Deferrable['IMMEDIATE'], expressions=[(api.models.TsTzRange('start_time', 'end_time', django.contrib.postgres.fields.ranges.RangeBoundary()), '&&'), ('owner', '=')], name='event_owner_no_overlap'),
+        ),
+    ]
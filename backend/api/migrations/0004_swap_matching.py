@@ -0,0 +1,47 @@
+# Generated by Django 4.2.25 on 2026-10-17 06:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_event_no_overlap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwapCycle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SwapPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('offered_event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='swap_preferences', to='api.event')),
+                ('wanted_event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wanted_by', to='api.event')),
+            ],
+            options={
+                'ordering': ['offered_event', 'rank', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='swaprequest',
+            name='cycle',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='swap_requests', to='api.swapcycle'),
+        ),
+        migrations.AddConstraint(
+            model_name='swappreference',
+            constraint=models.UniqueConstraint(fields=('offered_event', 'wanted_event'), name='swappreference_unique_pair'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-17 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_swap_matching'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.25 on 2026-10-17 06:27
+
+import api.models
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_event_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GistIndex(api.models.TsTzRange('start_time', 'end_time', django.contrib.postgres.fields.ranges.RangeBoundary()), condition=models.Q(('status', 'SWAPPABLE')), name='event_swappable_span_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.25 on 2026-10-17 06:35
+
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_event_span_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('rrule', models.CharField(max_length=200)),
+                ('exdates', django.contrib.postgres.fields.ArrayField(base_field=models.DateTimeField(), blank=True, default=list, size=None)),
+                ('ends_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'event series',
+                'ordering': ['start_time'],
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_id',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.UniqueConstraint(fields=('series', 'recurrence_id'), name='event_series_occurrence_unique'),
+        ),
+        migrations.AddField(
+            model_name='eventseries',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_series', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='overrides', to='api.eventseries'),
+        ),
+        migrations.AddIndex(
+            model_name='eventseries',
+            index=models.Index(fields=['owner', 'start_time'], include=('ends_at',), name='eventseries_owner_start_idx'),
+        ),
+    ]
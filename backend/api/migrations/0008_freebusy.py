@@ -0,0 +1,28 @@
+# Generated by Django 4.2.25 on 2026-10-17 06:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_event_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FreeBusyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('bits', models.BinaryField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='freebusy_days', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='freebusyday',
+            constraint=models.UniqueConstraint(fields=('owner', 'day'), name='freebusyday_owner_day_unique'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.25 on 2026-10-17 06:46
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_freebusy'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('title', 'description', config='english'), condition=models.Q(('status', 'SWAPPABLE')), name='event_swappable_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass('title', name='gin_trgm_ops'), condition=models.Q(('status', 'SWAPPABLE')), name='event_swappable_title_trgm_idx'),
+        ),
+    ]
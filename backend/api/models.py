@@ -1,7 +1,49 @@
-from django.db import models
+from django.db import IntegrityError, connection, models
+from django.db.models.signals import post_save
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import ArrayField, DateTimeRangeField, RangeBoundary, RangeOperators
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.contrib.postgres.search import SearchVector
 from django.utils import timezone
 
+from .recurrence import RecurrenceRule, Schedule, first_clash
+
+
+EVENT_OVERLAP_CONSTRAINT = 'event_owner_no_overlap'
+# Text search configuration of Event.search_document(); changing it needs a new index
+SEARCH_CONFIG = 'english'
+
+
+class TsTzRange(models.Func):
+    """tstzrange(start, end, '[)') database function"""
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+class SeriesOverlap(IntegrityError):
+    """
+    An event or series would overlap an occurrence of one of its owner's
+    recurring events. Raised where the database would raise for overlapping
+    events, since occurrences are not rows the constraint can see.
+    """
+
+
+def is_overlap_violation(error):
+    """Check whether an IntegrityError was raised by the per-owner non-overlap constraint"""
+    if isinstance(error, SeriesOverlap):
+        return True
+    diag = getattr(error.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == EVENT_OVERLAP_CONSTRAINT
+
+
+class SwapConflict(Exception):
+    """A swap request or event changed under a concurrent transaction"""
+
+
+class EventVersionConflict(SwapConflict):
+    """An Event compare-and-set lost to a concurrent write"""
+
 
 class User(AbstractUser):
     """Extended User model for the calendar swap application"""
@@ -42,9 +84,88 @@ class Event(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped by every write, for compare-and-set updates (compare_and_set())
+    version = models.PositiveIntegerField(default=0)
+    # Set when this event is an edited occurrence of a recurring event: the
+    # series and the start the occurrence originally had
+    series = models.ForeignKey(
+        'EventSeries',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='overrides'
+    )
+    recurrence_id = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['start_time']
+        indexes = [
+            # Marketplace feed: status='SWAPPABLE' AND end_time > now ORDER BY start_time, id
+            models.Index(
+                fields=['start_time', 'id'],
+                include=['end_time', 'owner'],
+                condition=models.Q(status='SWAPPABLE'),
+                name='event_swappable_start_idx',
+            ),
+            # Per-owner calendar and overlap checks: owner=? AND start_time < ? AND end_time > ?
+            models.Index(
+                fields=['owner', 'start_time'],
+                include=['end_time'],
+                name='event_owner_start_idx',
+            ),
+            # Marketplace ?start=/?end= windows: span() && window. A btree on
+            # start_time can only bound one side of an overlap test, so it
+            # would scan every slot that started before the window ends.
+            # Per-owner windows use the exclusion constraint's GiST index.
+            GistIndex(
+                TsTzRange('start_time', 'end_time', RangeBoundary()),
+                condition=models.Q(status='SWAPPABLE'),
+                name='event_swappable_span_idx',
+            ),
+            # Marketplace ?q= search: search_document() @@ query OR title %> query.
+            # Expression indexes, so Postgres keeps them current on every write.
+            GinIndex(
+                SearchVector('title', 'description', config=SEARCH_CONFIG),
+                condition=models.Q(status='SWAPPABLE'),
+                name='event_swappable_search_idx',
+            ),
+            GinIndex(
+                OpClass('title', name='gin_trgm_ops'),
+                condition=models.Q(status='SWAPPABLE'),
+                name='event_swappable_title_trgm_idx',
+            ),
+        ]
+        constraints = [
+            # No two events of the same owner may overlap. Deferrable so it is
+            # checked per statement, letting accept() swap owners in one UPDATE.
+            ExclusionConstraint(
+                name=EVENT_OVERLAP_CONSTRAINT,
+                expressions=[
+                    (TsTzRange('start_time', 'end_time', RangeBoundary()), RangeOperators.OVERLAPS),
+                    ('owner', RangeOperators.EQUAL),
+                ],
+                deferrable=models.Deferrable.IMMEDIATE,
+            ),
+            models.UniqueConstraint(fields=['series', 'recurrence_id'], name='event_series_occurrence_unique'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {'owner_id', 'start_time', 'end_time'} <= set(field_names):
+            # What the free/busy bitmaps hold for this event, see signals.py
+            instance.stored_span = (instance.owner_id, instance.start_time, instance.end_time)
+        return instance
+
+    @staticmethod
+    def span():
+        """tstzrange(start_time, end_time, '[)'), the expression both GiST indexes are built on"""
+        return TsTzRange('start_time', 'end_time', RangeBoundary())
+
+    @staticmethod
+    def search_document():
+        """to_tsvector() over title and description, the expression the search GIN index is built on"""
+        return SearchVector('title', 'description', config=SEARCH_CONFIG)
 
     def __str__(self):
         return f"{self.title} - {self.owner.email} ({self.start_time.strftime('%Y-%m-%d %H:%M')})"
@@ -60,6 +181,31 @@ class Event(models.Model):
         """Get duration in minutes"""
         return int((self.end_time - self.start_time).total_seconds() / 60)
 
+    def compare_and_set(self, **changes):
+        """
+        Write only the given fields with UPDATE ... WHERE id = %s AND
+        version = %s, bumping the version, instead of a locking read and a
+        full-row save(). Raises EventVersionConflict if the row was written
+        since this instance was read.
+        """
+        now = timezone.now()
+        updated = Event.objects.filter(id=self.id, version=self.version).update(
+            version=models.F('version') + 1, updated_at=now, **changes
+        )
+        if not updated:
+            raise EventVersionConflict("This event was changed by another request; reload and try again")
+
+        for field, value in changes.items():
+            setattr(self, field, value)
+        self.version += 1
+        self.updated_at = now
+        # Same notification as save(update_fields=...), for cache invalidation
+        post_save.send(
+            sender=Event, instance=self, created=False, update_fields=frozenset(changes),
+            raw=False, using=Event.objects.db
+        )
+        return self
+
     def is_swappable(self):
         """Check if event can be swapped"""
         return self.status == self.StatusChoices.SWAPPABLE
@@ -69,6 +215,237 @@ class Event(models.Model):
         return self.end_time < timezone.now()
 
 
+class EventSeriesQuerySet(models.QuerySet):
+
+    def overlapping(self, start, end):
+        """Series with occurrences that may overlap [start, end); either bound may be None"""
+        queryset = self
+        if end is not None:
+            queryset = queryset.filter(start_time__lt=end)
+        if start is not None:
+            queryset = queryset.filter(models.Q(ends_at__isnull=True) | models.Q(ends_at__gt=start))
+        return queryset
+
+    def overridden(self):
+        """{series id: recurrence ids of its occurrences that are Event rows now}"""
+        overridden = {}
+        pairs = Event.objects.filter(series__in=self, recurrence_id__isnull=False).values_list('series_id', 'recurrence_id')
+        for series_id, recurrence_id in pairs:
+            overridden.setdefault(series_id, set()).add(recurrence_id)
+        return overridden
+
+
+class EventSeries(models.Model):
+    """
+    A recurring event: its first occurrence and an RRULE (api/recurrence.py).
+
+    Occurrences are expanded on read, within the requested window only. An
+    occurrence becomes an Event row (series and recurrence_id set) when it is
+    edited, e.g. put up for swapping, and is then skipped by the expansion;
+    deleted occurrences are listed in exdates.
+    """
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    # The first occurrence
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    rrule = models.CharField(max_length=200)
+    exdates = ArrayField(models.DateTimeField(), default=list, blank=True)
+    # End of the last occurrence, None if the series never ends; kept by save()
+    ends_at = models.DateTimeField(null=True, blank=True, editable=False)
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='event_series'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EventSeriesQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['start_time']
+        verbose_name_plural = 'event series'
+        indexes = [
+            models.Index(fields=['owner', 'start_time'], include=['ends_at'], name='eventseries_owner_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.owner.email} ({self.rrule})"
+
+    @property
+    def schedule(self):
+        return Schedule(RecurrenceRule.parse(self.rrule), self.start_time, self.end_time - self.start_time)
+
+    def save(self, *args, **kwargs):
+        self.ends_at = self.schedule.last_end
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'ends_at'}
+        super().save(*args, **kwargs)
+
+    def occurrences(self, start, end, overridden=()):
+        """
+        Yield (start, end) of the occurrences overlapping [start, end) that
+        are neither deleted nor overridden, in order. An occurrence's start
+        is also its recurrence id.
+        """
+        skipped = set(self.exdates).union(overridden)
+        for occurrence in self.schedule.between(start, end):
+            if occurrence[0] not in skipped:
+                yield occurrence
+
+    def occurrence_event(self, recurrence_id):
+        """An unsaved Event standing for one occurrence"""
+        return Event(
+            title=self.title, description=self.description,
+            start_time=recurrence_id, end_time=recurrence_id + (self.end_time - self.start_time),
+            status=Event.StatusChoices.BUSY, owner=self.owner,
+            series=self, recurrence_id=recurrence_id
+        )
+
+    def has_occurrence(self, recurrence_id):
+        return recurrence_id not in self.exdates and self.schedule.find(recurrence_id) is not None
+
+    @classmethod
+    def expand(cls, owner, start, end):
+        """Unsaved Events for owner's occurrences overlapping [start, end) that are not rows already"""
+        series_list = list(cls.objects.filter(owner=owner).overlapping(start, end).select_related('owner'))
+        if not series_list:
+            return []
+        overridden = cls.objects.filter(id__in=[series.id for series in series_list]).overridden()
+        return [
+            series.occurrence_event(recurrence_id)
+            for series in series_list
+            for recurrence_id, _ in series.occurrences(start, end, overridden.get(series.id, ()))
+        ]
+
+    def add_exdate(self, recurrence_id):
+        """Delete one occurrence; appended in place so concurrent deletes are all kept"""
+        from .versioning import bump_on_commit
+
+        EventSeries.objects.filter(id=self.id).update(
+            exdates=models.Func(
+                models.F('exdates'), models.Value(recurrence_id, output_field=models.DateTimeField()),
+                function='array_append', output_field=self._meta.get_field('exdates')
+            ),
+            updated_at=timezone.now()
+        )
+        self.exdates = [*self.exdates, recurrence_id]
+        # The update above bypasses signals
+        bump_on_commit(f'events:{self.owner_id}')
+
+    def materialize(self, recurrence_id):
+        """
+        The Event row for one occurrence, inserted with the series' values if
+        it is not a row yet. Returns None if the occurrence does not exist or
+        was swapped away. Callers hold the owner's calendar lock.
+        """
+        event = Event.objects.filter(series=self, recurrence_id=recurrence_id).select_related('owner').first()
+        if event is not None:
+            return event if event.owner_id == self.owner_id else None
+        if not self.has_occurrence(recurrence_id):
+            return None
+        event = self.occurrence_event(recurrence_id)
+        event.save()
+        return event
+
+    def find_clash(self):
+        """
+        Describe the first event or other series of the owner that overlaps
+        one of this series' occurrences, or return None. Only the owner's
+        events within the series' span are read, and other series are
+        compared rule against rule (first_clash()), so the cost does not grow
+        with the number of occurrences.
+        """
+        schedule = self.schedule
+        overridden = EventSeries.objects.filter(id=self.id).overridden().get(self.id, ()) if self.id else ()
+        skipped = set(self.exdates).union(overridden)
+
+        events = Event.objects.filter(owner=self.owner_id, end_time__gt=self.start_time)
+        if schedule.last_end is not None:
+            events = events.filter(start_time__lt=schedule.last_end)
+        for event_id, start, end in events.values_list('id', 'start_time', 'end_time').iterator(chunk_size=2000):
+            if any(occurrence[0] not in skipped for occurrence in schedule.between(start, end)):
+                return f'event {event_id}'
+
+        others = EventSeries.objects.filter(owner=self.owner_id).overlapping(self.start_time, schedule.last_end)
+        # Deleted occurrences are not skipped here, so this errs on the side
+        # of reporting a clash that only a deleted occurrence would have had
+        for other in others.exclude(id=self.id):
+            if first_clash(schedule, other.schedule):
+                return f'recurring event {other.id}'
+        return None
+
+
+class FreeBusyDay(models.Model):
+    """One UTC day of a user's busy time as a bitmap of 15-minute buckets (api/freebusy.py)"""
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='freebusy_days'
+    )
+    day = models.DateField()
+    bits = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'day'], name='freebusyday_owner_day_unique'),
+        ]
+
+    def __str__(self):
+        return f"Free/busy of {self.owner_id} on {self.day}"
+
+
+class RevokedToken(models.Model):
+    """
+    A used refresh token id, kept until the token would expire anyway. A
+    table rather than a cache entry, so no eviction can let a replayed
+    token through and every worker sees the same list.
+    """
+    jti = models.CharField(max_length=64, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Revoked token {self.jti}"
+
+
+def lock_calendars(owner_ids):
+    """
+    Serialize, per owner, transactions that add or move events or series in
+    these calendars, with transaction-scoped advisory locks taken in id
+    order. Overlaps with recurring events are checked by queries rather than
+    by the exclusion constraint, so two such writers must not interleave.
+    Take these before any event row locks.
+    """
+    owner_ids = sorted(set(owner_ids))
+    if owner_ids:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(id) FROM unnest(%s::bigint[]) AS id', [owner_ids])
+
+
+def check_series_overlaps(spans):
+    """
+    Raise SeriesOverlap if any (owner id, start, end) in spans overlaps an
+    occurrence of one of that owner's series. Callers hold the owners'
+    calendar locks (lock_calendars()).
+    """
+    if not spans:
+        return
+    owner_ids = {owner_id for owner_id, _, _ in spans}
+    series_list = list(EventSeries.objects.filter(owner__in=owner_ids).overlapping(
+        min(start for _, start, _ in spans), max(end for _, _, end in spans)
+    ))
+    if not series_list:
+        return
+    overridden = EventSeries.objects.filter(id__in=[series.id for series in series_list]).overridden()
+    for owner_id, start, end in spans:
+        for series in series_list:
+            if series.owner_id == owner_id and next(
+                series.occurrences(start, end, overridden.get(series.id, ())), None
+            ):
+                raise SeriesOverlap(f'{start} - {end} overlaps recurring event {series.id}')
+
+
 class SwapRequest(models.Model):
     """Requests to swap calendar events between users"""
     
@@ -107,12 +484,24 @@ class SwapRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     responded_at = models.DateTimeField(null=True, blank=True)
+    cycle = models.ForeignKey(
+        'SwapCycle',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='swap_requests'
+    )
 
     class Meta:
         ordering = ['-created_at']
         unique_together = [
             ['requester_event', 'receiver_event', 'status']
         ]
+        indexes = [
+            # Incoming/outgoing lists: receiver|requester=? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['receiver', '-created_at', '-id'], name='swaprequest_receiver_idx'),
+            models.Index(fields=['requester', '-created_at', '-id'], name='swaprequest_requester_idx'),
+        ]
 
     def __str__(self):
         return f"Swap Request: {self.requester.email} wants {self.receiver_event.title} for {self.requester_event.title}"
@@ -140,81 +529,236 @@ class SwapRequest(models.Model):
         if self.receiver_event.status not in valid_statuses:
             raise ValidationError("Requested event is not available for swapping")
 
+    @staticmethod
+    def parties_for_events(event_ids):
+        """Ids of users with a swap request (of any status) involving any of the events"""
+        pairs = SwapRequest.objects.filter(
+            models.Q(requester_event__in=event_ids) | models.Q(receiver_event__in=event_ids)
+        ).values_list('requester_id', 'receiver_id')
+        return {user_id for pair in pairs for user_id in pair}
+
+    def lock_events(self):
+        """
+        Lock both events with one SELECT ... FOR NO KEY UPDATE in id order and
+        refresh them. Every writer that touches more than one event locks in
+        this order, so concurrent accepts on overlapping events wait for each
+        other instead of deadlocking. NO KEY leaves foreign-key checks from
+        new swap requests unblocked.
+        """
+        events = {
+            event.id: event
+            for event in Event.objects.select_for_update(of=('self',), no_key=True).filter(
+                id__in=[self.requester_event_id, self.receiver_event_id]
+            ).select_related('owner').order_by('id')
+        }
+        self.requester_event = events[self.requester_event_id]
+        self.receiver_event = events[self.receiver_event_id]
+        return self.requester_event, self.receiver_event
+
+    def respond(self, new_status):
+        """
+        Move a PENDING request to new_status with a conditional UPDATE.
+        Raises SwapConflict if another transaction got there first.
+        """
+        now = timezone.now()
+        updated = SwapRequest.objects.filter(
+            id=self.id, status=self.StatusChoices.PENDING
+        ).update(status=new_status, responded_at=now, updated_at=now)
+        if not updated:
+            raise SwapConflict("This swap request is no longer pending")
+        self.status = new_status
+        self.responded_at = now
+        self.updated_at = now
+
     def accept(self):
         """Accept the swap request and exchange event ownership"""
         from django.db import transaction
         
         with transaction.atomic():
-            # Update swap request status
-            self.status = self.StatusChoices.ACCEPTED
-            self.responded_at = timezone.now()
-            self.save()
+            lock_calendars([self.requester_id, self.receiver_id])
+            requester_event, receiver_event = self.lock_events()
+            self.respond(self.StatusChoices.ACCEPTED)
             
-            # Exchange event ownership
-            requester_event = self.requester_event
-            receiver_event = self.receiver_event
-            
-            # Swap owners
+            # Both events must still be on offer by the two parties; an owner
+            # may have taken one back (or swapped it elsewhere) meanwhile
             original_requester = requester_event.owner
             original_receiver = receiver_event.owner
+            if (
+                original_requester.id != self.requester_id or original_receiver.id != self.receiver_id
+                or Event.StatusChoices.BUSY in (requester_event.status, receiver_event.status)
+            ):
+                raise SwapConflict("One of the events is no longer available for swapping")
+
+            # Raises IntegrityError if either event clashes with the new
+            # owner's calendar.
+            transfer_events(
+                {requester_event.id: original_receiver.id, receiver_event.id: original_requester.id},
+                accepted=[self]
+            )
             
             requester_event.owner = original_receiver
             receiver_event.owner = original_requester
             
             # Set status back to BUSY
-            requester_event.status = Event.StatusChoices.BUSY
-            receiver_event.status = Event.StatusChoices.BUSY
-            
-            # Save events
-            requester_event.save()
-            receiver_event.save()
-            
-            # Cancel any other pending swap requests for these events
-            SwapRequest.objects.filter(
-                models.Q(requester_event=requester_event) | 
-                models.Q(receiver_event=requester_event) |
-                models.Q(requester_event=receiver_event) | 
-                models.Q(receiver_event=receiver_event),
-                status=self.StatusChoices.PENDING
-            ).exclude(id=self.id).update(
-                status=self.StatusChoices.CANCELLED,
-                responded_at=timezone.now()
-            )
+            for event in (requester_event, receiver_event):
+                event.status = Event.StatusChoices.BUSY
+                event.version += 1
 
     def reject(self):
         """Reject the swap request and restore event status"""
-        from django.db import transaction
-        
-        with transaction.atomic():
-            # Update swap request status
-            self.status = self.StatusChoices.REJECTED
-            self.responded_at = timezone.now()
-            self.save()
-            
-            # Set events back to SWAPPABLE if they were SWAP_PENDING
-            if self.requester_event.status == Event.StatusChoices.SWAP_PENDING:
-                self.requester_event.status = Event.StatusChoices.SWAPPABLE
-                self.requester_event.save()
-            
-            if self.receiver_event.status == Event.StatusChoices.SWAP_PENDING:
-                self.receiver_event.status = Event.StatusChoices.SWAPPABLE
-                self.receiver_event.save()
+        self.close(self.StatusChoices.REJECTED, 'swap_request.rejected')
 
     def cancel(self):
         """Cancel the swap request (by requester)"""
+        self.close(self.StatusChoices.CANCELLED, 'swap_request.cancelled')
+
+    def close(self, new_status, event_type):
+        """Reject or cancel, putting SWAP_PENDING events back on the marketplace"""
         from django.db import transaction
+        from .notifications import notify_on_commit
+        from .versioning import bump_on_commit
         
         with transaction.atomic():
-            # Update swap request status
-            self.status = self.StatusChoices.CANCELLED
-            self.responded_at = timezone.now()
-            self.save()
+            events = self.lock_events()
+            self.respond(new_status)
+            notify_on_commit(
+                [self.requester_id, self.receiver_id], event_type,
+                swap_request_id=self.id, status=self.status
+            )
             
             # Set events back to SWAPPABLE if they were SWAP_PENDING
-            if self.requester_event.status == Event.StatusChoices.SWAP_PENDING:
-                self.requester_event.status = Event.StatusChoices.SWAPPABLE
-                self.requester_event.save()
+            restored = [event for event in events if event.status == Event.StatusChoices.SWAP_PENDING]
+            now = timezone.now()
+            Event.objects.filter(
+                id__in=[event.id for event in restored], status=Event.StatusChoices.SWAP_PENDING
+            ).update(status=Event.StatusChoices.SWAPPABLE, updated_at=now, version=models.F('version') + 1)
+            for event in restored:
+                event.status = Event.StatusChoices.SWAPPABLE
+                event.updated_at = now
+                event.version += 1
             
-            if self.receiver_event.status == Event.StatusChoices.SWAP_PENDING:
-                self.receiver_event.status = Event.StatusChoices.SWAPPABLE
-                self.receiver_event.save()
+            # The updates above bypass signals
+            parties = SwapRequest.parties_for_events([event.id for event in events]) if restored else ()
+            bump_on_commit(
+                'marketplace',
+                *(f'events:{event.owner_id}' for event in restored),
+                f'swaps:{self.requester_id}',
+                f'swaps:{self.receiver_id}',
+                *(f'swaps:{user_id}' for user_id in parties)
+            )
+
+
+class SwapCycle(models.Model):
+    """
+    A multi-party swap found by the matching engine (api/matching.py).
+
+    Each leg is recorded as an ACCEPTED SwapRequest pointing at the cycle:
+    the requester gave up requester_event and received receiver_event.
+    """
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Swap Cycle #{self.id} ({self.size} events)"
+
+
+class SwapPreference(models.Model):
+    """A user's declaration that they would give up offered_event for wanted_event"""
+    offered_event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name='swap_preferences'
+    )
+    wanted_event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name='wanted_by'
+    )
+    # Lower is preferred
+    rank = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['offered_event', 'rank', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['offered_event', 'wanted_event'], name='swappreference_unique_pair'),
+        ]
+
+    def __str__(self):
+        return f"Swap Preference: {self.offered_event_id} -> {self.wanted_event_id} (rank {self.rank})"
+
+
+def transfer_events(new_owners, accepted):
+    """
+    Move each event to its new owner and settle everything around it; the
+    shared core of SwapRequest.accept() and multi-party cycle commits.
+
+    new_owners maps event id -> new owner id and must describe a closed
+    exchange (every new owner also gives up an event), e.g. the two events of
+    a pairwise swap or every event of a cycle. accepted are the ACCEPTED
+    SwapRequests recording the exchange. Must run inside a transaction that
+    holds the calendar locks of every owner involved.
+    """
+    from .freebusy import refresh as refresh_freebusy
+    from .notifications import notify_on_commit
+    from .versioning import bump_on_commit
+
+    event_ids = list(new_owners)
+    spans = list(Event.objects.filter(id__in=event_ids).values_list('id', 'owner_id', 'start_time', 'end_time'))
+    check_series_overlaps([(new_owners[event_id], start, end) for event_id, _, start, end in spans])
+    # All events move in a single statement so the non-overlap constraint
+    # sees the final ownership, not a half-swapped state. Raises
+    # IntegrityError if any event clashes with its new owner's calendar.
+    Event.objects.filter(id__in=event_ids).update(
+        owner=models.Case(
+            *(models.When(id=event_id, then=models.Value(owner_id)) for event_id, owner_id in new_owners.items())
+        ),
+        status=Event.StatusChoices.BUSY,
+        updated_at=timezone.now(),
+        version=models.F('version') + 1
+    )
+    # Both the giving and the receiving calendars change
+    refresh_freebusy([
+        (owner_id, start, end)
+        for event_id, old_owner_id, start, end in spans
+        for owner_id in (old_owner_id, new_owners[event_id])
+    ])
+
+    # Cancel any other pending swap requests for these events
+    competing = SwapRequest.objects.filter(
+        models.Q(requester_event__in=event_ids) | models.Q(receiver_event__in=event_ids),
+        status=SwapRequest.StatusChoices.PENDING
+    ).exclude(id__in=[swap_request.id for swap_request in accepted])
+    cancelled = list(competing.values_list('id', 'requester_id', 'receiver_id'))
+    competing.update(
+        status=SwapRequest.StatusChoices.CANCELLED,
+        responded_at=timezone.now()
+    )
+
+    # The events are no longer on offer, so neither are preferences over them
+    SwapPreference.objects.filter(
+        models.Q(offered_event__in=event_ids) | models.Q(wanted_event__in=event_ids)
+    ).delete()
+
+    for swap_request in accepted:
+        notify_on_commit(
+            [swap_request.requester_id, swap_request.receiver_id], 'swap_request.accepted',
+            swap_request_id=swap_request.id, status=swap_request.status
+        )
+    for request_id, requester_id, receiver_id in cancelled:
+        notify_on_commit(
+            [requester_id, receiver_id], 'swap_request.cancelled',
+            swap_request_id=request_id, status=SwapRequest.StatusChoices.CANCELLED
+        )
+
+    # The updates above bypass signals, so invalidate the marketplace, every
+    # calendar involved and every swap list showing these events here
+    parties = SwapRequest.parties_for_events(event_ids)
+    bump_on_commit(
+        'marketplace',
+        *(f'events:{owner_id}' for owner_id in set(new_owners.values())),
+        *(f'swaps:{user_id}' for user_id in parties)
+    )
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class BaseBroker:
+    """
+    Pub/sub interface used for per-user notifications.
+
+    publish() may be called from any thread; subscribe() is used from the
+    ASGI event loop. A shared broker (e.g. Redis pub/sub) is needed once more
+    than one server process holds stream connections.
+    """
+
+    def publish(self, user_id, message):
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """Async context manager yielding an asyncio.Queue of messages for user_id"""
+        raise NotImplementedError
+
+
+class LocalBroker(BaseBroker):
+    """In-process broker: one bounded asyncio.Queue per open stream"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._deliver, queue, message)
+
+    @staticmethod
+    def _deliver(queue, message):
+        # A client that cannot keep up loses messages rather than memory;
+        # it will resync from the list endpoints
+        if not queue.full():
+            queue.put_nowait(message)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._subscribers[user_id].add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers[user_id].discard(subscriber)
+                if not self._subscribers[user_id]:
+                    del self._subscribers[user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+
+
+broker = import_string(settings.NOTIFICATION_BROKER)()
+
+
+def notify_on_commit(user_ids, event_type, **payload):
+    """Push a notification to each user once the current transaction commits"""
+    message = {'type': event_type, **payload}
+
+    def publish():
+        for user_id in set(user_ids):
+            broker.publish(user_id, message)
+
+    transaction.on_commit(publish)
+
+
+def format_sse(message):
+    """Serialize a message as a Server-Sent Events frame"""
+    return f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
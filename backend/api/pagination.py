@@ -0,0 +1,137 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a (timestamp, id) pair.
+
+    Pages are only produced when the client asks for them with ``cursor`` or
+    ``page_size``, so existing callers that expect a plain list keep working.
+    Each page is fetched with ``WHERE (time, id) > (last_time, last_id)``,
+    which costs the same on page 1000 as on page 1 and never repeats or skips
+    rows that existed when the previous page was read.
+    """
+    time_field = 'start_time'
+    descending = False
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    @staticmethod
+    def get_params(request):
+        # Plain Django requests (async views) have no query_params
+        return getattr(request, 'query_params', request.GET)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(self.get_params(request)[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.API_PAGE_SIZE
+        return max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+    def encode_cursor(self, obj):
+        position = [getattr(obj, self.time_field).isoformat(), obj.pk]
+        raw = json.dumps(position, separators=(',', ':')).encode('ascii')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, encoded):
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            timestamp, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            position = parse_datetime(timestamp)
+            if position is None:
+                raise ValueError
+            return position, int(pk)
+        except (TypeError, ValueError, binascii.Error, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset() for async views, read with the async ORM"""
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page([obj async for obj in queryset])
+
+    def page_queryset(self, queryset, request):
+        """The unevaluated query for the requested page, or None when not paginating"""
+        params = self.get_params(request)
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        if self.descending:
+            queryset = queryset.order_by(f'-{self.time_field}', '-id')
+            after = '__lt'
+        else:
+            queryset = queryset.order_by(self.time_field, 'id')
+            after = '__gt'
+
+        encoded = params.get(self.cursor_query_param)
+        if encoded:
+            position, pk = self.decode_cursor(encoded)
+            queryset = queryset.filter(
+                Q(**{f'{self.time_field}{after}': position}) |
+                Q(**{self.time_field: position, f'id{after}': pk})
+            )
+
+        # Fetch one extra row to find out whether another page exists
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class MarketplacePagination(KeysetPagination):
+    """Marketplace feed ordered by (start_time, id)"""
+    time_field = 'start_time'
+
+
+class SwapRequestPagination(KeysetPagination):
+    """Swap request lists, newest first by (created_at, id)"""
+    time_field = 'created_at'
+    descending = True
@@ -0,0 +1,220 @@
+"""
+Recurrence rules for event series.
+
+An EventSeries stores its first occurrence and an RRULE; occurrences are
+computed when read and never stored. The supported subset of RFC 5545 is
+FREQ=DAILY|WEEKLY with INTERVAL, BYDAY (plain weekday codes, weekly rules
+only), COUNT and UNTIL; WKST may only be MO. Rules recur in UTC, like a
+DTSTART given in UTC, so every occurrence starts at the first one's time of
+day and the rule repeats exactly every period.
+
+Occurrences are numbered 0, 1, 2, ... and Schedule.occurrence(i) is O(1), so
+expanding a window costs one step per occurrence yielded however far it is
+from the start of the series, and checking two series against each other
+only needs one common period of the pair (first_clash()).
+"""
+import math
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+# Days per period at INTERVAL=1
+FREQUENCIES = {'DAILY': 1, 'WEEKLY': 7}
+MAX_INTERVAL = 366
+
+
+class RuleError(ValueError):
+    """An RRULE that is malformed or outside the supported subset"""
+
+
+class RecurrenceRule:
+    """A parsed RRULE"""
+
+    def __init__(self, freq, interval=1, by_day=(), count=None, until=None):
+        self.freq = freq
+        self.interval = interval
+        self.by_day = tuple(by_day)
+        self.count = count
+        self.until = until
+
+    @classmethod
+    def parse(cls, text):
+        parts = {}
+        for part in text.strip().removeprefix('RRULE:').split(';'):
+            name, sep, value = part.partition('=')
+            name = name.strip().upper()
+            if not sep or not value:
+                raise RuleError(f'Invalid rule part: {part!r}')
+            if name in parts:
+                raise RuleError(f'{name} is given more than once')
+            parts[name] = value.strip().upper()
+
+        unsupported = sorted(set(parts) - {'FREQ', 'INTERVAL', 'BYDAY', 'COUNT', 'UNTIL', 'WKST'})
+        if unsupported:
+            raise RuleError(f"Unsupported rule parts: {', '.join(unsupported)}")
+        if parts.get('FREQ') not in FREQUENCIES:
+            raise RuleError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+        if parts.get('WKST', 'MO') != 'MO':
+            raise RuleError('Only WKST=MO is supported')
+        if 'COUNT' in parts and 'UNTIL' in parts:
+            raise RuleError('COUNT and UNTIL cannot both be given')
+
+        interval = cls._positive(parts, 'INTERVAL', default=1)
+        if interval > MAX_INTERVAL:
+            raise RuleError(f'INTERVAL can be at most {MAX_INTERVAL}')
+
+        by_day = ()
+        if 'BYDAY' in parts:
+            if parts['FREQ'] != 'WEEKLY':
+                raise RuleError('BYDAY is only supported for weekly rules')
+            by_day = parts['BYDAY'].split(',')
+            invalid = [day for day in by_day if day not in WEEKDAYS]
+            if invalid:
+                raise RuleError(f"Invalid BYDAY values: {', '.join(invalid)}")
+            by_day = sorted(set(by_day), key=WEEKDAYS.index)
+
+        return cls(
+            parts['FREQ'], interval, by_day,
+            count=cls._positive(parts, 'COUNT'),
+            until=cls._until(parts['UNTIL']) if 'UNTIL' in parts else None
+        )
+
+    @staticmethod
+    def _positive(parts, name, default=None):
+        if name not in parts:
+            return default
+        if not parts[name].isdigit() or int(parts[name]) < 1:
+            raise RuleError(f'{name} must be a positive integer')
+        return int(parts[name])
+
+    @staticmethod
+    def _until(value):
+        try:
+            if 'T' not in value:
+                # A date: the last occurrence may start any time that day
+                day = datetime.strptime(value, '%Y%m%d').date()
+                return datetime.combine(day, time.max, tzinfo=dt_timezone.utc)
+            if not value.endswith('Z'):
+                raise RuleError('UNTIL must be a date or a UTC date-time')
+            return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=dt_timezone.utc)
+        except ValueError as e:
+            if isinstance(e, RuleError):
+                raise
+            raise RuleError(f'Invalid UNTIL: {value}')
+
+    def __str__(self):
+        parts = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            parts.append(f'INTERVAL={self.interval}')
+        if self.by_day:
+            parts.append(f"BYDAY={','.join(self.by_day)}")
+        if self.count:
+            parts.append(f'COUNT={self.count}')
+        if self.until:
+            parts.append(f"UNTIL={self.until.strftime('%Y%m%dT%H%M%SZ')}")
+        return ';'.join(parts)
+
+
+class Schedule:
+    """
+    The occurrences of a rule whose first candidate starts at start and
+    which each last duration.
+
+    Occurrence starts are anchor + n * period + offsets[k]: for weekly rules
+    the anchor is the Monday of the first week and offsets are the BYDAY
+    weekdays; for daily rules both are trivial. Candidates in the first
+    period that fall before start are not occurrences.
+    """
+
+    def __init__(self, rule, start, duration):
+        start = start.astimezone(dt_timezone.utc)
+        self.rule = rule
+        self.start = start
+        self.duration = duration
+        self.period = timedelta(days=FREQUENCIES[rule.freq] * rule.interval)
+        if rule.freq == 'WEEKLY':
+            self.anchor = start - timedelta(days=start.weekday())
+            days = [WEEKDAYS.index(day) for day in rule.by_day] or [start.weekday()]
+        else:
+            self.anchor = start
+            days = [0]
+        self.offsets = [timedelta(days=day) for day in sorted(days)]
+        self.skip = bisect_left(self.offsets, start - self.anchor)
+
+        # Number of occurrences, or None if the series never ends
+        self.count = rule.count
+        if rule.until:
+            self.count = self.index_after(rule.until)
+
+    def index_after(self, moment):
+        """Index of the first occurrence (ignoring COUNT/UNTIL) starting after moment"""
+        if moment < self.start:
+            return 0
+        periods, rest = divmod(moment - self.anchor, self.period)
+        return periods * len(self.offsets) + bisect_right(self.offsets, rest) - self.skip
+
+    def occurrence(self, index):
+        """(start, end) of occurrence number index"""
+        periods, position = divmod(index + self.skip, len(self.offsets))
+        start = self.anchor + periods * self.period + self.offsets[position]
+        return start, start + self.duration
+
+    def between(self, start, end):
+        """Yield (start, end) of the occurrences overlapping [start, end), in order; end may be None"""
+        index = self.index_after(start - self.duration) if start else 0
+        while self.count is None or index < self.count:
+            occurrence = self.occurrence(index)
+            if end is not None and occurrence[0] >= end:
+                return
+            yield occurrence
+            index += 1
+
+    def find(self, moment):
+        """Index of the occurrence starting exactly at moment, or None"""
+        index = self.index_after(moment) - 1
+        if index < 0 or (self.count is not None and index >= self.count):
+            return None
+        return index if self.occurrence(index)[0] == moment else None
+
+    @property
+    def last_end(self):
+        """End of the last occurrence, or None if the series never ends"""
+        if self.count is None:
+            return None
+        return self.occurrence(self.count - 1)[1] if self.count else self.start
+
+    @property
+    def min_gap(self):
+        """Shortest time between two consecutive occurrence starts"""
+        offsets = self.offsets + [self.period + self.offsets[0]]
+        return min(later - earlier for earlier, later in zip(offsets, offsets[1:]))
+
+
+def first_clash(a, b):
+    """
+    The first pair of overlapping occurrences of two schedules, or None.
+
+    Once both have started, the pair repeats every lcm(a.period, b.period),
+    so a clash anywhere has a copy within one such span of the later start;
+    only that span is expanded, however long the series run.
+    """
+    reach = max(a.duration, b.duration)
+    start = max(a.start, b.start)
+    end = start + timedelta(days=math.lcm(a.period.days, b.period.days)) + reach
+    for last_end in (a.last_end, b.last_end):
+        if last_end is not None:
+            end = min(end, last_end)
+    if end <= start - reach:
+        return None
+
+    ours, theirs = a.between(start - reach, end), b.between(start - reach, end)
+    x, y = next(ours, None), next(theirs, None)
+    while x and y:
+        if x[0] < y[1] and y[0] < x[1]:
+            return x, y
+        # Neither stream overlaps itself, so whichever ends first is done
+        if x[1] <= y[1]:
+            x = next(ours, None)
+        else:
+            y = next(theirs, None)
+    return None
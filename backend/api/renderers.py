@@ -0,0 +1,24 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class CalendarExportRenderer(BaseRenderer):
+    """
+    Lets ?format= and Accept negotiate a calendar export format. Exports are
+    streamed by the view itself; only error payloads pass through render().
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode(self.charset)
+
+
+class ICalendarRenderer(CalendarExportRenderer):
+    media_type = 'text/calendar'
+    format = 'ics'
+
+
+class NDJSONRenderer(CalendarExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
@@ -1,8 +1,17 @@
+from django.conf import settings
 from rest_framework import serializers
-from django.contrib.auth import authenticate
+from rest_framework.settings import api_settings
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from .models import User, Event, SwapRequest
+from django.db import IntegrityError, transaction
+from .hashers import authenticate_password, hash_password
+from .models import (
+    User, Event, EventSeries, SwapPreference, SwapRequest,
+    check_series_overlaps, is_overlap_violation, lock_calendars
+)
+from .recurrence import RecurrenceRule, RuleError, Schedule
+
+OVERLAP_ERROR_MESSAGE = "This event overlaps with an existing event"
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -21,7 +30,13 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        user = User.objects.create_user(**validated_data)
+        password = validated_data.pop('password')
+        validated_data['email'] = User.objects.normalize_email(validated_data['email'])
+        validated_data['username'] = User.normalize_username(validated_data['username'])
+        # Same as create_user(), but with the hash computed in the bounded pool
+        user = User(**validated_data)
+        user.password = hash_password(password)
+        user.save()
         return user
 
 
@@ -35,7 +50,7 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get('password')
 
         if email and password:
-            user = authenticate(username=email, password=password)
+            user = authenticate_password(email, password)
             if not user:
                 raise serializers.ValidationError('Invalid email or password')
             if not user.is_active:
@@ -47,6 +62,11 @@ class UserLoginSerializer(serializers.Serializer):
         return attrs
 
 
+class TokenRefreshSerializer(serializers.Serializer):
+    """Serializer for refreshing JWT tokens"""
+    refresh_token = serializers.CharField()
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """Serializer for user profile"""
     class Meta:
@@ -67,9 +87,14 @@ class EventSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'title', 'description', 'start_time', 'end_time', 
             'status', 'owner', 'owner_email', 'owner_name', 
-            'duration_minutes', 'is_past', 'created_at', 'updated_at'
+            'duration_minutes', 'is_past', 'created_at', 'updated_at', 'version',
+            'series', 'recurrence_id'
         )
-        read_only_fields = ('id', 'owner', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'owner', 'created_at', 'updated_at', 'series', 'recurrence_id')
+        extra_kwargs = {
+            # On update, the version the client last read; a stale one gets a 409
+            'version': {'required': False},
+        }
 
     def get_owner_name(self, obj):
         return f"{obj.owner.first_name} {obj.owner.last_name}"
@@ -79,40 +104,120 @@ class EventSerializer(serializers.ModelSerializer):
         start_time = attrs.get('start_time')
         end_time = attrs.get('end_time')
 
-        # Only validate time fields if both are provided (for new events or when times are being updated)
-        if start_time and end_time:
-            if end_time <= start_time:
-                raise serializers.ValidationError("End time must be after start time")
-
         # For partial updates, use existing instance values if not provided
         if self.instance:
             start_time = start_time or self.instance.start_time
             end_time = end_time or self.instance.end_time
 
-        # Only check for overlapping events if we have valid times
         if start_time and end_time:
-            # Check for overlapping events for the same user
-            if self.instance:
-                # Updating existing event
-                overlapping = Event.objects.filter(
-                    owner=self.instance.owner,
-                    start_time__lt=end_time,
-                    end_time__gt=start_time
-                ).exclude(id=self.instance.id)
-            else:
-                # Creating new event
-                user = self.context['request'].user
-                overlapping = Event.objects.filter(
-                    owner=user,
-                    start_time__lt=end_time,
-                    end_time__gt=start_time
-                )
-
-            if overlapping.exists():
-                raise serializers.ValidationError("This event overlaps with an existing event")
+            if end_time <= start_time:
+                raise serializers.ValidationError("End time must be after start time")
+
+        # Overlaps are rejected by the event_owner_no_overlap exclusion
+        # constraint when the row is written, and overlaps with recurring
+        # events just before, see create()/update()
+        return attrs
+
+    def create(self, validated_data):
+        validated_data.pop('version', None)
+        span = (validated_data['owner'].id, validated_data['start_time'], validated_data['end_time'])
+        return self._save_checked([span], super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        """Compare-and-set only the fields that actually change"""
+        instance.version = validated_data.pop('version', instance.version)
+        changes = {
+            field: value for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        }
+        spans = []
+        if 'start_time' in changes or 'end_time' in changes:
+            spans.append((
+                instance.owner_id,
+                changes.get('start_time', instance.start_time),
+                changes.get('end_time', instance.end_time)
+            ))
+        return self._save_checked(spans, instance.compare_and_set, **changes)
+
+    def _save_checked(self, spans, save, *args, **kwargs):
+        """
+        Run save in a savepoint, after checking the new (owner id, start, end)
+        spans against recurring events, and map overlap violations to a
+        validation error
+        """
+        try:
+            with transaction.atomic():
+                if spans:
+                    lock_calendars(owner_id for owner_id, _, _ in spans)
+                    check_series_overlaps(spans)
+                return save(*args, **kwargs)
+        except IntegrityError as e:
+            if is_overlap_violation(e):
+                raise serializers.ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [OVERLAP_ERROR_MESSAGE]
+                })
+            raise
+
+
+class EventSeriesSerializer(serializers.ModelSerializer):
+    """Serializer for recurring events"""
+    owner_email = serializers.EmailField(source='owner.email', read_only=True)
+    owner_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = EventSeries
+        fields = (
+            'id', 'title', 'description', 'start_time', 'end_time', 'rrule',
+            'exdates', 'ends_at', 'owner', 'owner_email', 'owner_name',
+            'created_at', 'updated_at'
+        )
+        read_only_fields = ('id', 'exdates', 'ends_at', 'owner', 'created_at', 'updated_at')
 
+    def get_owner_name(self, obj):
+        return f"{obj.owner.first_name} {obj.owner.last_name}"
+
+    def validate_rrule(self, value):
+        try:
+            return str(RecurrenceRule.parse(value))
+        except RuleError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate(self, attrs):
+        """Validate the first occurrence and that occurrences fit between each other"""
+        start_time = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        rrule = attrs.get('rrule', getattr(self.instance, 'rrule', None))
+
+        if end_time <= start_time:
+            raise serializers.ValidationError("End time must be after start time")
+        schedule = Schedule(RecurrenceRule.parse(rrule), start_time, end_time - start_time)
+        if schedule.count == 0:
+            raise serializers.ValidationError({'rrule': ['The rule has no occurrences']})
+        if schedule.duration > schedule.min_gap:
+            raise serializers.ValidationError("Occurrences of this series would overlap each other")
         return attrs
 
+    def create(self, validated_data):
+        return self._save_checked(EventSeries(**validated_data))
+
+    def update(self, instance, validated_data):
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        # Only the fields given, so exdates added meanwhile are kept
+        return self._save_checked(instance, update_fields=[*validated_data, 'updated_at'])
+
+    def _save_checked(self, series, **kwargs):
+        """Save the series unless it overlaps the owner's events or other series"""
+        with transaction.atomic():
+            lock_calendars([series.owner_id])
+            clash = series.find_clash()
+            if clash:
+                raise serializers.ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [f'This series overlaps {clash}']
+                })
+            series.save(**kwargs)
+        return series
+
 
 class SwappableEventSerializer(serializers.ModelSerializer):
     """Serializer for swappable events (excludes owner's events)"""
@@ -146,11 +251,11 @@ class SwapRequestSerializer(serializers.ModelSerializer):
             'id', 'requester', 'receiver', 'requester_event', 'receiver_event',
             'requester_email', 'requester_name', 'receiver_email', 'receiver_name',
             'requester_event_details', 'receiver_event_details',
-            'status', 'message', 'created_at', 'updated_at', 'responded_at'
+            'status', 'message', 'created_at', 'updated_at', 'responded_at', 'cycle'
         )
         read_only_fields = (
             'id', 'requester', 'receiver', 'status', 'created_at', 
-            'updated_at', 'responded_at'
+            'updated_at', 'responded_at', 'cycle'
         )
 
     def get_requester_name(self, obj):
@@ -208,6 +313,57 @@ class CreateSwapRequestSerializer(serializers.Serializer):
         return attrs
 
 
+class SwapRequestItemSerializer(serializers.Serializer):
+    """One (my_slot, their_slot) pair of a bulk create; checked against the locked events in the view"""
+    my_slot_id = serializers.IntegerField()
+    their_slot_id = serializers.IntegerField()
+    message = serializers.CharField(required=False, allow_blank=True)
+
+
+class BulkCreateSwapRequestSerializer(serializers.Serializer):
+    """Serializer for creating many swap requests at once"""
+    requests = SwapRequestItemSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        limit = settings.SWAP_REQUEST_BULK_LIMIT
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} swap requests can be created at once")
+        return value
+
+
+class SwapPreferencesSerializer(serializers.Serializer):
+    """Ranked list of events the owner would accept in exchange for one of theirs"""
+    wanted_event_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=True, max_length=100
+    )
+
+    def validate_wanted_event_ids(self, value):
+        """All wanted events must be other users' swappable events"""
+        user = self.context['request'].user
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("Each event may only be listed once")
+        available = set(Event.objects.filter(
+            id__in=value, status=Event.StatusChoices.SWAPPABLE
+        ).exclude(owner=user).values_list('id', flat=True))
+        missing = [event_id for event_id in value if event_id not in available]
+        if missing:
+            raise serializers.ValidationError(
+                f"Events not available for swapping: {', '.join(map(str, missing))}"
+            )
+        return value
+
+    def save(self, offered_event):
+        """Replace the preferences declared for offered_event"""
+        wanted = self.validated_data['wanted_event_ids']
+        with transaction.atomic():
+            SwapPreference.objects.filter(offered_event=offered_event).delete()
+            SwapPreference.objects.bulk_create([
+                SwapPreference(offered_event=offered_event, wanted_event_id=event_id, rank=rank)
+                for rank, event_id in enumerate(wanted)
+            ])
+        return wanted
+
+
 class SwapResponseSerializer(serializers.Serializer):
     """Serializer for responding to swap requests"""
     accept = serializers.BooleanField()
\ No newline at end of file
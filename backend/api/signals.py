@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import freebusy
+from .authentication import user_cache
+from .models import Event, EventSeries, SwapRequest
+from .versioning import bump_on_commit
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, created=False, **kwargs):
+    """Drop the cached auth record on profile, password or is_active changes"""
+    user_cache.invalidate(instance.pk)
+    if not created:
+        # Names and emails are embedded in the marketplace, calendar and swap lists
+        bump_on_commit('marketplace', 'users', f'events:{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=Event)
+def invalidate_event_versions(sender, instance, created=False, **kwargs):
+    scopes = ['marketplace', f'events:{instance.owner_id}']
+    if not created and kwargs['signal'] is post_save:
+        # Swap lists embed event details; deletes cascade to SwapRequest signals
+        scopes += [f'swaps:{user_id}' for user_id in SwapRequest.parties_for_events([instance.pk])]
+    bump_on_commit(*scopes)
+
+
+@receiver([post_save, post_delete], sender=Event)
+def refresh_event_freebusy(sender, instance, **kwargs):
+    """Recompute the free/busy days the event left and the ones it now covers"""
+    stored = getattr(instance, 'stored_span', None)
+    current = None
+    if kwargs['signal'] is post_save:
+        current = (instance.owner_id, instance.start_time, instance.end_time)
+    if current != stored:
+        freebusy.refresh([span for span in (stored, current) if span])
+        instance.stored_span = current
+
+
+@receiver([post_save, post_delete], sender=EventSeries)
+def invalidate_series_versions(sender, instance, **kwargs):
+    # Occurrences are part of the owner's (windowed) event list
+    bump_on_commit(f'events:{instance.owner_id}')
+
+
+@receiver([post_save, post_delete], sender=SwapRequest)
+def invalidate_swap_versions(sender, instance, **kwargs):
+    bump_on_commit(f'swaps:{instance.requester_id}', f'swaps:{instance.receiver_id}')
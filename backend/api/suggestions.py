@@ -0,0 +1,149 @@
+"""
+Ranked marketplace suggestions for an offered event.
+
+Each SWAPPABLE slot is scored on how close its start is to the offered
+event's, how well its length matches, and how often its owner has accepted
+swap requests before:
+
+    W_TIME / (1 + |start - offered start| / PROXIMITY_SCALE)
+    + W_DURATION * shorter / longer duration
+    + W_ACCEPTANCE * (accepted + 1) / (answered + 2)
+
+The slots are held as parallel arrays built once per marketplace version
+(Columns), and scored a block at a time around the offered start. The time
+term only shrinks moving away from it, so once the best score anything
+further out could reach is below the K-th best kept in the heap, the rest
+is never scored. Results are cached per (event, marketplace version).
+"""
+import heapq
+import math
+import time
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .marketplace import cached_slots, get_cache, marketplace_version
+from .models import SwapRequest
+
+W_TIME = 0.5
+W_DURATION = 0.3
+W_ACCEPTANCE = 0.2
+PROXIMITY_SCALE = timedelta(hours=24)
+# Slots scored on each side of the offered start in the first round; doubles every round
+FIRST_BLOCK = 256
+
+SUGGESTIONS_KEY = 'marketplace:suggestions:{event}:{event_version}:{version}'
+
+_columns = None
+
+
+def acceptance_rates(user_ids):
+    """
+    {user id: share of the swap requests they answered that they accepted},
+    smoothed so users who never answered one start at 0.5
+    """
+    answered = SwapRequest.objects.filter(
+        receiver__in=user_ids,
+        status__in=[SwapRequest.StatusChoices.ACCEPTED, SwapRequest.StatusChoices.REJECTED]
+    ).values('receiver').annotate(
+        accepted=Count('id', filter=Q(status=SwapRequest.StatusChoices.ACCEPTED)), answered=Count('id')
+    )
+    rates = dict.fromkeys(user_ids, 0.5)
+    for row in answered:
+        rates[row['receiver']] = (row['accepted'] + 1) / (row['answered'] + 2)
+    return rates
+
+
+class Columns:
+    """The slots of one marketplace version as parallel arrays, in start order"""
+
+    def __init__(self, version, slots, rates):
+        self.version = version
+        self.slots = slots
+        self.starts = array('d', [slot[1] for slot in slots])
+        self.ends = array('d', [slot[2] for slot in slots])
+        self.durations = array('d', [slot[2] - slot[1] for slot in slots])
+        self.owners = array('q', [slot[0] for slot in slots])
+        # Weighted once here rather than per request
+        weighted = {owner: W_ACCEPTANCE * rate for owner, rate in rates.items()}
+        self.acceptance = array('d', [weighted[slot[0]] for slot in slots])
+        self.best_acceptance = max(self.acceptance, default=0)
+
+    @classmethod
+    def for_version(cls, version):
+        """Columns of a marketplace version, kept per process until the version moves"""
+        global _columns
+        columns = _columns
+        if columns is None or columns.version != version:
+            slots = cached_slots(version)
+            rates = acceptance_rates({slot[0] for slot in slots}) if slots else {}
+            columns = _columns = cls(version, slots, rates)
+        return columns
+
+    def score(self, lo, hi, start, duration, exclude_owner, now):
+        """(score, index) of the live slots in [lo, hi) not owned by exclude_owner"""
+        inverse_scale = 1 / PROXIMITY_SCALE.total_seconds()
+        return [
+            (W_TIME / (1 + abs(slot_start - start) * inverse_scale)
+             + W_DURATION * (slot_duration / duration if slot_duration < duration else duration / slot_duration)
+             + acceptance, index)
+            for slot_start, slot_duration, slot_end, owner, acceptance, index in zip(
+                self.starts[lo:hi], self.durations[lo:hi], self.ends[lo:hi],
+                self.owners[lo:hi], self.acceptance[lo:hi], range(lo, hi)
+            )
+            if owner != exclude_owner and slot_end > now
+        ]
+
+    def top(self, start, duration, exclude_owner, limit, now):
+        """
+        The limit best (score, index) pairs, best first. Scores blocks of
+        growing size outwards from start, stopping once nothing unscored
+        can beat the worst of the limit kept.
+        """
+        starts = self.starts
+        left = right = bisect_left(starts, start)
+        ceiling = W_DURATION + self.best_acceptance
+        inverse_scale = 1 / PROXIMITY_SCALE.total_seconds()
+        best = []
+        block = FIRST_BLOCK
+        while left > 0 or right < len(starts):
+            nearest = min(
+                start - starts[left - 1] if left > 0 else math.inf,
+                starts[right] - start if right < len(starts) else math.inf
+            )
+            if len(best) == limit and W_TIME / (1 + nearest * inverse_scale) + ceiling <= best[-1][0]:
+                break
+            lo, hi = max(0, left - block), min(len(starts), right + block)
+            candidates = best + self.score(lo, left, start, duration, exclude_owner, now)
+            candidates += self.score(right, hi, start, duration, exclude_owner, now)
+            best = heapq.nlargest(limit, candidates)
+            left, right = lo, hi
+            block *= 2
+        return best
+
+
+def suggestions_for(event, limit):
+    """
+    The limit best marketplace slots to swap event for, as serialized slots
+    with their score, best first. The ranking for SUGGESTIONS_MAX_LIMIT
+    slots is cached per (event, marketplace version); slots that have ended
+    since are dropped when read.
+    """
+    cache = get_cache()
+    version = marketplace_version()
+    key = SUGGESTIONS_KEY.format(event=event.id, event_version=event.version, version=version)
+    ranked = cache.get(key)
+    if ranked is None:
+        columns = Columns.for_version(version)
+        top = columns.top(
+            event.start_time.timestamp(), (event.end_time - event.start_time).total_seconds(),
+            exclude_owner=event.owner_id, limit=settings.SUGGESTIONS_MAX_LIMIT, now=time.time()
+        )
+        ranked = [(round(score, 4), columns.slots[index][2], columns.slots[index][3]) for score, index in top]
+        cache.set(key, ranked, timeout=settings.MARKETPLACE_CACHE_TTL)
+
+    now = time.time()
+    return [{**data, 'score': score} for score, end, data in ranked if end > now][:limit]
@@ -1,3 +1,1631 @@
-from django.test import TestCase
+import asyncio
+import heapq
+import json
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.db.models import F
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlencode
+from django.utils import timezone
+import jwt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from .authentication import (
+    auser_for_stream_ticket, generate_stream_ticket, generate_tokens, revoke_token, user_cache
+)
+from .hashers import password_hash_pool
+from .calendar_io import parse_ics, parse_jsonl
+from .freebusy import day_bits, from_bytes, rebuild, runs
+from .marketplace import exclude_clashing, marketplace_version, without_clashes
+from .matching import find_swap_cycles, load_preferences, run_matching
+from .notifications import LocalBroker, format_sse
+from .recurrence import RecurrenceRule, RuleError, Schedule, first_clash
+from .suggestions import Columns
+from .views import in_window, notification_stream, search
+from .models import User, Event, EventSeries, FreeBusyDay, SwapConflict, SwapPreference, SwapRequest
+
+
+def seed_events(users, count):
+    """Bulk-insert count non-overlapping events spread over users, then ANALYZE"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO api_event (title, start_time, end_time, status, owner_id, created_at, updated_at, version)
+            SELECT
+                'Seed ' || g,
+                now() - interval '20 days' + (g / %(users)s) * interval '1 hour',
+                now() - interval '20 days' + (g / %(users)s) * interval '1 hour' + interval '30 minutes',
+                CASE WHEN g %% 10 = 0 THEN 'SWAPPABLE' ELSE 'BUSY' END,
+                (%(ids)s::bigint[])[1 + g %% %(users)s],
+                now(), now(), 0
+            FROM generate_series(0, %(count)s - 1) AS g
+        """, {'users': len(users), 'ids': [u.id for u in users], 'count': count})
+        cursor.execute("""
+            INSERT INTO api_swaprequest (requester_id, receiver_id, requester_event_id, receiver_event_id,
+                                         status, created_at, updated_at)
+            SELECT a.owner_id, b.owner_id, a.id, b.id, 'REJECTED',
+                   now() - (a.id %% 10000) * interval '1 minute', now()
+            FROM api_event a JOIN api_event b ON b.id = a.id + 1
+            WHERE a.id %% 10 = 0 AND a.owner_id <> b.owner_id
+        """)
+        cursor.execute('ANALYZE api_event')
+        cursor.execute('ANALYZE api_swaprequest')
+
+
+class APITestCase(TestCase):
+    """Shared fixtures and helpers for API tests"""
+
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        cache.clear()
+
+    def make_user(self, name):
+        return User.objects.create_user(
+            email=f'{name}@example.com',
+            username=name,
+            first_name=name.title(),
+            last_name='Test',
+            password='SecurePassword123!'
+        )
+
+    def make_events(self, owner, count, status=Event.StatusChoices.SWAPPABLE, offset_hours=0):
+        start = timezone.now() + timedelta(days=1, hours=offset_hours)
+        return Event.objects.bulk_create([
+            Event(
+                title=f'{owner.first_name} slot {i}',
+                start_time=start + timedelta(hours=2 * i),
+                end_time=start + timedelta(hours=2 * i + 1),
+                status=status,
+                owner=owner
+            )
+            for i in range(count)
+        ])
+
+    def client_for(self, user):
+        client = APIClient()
+        token = generate_tokens(user)['access_token']
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def assertMaxQueries(self, limit, func):
+        """Run func and fail if it issues more than limit queries"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = func()
+        executed = len(ctx.captured_queries)
+        self.assertLessEqual(
+            executed, limit,
+            f'{executed} queries executed, expected at most {limit}:\n' +
+            '\n'.join(q['sql'] for q in ctx.captured_queries)
+        )
+        return response
+
+
+class QueryCountTests(APITestCase):
+    """List endpoints must run a fixed number of queries regardless of row count"""
+
+    # Auth lookups plus the list query itself
+    LIST_QUERY_BUDGET = 4
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.client = self.client_for(self.alice)
+
+    def test_event_list(self):
+        self.make_events(self.alice, 25, status=Event.StatusChoices.BUSY)
+        response = self.assertMaxQueries(
+            self.LIST_QUERY_BUDGET,
+            lambda: self.client.get(reverse('api:event_list_create'))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 25)
+
+    def test_swappable_slots(self):
+        self.make_events(self.bob, 25)
+        self.make_events(self.make_user('carol'), 25, offset_hours=1)
+        response = self.assertMaxQueries(
+            self.LIST_QUERY_BUDGET,
+            lambda: self.client.get(reverse('api:swappable_slots'))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 50)
+
+    def test_swap_request_lists(self):
+        mine = self.make_events(self.alice, 10)
+        theirs = self.make_events(self.bob, 10, offset_hours=1)
+        SwapRequest.objects.bulk_create([
+            SwapRequest(
+                requester=self.alice, receiver=self.bob,
+                requester_event=a, receiver_event=b
+            )
+            for a, b in zip(mine, theirs)
+        ])
+
+        response = self.assertMaxQueries(
+            self.LIST_QUERY_BUDGET,
+            lambda: self.client.get(reverse('api:outgoing_swap_requests'))
+        )
+        self.assertEqual(len(response.json()), 10)
+
+        response = self.assertMaxQueries(
+            self.LIST_QUERY_BUDGET,
+            lambda: self.client_for(self.bob).get(reverse('api:incoming_swap_requests'))
+        )
+        self.assertEqual(len(response.json()), 10)
+
+    def test_swap_request_list_filtered_page(self):
+        mine = self.make_events(self.alice, 30)
+        theirs = self.make_events(self.bob, 30, offset_hours=1)
+        SwapRequest.objects.bulk_create([
+            SwapRequest(
+                requester=self.alice, receiver=self.bob,
+                requester_event=a, receiver_event=b,
+                status=SwapRequest.StatusChoices.PENDING if i % 2 else SwapRequest.StatusChoices.REJECTED
+            )
+            for i, (a, b) in enumerate(zip(mine, theirs))
+        ])
+
+        url = reverse('api:outgoing_swap_requests') + '?status=PENDING&page_size=10'
+        response = self.assertMaxQueries(self.LIST_QUERY_BUDGET, lambda: self.client.get(url))
+        body = response.json()
+        self.assertEqual(len(body['results']), 10)
+        self.assertTrue(all(item['status'] == 'PENDING' for item in body['results']))
+
+        response = self.assertMaxQueries(self.LIST_QUERY_BUDGET, lambda: self.client.get(body['next']))
+        body = response.json()
+        self.assertEqual(len(body['results']), 5)
+        self.assertIsNone(body['next'])
+
+    def test_swap_request_list_rejects_unknown_status(self):
+        response = self.client.get(reverse('api:incoming_swap_requests') + '?status=MAYBE')
+        self.assertEqual(response.status_code, 400)
+
+
+class QueryPlanTests(APITestCase):
+    """The hot queries must be answered by index scans on a large table"""
+
+    SEED_EVENTS = 1_000_000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([
+            User(email=f'seed{i}@example.com', username=f'seed{i}',
+                 first_name='Seed', last_name=str(i), password='!')
+            for i in range(1000)
+        ])
+        seed_events(cls.users, cls.SEED_EVENTS)
+
+    def assertIndexScan(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+        self.assertNotIn('Seq Scan', plan, plan)
+
+    def test_marketplace(self):
+        queryset = Event.objects.filter(
+            status=Event.StatusChoices.SWAPPABLE,
+            end_time__gt=timezone.now()
+        ).exclude(owner=self.users[0]).order_by('start_time', 'id')[:51]
+        self.assertIndexScan(queryset, 'event_swappable_start_idx')
+
+    def test_overlap_check(self):
+        start = timezone.now()
+        queryset = Event.objects.filter(
+            owner=self.users[0],
+            start_time__lt=start + timedelta(hours=1),
+            end_time__gt=start
+        ).values('id')[:1]
+        self.assertIndexScan(queryset, 'event_owner_start_idx')
+
+    def test_marketplace_window(self):
+        # Seeded slots lie 20 days in the past; ask for one day among them
+        start = timezone.now() - timedelta(days=15)
+        queryset = in_window(
+            Event.objects.filter(status=Event.StatusChoices.SWAPPABLE).exclude(owner=self.users[0]),
+            start, start + timedelta(days=1)
+        ).order_by('start_time', 'id')[:51]
+        self.assertIndexScan(queryset, 'event_swappable_span_idx')
+
+    def test_compatible_anti_join(self):
+        queryset = exclude_clashing(
+            Event.objects.filter(status=Event.StatusChoices.SWAPPABLE).exclude(owner=self.users[0]),
+            self.users[0]
+        ).order_by('start_time', 'id')[:51]
+        plan = queryset.explain()
+        self.assertIn('event_owner_no_overlap', plan, plan)
+
+    def test_marketplace_search(self):
+        queryset = search(
+            Event.objects.filter(status=Event.StatusChoices.SWAPPABLE).exclude(owner=self.users[0]), '12340'
+        ).order_by('start_time', 'id')[:51]
+        plan = queryset.explain()
+        self.assertIn('event_swappable_search_idx', plan, plan)
+        self.assertIn('event_swappable_title_trgm_idx', plan, plan)
+        self.assertNotIn('Seq Scan', plan, plan)
+
+    def test_calendar_window(self):
+        start = timezone.now() - timedelta(days=15)
+        queryset = in_window(Event.objects.filter(owner=self.users[0]), start, start + timedelta(days=7))
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan, plan)
+
+    def test_swap_request_lists(self):
+        incoming = SwapRequest.objects.filter(receiver=self.users[1]).order_by('-created_at', '-id')[:51]
+        self.assertIndexScan(incoming, 'swaprequest_receiver_idx')
+        outgoing = SwapRequest.objects.filter(requester=self.users[0]).order_by('-created_at', '-id')[:51]
+        self.assertIndexScan(outgoing, 'swaprequest_requester_idx')
+
+
+class OverlapConstraintTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.client = self.client_for(self.alice)
+
+    def post_event(self, start, hours=1):
+        return self.client.post(reverse('api:event_list_create'), {
+            'title': 'Focus Block',
+            'start_time': start.isoformat(),
+            'end_time': (start + timedelta(hours=hours)).isoformat(),
+        }, format='json')
+
+    def test_overlapping_create_is_rejected(self):
+        start = timezone.now() + timedelta(days=2)
+        self.assertEqual(self.post_event(start).status_code, 201)
+        response = self.post_event(start + timedelta(minutes=30))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(),
+            {'non_field_errors': ['This event overlaps with an existing event']}
+        )
+        # Back-to-back events do not overlap
+        self.assertEqual(self.post_event(start + timedelta(hours=1)).status_code, 201)
+
+    def test_accept_swaps_overlapping_pair(self):
+        mine = self.make_events(self.alice, 1)[0]
+        theirs = self.make_events(self.bob, 1)[0]
+        swap_request = SwapRequest.objects.create(
+            requester=self.alice, receiver=self.bob,
+            requester_event=mine, receiver_event=theirs
+        )
+        response = self.client_for(self.bob).post(
+            reverse('api:respond_to_swap_request', args=[swap_request.id]),
+            {'accept': True}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual(mine.owner, self.bob)
+        self.assertEqual(theirs.owner, self.alice)
+
+    def test_accept_rejects_swap_into_clash(self):
+        mine = self.make_events(self.alice, 1, offset_hours=1)[0]
+        theirs = self.make_events(self.bob, 1)[0]
+        # Alice already has a busy event at the time of Bob's slot
+        self.make_events(self.alice, 1, status=Event.StatusChoices.BUSY, offset_hours=-0.5)
+        swap_request = SwapRequest.objects.create(
+            requester=self.alice, receiver=self.bob,
+            requester_event=mine, receiver_event=theirs
+        )
+        response = self.client_for(self.bob).post(
+            reverse('api:respond_to_swap_request', args=[swap_request.id]),
+            {'accept': True}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.owner, self.bob)
+
+
+class UserCacheTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.client = self.client_for(self.alice)
+
+    def test_repeat_requests_hit_cache(self):
+        self.client.get(reverse('api:profile'))
+        stats = user_cache.stats()
+        self.assertEqual(stats['misses'], 1)
+        response = self.assertMaxQueries(0, lambda: self.client.get(reverse('api:profile')))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(user_cache.stats()['hits'], stats['hits'])
+
+    def test_profile_update_invalidates(self):
+        self.client.get(reverse('api:profile'))
+        self.client.put(reverse('api:profile'), {'first_name': 'Alicia'}, format='json')
+        self.assertEqual(self.client.get(reverse('api:profile')).json()['first_name'], 'Alicia')
+
+    def test_deactivation_invalidates(self):
+        self.client.get(reverse('api:profile'))
+        self.alice.is_active = False
+        self.alice.save()
+        self.assertEqual(user_cache.stats()['size'], 0)
+
+
+class SinglePassAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+
+    def test_token_verified_once_per_request(self):
+        with mock.patch('api.authentication.jwt.decode', wraps=jwt.decode) as decode:
+            response = self.client_for(self.alice).get(reverse('api:profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_invalid_token_still_rejected(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        with mock.patch('api.authentication.jwt.decode', wraps=jwt.decode) as decode:
+            response = client.get(reverse('api:profile'))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(decode.call_count, 1)
+
+
+class TokenRefreshTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.tokens = generate_tokens(self.alice)
+
+    def refresh(self, token):
+        return APIClient().post(reverse('api:refresh'), {'refresh_token': token}, format='json')
+
+    def test_refresh_rotates_tokens(self):
+        with mock.patch('django.contrib.auth.base_user.check_password') as check_password:
+            response = self.refresh(self.tokens['refresh_token'])
+        self.assertEqual(response.status_code, 200)
+        check_password.assert_not_called()
+        tokens = response.json()['tokens']
+        self.assertNotEqual(tokens['refresh_token'], self.tokens['refresh_token'])
+        profile = APIClient()
+        profile.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access_token']}")
+        self.assertEqual(profile.get(reverse('api:profile')).status_code, 200)
+
+    def test_refresh_token_is_single_use(self):
+        self.assertEqual(self.refresh(self.tokens['refresh_token']).status_code, 200)
+        self.assertEqual(self.refresh(self.tokens['refresh_token']).status_code, 401)
+
+    def test_revocations_are_not_evicted(self):
+        first = jwt.decode(self.tokens['refresh_token'], options={'verify_signature': False})
+        self.assertTrue(revoke_token(first))
+        for _ in range(400):
+            payload = jwt.decode(generate_tokens(self.alice)['refresh_token'], options={'verify_signature': False})
+            self.assertTrue(revoke_token(payload))
+        self.assertFalse(revoke_token(first))
+        self.assertEqual(self.refresh(self.tokens['refresh_token']).status_code, 401)
+
+    def test_token_types_are_not_interchangeable(self):
+        self.assertEqual(self.refresh(self.tokens['access_token']).status_code, 401)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['refresh_token']}")
+        self.assertEqual(client.get(reverse('api:profile')).status_code, 403)
+
+
+class PasswordHashingTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+
+    def login(self):
+        return APIClient().post(reverse('api:login'), {
+            'email': 'alice@example.com', 'password': 'SecurePassword123!'
+        }, format='json')
+
+    def test_login_upgrades_legacy_hash(self):
+        hasher = PBKDF2PasswordHasher()
+        self.alice.password = hasher.encode('SecurePassword123!', hasher.salt())
+        self.alice.save()
+
+        self.assertEqual(self.login().status_code, 200)
+        self.alice.refresh_from_db()
+        self.assertTrue(self.alice.password.startswith('scrypt$'))
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_wrong_password(self):
+        response = APIClient().post(reverse('api:login'), {
+            'email': 'alice@example.com', 'password': 'nope'
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_login_rejected_when_pool_is_saturated(self):
+        with mock.patch.object(password_hash_pool, '_slots') as slots:
+            slots.acquire.return_value = False
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+
+
+class MarketplaceCacheTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+
+    def test_cache_shared_between_users_with_own_slots_excluded(self):
+        alice_slot = self.make_events(self.alice, 1)[0]
+        bob_slot = self.make_events(self.bob, 1, offset_hours=1)[0]
+        self.client_for(self.alice).get(reverse('api:swappable_slots'))
+
+        # Bob is served from the cache built for Alice, minus his own slot
+        bob_client = self.client_for(self.bob)
+        bob_client.get(reverse('api:profile'))
+        response = self.assertMaxQueries(0, lambda: bob_client.get(reverse('api:swappable_slots')))
+        self.assertEqual([item['id'] for item in response.json()], [alice_slot.id])
+        self.assertNotIn(bob_slot.id, [item['id'] for item in response.json()])
+
+    def test_event_change_invalidates_on_commit(self):
+        slot = self.make_events(self.bob, 1)[0]
+        client = self.client_for(self.alice)
+        self.assertEqual(len(client.get(reverse('api:swappable_slots')).json()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            slot.status = Event.StatusChoices.BUSY
+            slot.save()
+        self.assertEqual(client.get(reverse('api:swappable_slots')).json(), [])
+
+    def test_swap_request_transitions_invalidate(self):
+        mine = self.make_events(self.alice, 1)[0]
+        theirs = self.make_events(self.bob, 1, offset_hours=1)[0]
+        swap_request = SwapRequest.objects.create(
+            requester=self.alice, receiver=self.bob,
+            requester_event=mine, receiver_event=theirs
+        )
+        version = marketplace_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            swap_request.reject()
+        self.assertNotEqual(marketplace_version(), version)
+
+
+class WithoutClashesTests(SimpleTestCase):
+
+    def test_sweep(self):
+        blocking = [[2, 4], [6, 7], [10, 12]]
+        items = [(0, 2), (1, 3), (4, 6), (5, 8), (7, 9), (9, 10), (11, 13), (12, 14)]
+        self.assertEqual(
+            without_clashes(items, blocking, span=lambda item: item),
+            [(0, 2), (4, 6), (7, 9), (9, 10), (12, 14)]
+        )
+        self.assertEqual(without_clashes(items, [], span=lambda item: item), items)
+
+
+class CompatibleSlotsTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.client = self.client_for(self.alice)
+        # Bob offers hour-long slots at day+1, +2h, +4h, +6h
+        self.slots = self.make_events(self.bob, 4)
+        self.start = self.slots[0].start_time
+
+    def at(self, hours):
+        return self.start + timedelta(hours=hours)
+
+    def ids(self, **params):
+        response = self.client.get(reverse('api:swappable_slots'), {'compatible': 'true', **params})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [item['id'] for item in (body['results'] if 'results' in body else body)]
+
+    def test_busy_events_and_occurrences_block(self):
+        Event.objects.create(title='Busy', owner=self.alice, start_time=self.at(0.5), end_time=self.at(1.5))
+        Event.objects.create(title='Offered', owner=self.alice, status=Event.StatusChoices.SWAPPABLE,
+                             start_time=self.at(2.5), end_time=self.at(3))
+        EventSeries.objects.create(
+            title='Weekly', owner=self.alice, start_time=self.at(6 - 7 * 24), end_time=self.at(6.5 - 7 * 24),
+            rrule='FREQ=WEEKLY'
+        )
+        expected = [self.slots[1].id, self.slots[2].id]
+        self.assertEqual(self.ids(), expected)
+        self.assertEqual(self.ids(page_size=10), expected)
+        # Without the flag nothing is filtered
+        self.assertEqual(len(self.client.get(reverse('api:swappable_slots')).json()), 4)
+
+    def test_etag_follows_own_calendar(self):
+        url = reverse('api:swappable_slots') + '?compatible=true'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('api:event_list_create'), {
+                'title': 'Busy', 'start_time': self.at(2).isoformat(), 'end_time': self.at(3).isoformat()
+            }, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(self.slots[1].id, [item['id'] for item in response.json()])
+
+
+class SuggestionRankingTests(SimpleTestCase):
+
+    def test_pruned_scan_matches_full_scan(self):
+        rng = random.Random(1)
+        slots = sorted(
+            ((rng.randrange(20), start, start + rng.choice([1800, 3600]), {'id': i})
+             for i, start in enumerate(rng.uniform(0, 90 * 86400) for _ in range(5000))),
+            key=lambda slot: slot[1]
+        )
+        columns = Columns(0, slots, {owner: rng.random() for owner in range(20)})
+        for start in (-86400, 0, 45 * 86400, 100 * 86400):
+            top = columns.top(start, 3600, exclude_owner=3, limit=25, now=0)
+            self.assertEqual(len(top), 25)
+            self.assertEqual(top, heapq.nlargest(25, columns.score(0, len(slots), start, 3600, 3, now=0)))
+            self.assertNotIn(3, {slots[index][0] for score, index in top})
+
+    def test_ended_slots_are_skipped(self):
+        columns = Columns(0, [(1, 0, 3600, {}), (1, 7200, 10800, {})], {1: 0.5})
+        self.assertEqual([index for score, index in columns.top(0, 3600, 2, limit=5, now=3600)], [1])
+
+
+class EventSuggestionTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.carol = self.make_user('carol')
+        self.client = self.client_for(self.alice)
+        self.start = (timezone.now() + timedelta(days=3)).replace(microsecond=0)
+        self.offered = self.slot(self.alice, 0, 1)
+
+    def slot(self, owner, hours, length):
+        return Event.objects.create(
+            title='Slot', owner=owner, status=Event.StatusChoices.SWAPPABLE,
+            start_time=self.start + timedelta(hours=hours), end_time=self.start + timedelta(hours=hours + length)
+        )
+
+    def suggest(self, event=None, **params):
+        return self.client.get(reverse('api:event_suggestions', args=[(event or self.offered).id]), params)
+
+    def test_ranking(self):
+        far = self.slot(self.bob, 72, 1)
+        long = self.slot(self.bob, 2, 3)
+        close = self.slot(self.carol, 2, 1)
+        self.slot(self.alice, 5, 1)
+        body = self.suggest().json()
+        self.assertEqual([item['id'] for item in body], [close.id, long.id, far.id])
+        self.assertGreater(body[0]['score'], body[1]['score'])
+        self.assertEqual([item['id'] for item in self.suggest(limit=1).json()], [close.id])
+
+    def test_acceptance_history_breaks_ties(self):
+        bobs = self.slot(self.bob, 2, 1)
+        carols = self.slot(self.carol, -2, 1)
+        for owner, slot, answer in ((self.bob, bobs, 'REJECTED'), (self.carol, carols, 'ACCEPTED')):
+            SwapRequest.objects.create(
+                requester=self.alice, receiver=owner, requester_event=self.slot(self.alice, 10 + slot.id, 1),
+                receiver_event=slot, status=answer
+            )
+        self.assertEqual([item['id'] for item in self.suggest().json()], [carols.id, bobs.id])
+
+    def test_cached_per_marketplace_version(self):
+        self.slot(self.bob, 2, 1)
+        self.assertEqual(len(self.suggest().json()), 1)
+        response = self.assertMaxQueries(1, self.suggest)
+        self.assertEqual(len(response.json()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot(self.carol, 4, 1)
+        self.assertEqual(len(self.suggest().json()), 2)
+
+    def test_only_own_swappable_events(self):
+        busy = Event.objects.create(title='Busy', owner=self.alice, start_time=self.start + timedelta(hours=30),
+                                    end_time=self.start + timedelta(hours=31))
+        self.assertEqual(self.suggest(busy).status_code, 400)
+        self.assertEqual(self.suggest(self.slot(self.bob, 2, 1)).status_code, 404)
+        self.assertEqual(self.suggest(limit='many').status_code, 400)
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Keep the clock bucket fixed so ETags only move with the data
+        patcher = mock.patch('api.views.time_bucket', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.client = self.client_for(self.alice)
+
+    def test_unchanged_list_returns_304_without_queries(self):
+        for name in ('event_list_create', 'swappable_slots', 'incoming_swap_requests', 'outgoing_swap_requests'):
+            url = reverse(f'api:{name}')
+            etag = self.client.get(url)['ETag']
+            self.assertTrue(etag.startswith('W/"'))
+            response = self.assertMaxQueries(0, lambda: self.client.get(url, HTTP_IF_NONE_MATCH=etag))
+            self.assertEqual(response.status_code, 304, name)
+
+    def test_write_changes_etag(self):
+        url = reverse('api:event_list_create')
+        etag = self.client.get(url)['ETag']
+        start = timezone.now() + timedelta(days=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {
+                'title': 'New', 'start_time': start.isoformat(),
+                'end_time': (start + timedelta(hours=1)).isoformat()
+            }, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+    def test_etag_is_per_user(self):
+        url = reverse('api:swappable_slots')
+        etag = self.client.get(url)['ETag']
+        response = self.client_for(self.bob).get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class AsyncReadViewTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        bob_events = self.make_events(self.bob, 3)
+        alice_event, = self.make_events(self.alice, 1, status=Event.StatusChoices.BUSY)
+        SwapRequest.objects.create(
+            requester=self.bob, receiver=self.alice,
+            requester_event=bob_events[0], receiver_event=alice_event
+        )
+        token = generate_tokens(self.alice)['access_token']
+        self.headers = {'Authorization': f'Bearer {token}'}
+        self.sync_client = self.client_for(self.alice)
+
+    async def test_marketplace_and_conditional_get(self):
+        url = reverse('api:swappable_slots')
+        response = await self.async_client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+        response = await self.async_client.get(
+            url, headers={**self.headers, 'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_swap_requests_match_sync_views(self):
+        url = reverse('api:incoming_swap_requests')
+        for query in ('', '?page_size=10', '?status=PENDING', '?status=BOGUS'):
+            response = await self.async_client.get(url + query, headers=self.headers)
+            expected = await sync_to_async(self.sync_client.get)(url + query)
+            self.assertEqual(response.status_code, expected.status_code, query)
+            self.assertEqual(response.json(), expected.json(), query)
+        response = await self.async_client.get(url + '?page_size=10', headers=self.headers)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    async def test_requires_token(self):
+        for name in ('profile', 'swappable_slots', 'outgoing_swap_requests'):
+            response = await self.async_client.get(reverse(f'api:{name}'))
+            self.assertEqual(response.status_code, 403, name)
+
+
+class LocalBrokerTests(SimpleTestCase):
+
+    async def test_publish_from_thread_reaches_subscriber(self):
+        broker = LocalBroker()
+        async with broker.subscribe(1) as queue:
+            await sync_to_async(broker.publish, thread_sensitive=False)(1, {'type': 'swap_request.created'})
+            await sync_to_async(broker.publish, thread_sensitive=False)(2, {'type': 'other_user'})
+            message = await asyncio.wait_for(queue.get(), timeout=1)
+        self.assertEqual(message, {'type': 'swap_request.created'})
+        self.assertTrue(queue.empty())
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    def test_sse_frame(self):
+        frame = format_sse({'type': 'swap_request.accepted', 'swap_request_id': 3})
+        self.assertTrue(frame.startswith('event: swap_request.accepted\ndata: {'))
+        self.assertTrue(frame.endswith('\n\n'))
+
+
+class SwapNotificationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.publish = mock.patch('api.notifications.broker.publish').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def published(self):
+        return {(call.args[0], call.args[1]['type']) for call in self.publish.call_args_list}
+
+    def test_create_and_accept_notify_both_parties(self):
+        mine = self.make_events(self.alice, 1)[0]
+        theirs = self.make_events(self.bob, 1, offset_hours=1)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.alice).post(reverse('api:create_swap_request'), {
+                'my_slot_id': mine.id, 'their_slot_id': theirs.id
+            }, format='json')
+        swap_request_id = response.json()['swap_request']['id']
+        self.assertIn((self.bob.id, 'swap_request.created'), self.published())
+
+        self.publish.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_for(self.bob).post(
+                reverse('api:respond_to_swap_request', args=[swap_request_id]),
+                {'accept': True}, format='json'
+            )
+        self.assertEqual(self.published(), {
+            (self.alice.id, 'swap_request.accepted'), (self.bob.id, 'swap_request.accepted')
+        })
+
+    def test_nothing_published_before_commit(self):
+        mine = self.make_events(self.alice, 1)[0]
+        theirs = self.make_events(self.bob, 1, offset_hours=1)[0]
+        swap_request = SwapRequest.objects.create(
+            requester=self.alice, receiver=self.bob,
+            requester_event=mine, receiver_event=theirs
+        )
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            swap_request.cancel()
+        self.publish.assert_not_called()
+        self.assertTrue(callbacks)
+
+    def test_stream_tickets_are_single_use(self):
+        response = self.client_for(self.alice).post(reverse('api:notification_ticket'))
+        self.assertEqual(response.status_code, 201)
+        ticket = response.json()['ticket']
+        self.assertEqual(async_to_sync(auser_for_stream_ticket)(ticket), self.alice)
+        with self.assertRaises(AuthenticationFailed):
+            async_to_sync(auser_for_stream_ticket)(ticket)
+
+        # Neither kind of token is accepted in place of the other
+        access_token = generate_tokens(self.alice)['access_token']
+        with self.assertRaises(AuthenticationFailed):
+            async_to_sync(auser_for_stream_ticket)(access_token)
+        profile = APIClient()
+        profile.credentials(HTTP_AUTHORIZATION=f'Bearer {generate_stream_ticket(self.alice)}')
+        self.assertEqual(profile.get(reverse('api:profile')).status_code, 403)
+
+        # Access tokens are no longer taken from the query string
+        request = RequestFactory().get(reverse('api:notification_stream'), {'token': access_token})
+        self.assertEqual(async_to_sync(notification_stream)(request).status_code, 401)
+
+
+class BulkSwapRequestTests(APITestCase):
+
+    # Auth, lock, pending check, insert, status update, parties lookup, savepoint
+    BULK_QUERY_BUDGET = 9
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.client = self.client_for(self.alice)
+        self.url = reverse('api:bulk_create_swap_requests')
+
+    def post(self, pairs):
+        return self.client.post(self.url, {'requests': [
+            {'my_slot_id': mine, 'their_slot_id': theirs} for mine, theirs in pairs
+        ]}, format='json')
+
+    def test_one_slot_against_many_in_constant_queries(self):
+        mine = self.make_events(self.alice, 1)[0]
+        theirs = self.make_events(self.bob, 20, offset_hours=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.assertMaxQueries(
+                self.BULK_QUERY_BUDGET, lambda: self.post([(mine.id, event.id) for event in theirs])
+            )
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (20, 0))
+        self.assertEqual(body['results'][3]['swap_request']['receiver_event'], theirs[3].id)
+        self.assertEqual(
+            Event.objects.filter(status=Event.StatusChoices.SWAP_PENDING).count(), 21
+        )
+        outgoing = self.client.get(reverse('api:outgoing_swap_requests')).json()
+        self.assertEqual(len(outgoing), 20)
+
+    def test_per_item_errors(self):
+        mine = self.make_events(self.alice, 2)
+        theirs = self.make_events(self.bob, 1, offset_hours=1)[0]
+        busy = self.make_events(self.bob, 1, status=Event.StatusChoices.BUSY, offset_hours=10)[0]
+        response = self.post([
+            (mine[0].id, theirs.id),
+            (mine[0].id, theirs.id),
+            (mine[1].id, busy.id),
+            (theirs.id, mine[1].id),
+            (mine[1].id, mine[0].id),
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(item['status'], item.get('error')) for item in response.json()['results']],
+            [
+                ('created', None),
+                ('error', 'A swap request already exists for these events'),
+                ('error', 'Target event is not available for swapping'),
+                ('error', 'Your event is not marked as swappable or does not exist'),
+                ('error', 'Cannot swap with your own events'),
+            ]
+        )
+        self.assertEqual(SwapRequest.objects.count(), 1)
+
+    def test_nothing_created(self):
+        response = self.post([(12345, 67890)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['failed'], 1)
+
+    def test_batch_limit(self):
+        with self.settings(SWAP_REQUEST_BULK_LIMIT=2):
+            response = self.post([(1, 2)] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('requests', response.json())
+
+
+class EventVersionTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.client = self.client_for(self.alice)
+        self.event = self.make_events(self.alice, 1, status=Event.StatusChoices.BUSY)[0]
+        self.url = reverse('api:event_detail', args=[self.event.id])
+
+    def test_update_writes_only_changed_fields(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(self.url, {'status': 'SWAPPABLE', 'version': 0}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 1)
+        update = next(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE'))
+        self.assertIn('"api_event"."version" = 0', update)
+        self.assertNotIn('"title"', update)
+
+    def test_stale_version_is_a_conflict(self):
+        self.client.patch(self.url, {'title': 'Renamed', 'version': 0}, format='json')
+        response = self.client.patch(self.url, {'status': 'SWAPPABLE', 'version': 0}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.title, self.event.status), ('Renamed', Event.StatusChoices.BUSY))
+
+    def test_compare_and_set_detects_concurrent_write(self):
+        first = Event.objects.get(id=self.event.id)
+        second = Event.objects.get(id=self.event.id)
+        first.compare_and_set(status=Event.StatusChoices.SWAPPABLE)
+        with self.assertRaises(SwapConflict):
+            second.compare_and_set(status=Event.StatusChoices.BUSY)
+
+    def test_swap_request_conflict_returns_409(self):
+        mine = self.make_events(self.alice, 1, offset_hours=5)[0]
+        theirs = self.make_events(self.bob, 1, offset_hours=6)[0]
+        compare_and_set = Event.compare_and_set
+
+        def concurrent_write(event, **changes):
+            # Someone else flips the slot between our read and our write
+            Event.objects.filter(id=event.id).update(version=F('version') + 1)
+            return compare_and_set(event, **changes)
+
+        with mock.patch.object(Event, 'compare_and_set', concurrent_write):
+            response = self.client.post(reverse('api:create_swap_request'), {
+                'my_slot_id': mine.id, 'their_slot_id': theirs.id
+            }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(SwapRequest.objects.exists())
+
+
+class ConcurrentAcceptTests(TransactionTestCase):
+    """Many threads racing accepts over a shared pool of events"""
+
+    USERS = 16
+    THREADS = 12
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        start = timezone.now() + timedelta(days=1)
+        self.users = [
+            User.objects.create_user(
+                email=f'racer{i}@example.com', username=f'racer{i}',
+                first_name='Racer', last_name=str(i), password='SecurePassword123!'
+            )
+            for i in range(self.USERS)
+        ]
+        # Every user has one slot at the same time, so any set of swaps is
+        # overlap-free and only lock handling decides the outcome
+        self.events = Event.objects.bulk_create([
+            Event(
+                title=f'Slot {i}', owner=user, status=Event.StatusChoices.SWAP_PENDING,
+                start_time=start, end_time=start + timedelta(hours=1)
+            )
+            for i, user in enumerate(self.users)
+        ])
+        self.requests = SwapRequest.objects.bulk_create([
+            SwapRequest(
+                requester=self.users[i], receiver=self.users[j],
+                requester_event=self.events[i], receiver_event=self.events[j]
+            )
+            for i in range(self.USERS) for j in range(self.USERS) if i != j
+        ])
+
+    def race(self, action):
+        barrier = threading.Barrier(self.THREADS)
+        ids = [swap_request.id for swap_request in self.requests]
+        random.Random(7).shuffle(ids)
+        chunks = [ids[i::self.THREADS] for i in range(self.THREADS)]
+
+        def worker(chunk):
+            outcomes = []
+            try:
+                barrier.wait()
+                for request_id in chunk:
+                    try:
+                        getattr(SwapRequest.objects.get(id=request_id), action)()
+                        outcomes.append('ok')
+                    except SwapConflict:
+                        outcomes.append('conflict')
+            finally:
+                connection.close()
+            return outcomes
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            # Any deadlock or unexpected error propagates out of result()
+            return [outcome for future in [pool.submit(worker, chunk) for chunk in chunks]
+                    for outcome in future.result()]
+
+    def test_racing_accepts_swap_each_event_once(self):
+        outcomes = self.race('accept')
+
+        accepted = list(SwapRequest.objects.filter(status=SwapRequest.StatusChoices.ACCEPTED))
+        self.assertEqual(outcomes.count('ok'), len(accepted))
+        involved = [event_id for r in accepted for event_id in (r.requester_event_id, r.receiver_event_id)]
+        self.assertEqual(len(involved), len(set(involved)), 'an event was swapped twice')
+
+        owners = dict(Event.objects.values_list('id', 'owner_id'))
+        for r in accepted:
+            self.assertEqual(owners[r.requester_event_id], r.receiver_id)
+            self.assertEqual(owners[r.receiver_event_id], r.requester_id)
+        self.assertEqual(sorted(owners.values()), sorted(user.id for user in self.users))
+        self.assertFalse(SwapRequest.objects.filter(
+            status=SwapRequest.StatusChoices.PENDING,
+            requester_event_id__in=involved
+        ).exists())
+
+    def test_racing_cancels_respond_once(self):
+        outcomes = self.race('cancel')
+        self.assertEqual(outcomes.count('ok'), len(self.requests))
+        self.assertFalse(Event.objects.exclude(status=Event.StatusChoices.SWAPPABLE).exists())
+
+
+ICS_SAMPLE = b"""BEGIN:VCALENDAR\r
+VERSION:2.0\r
+BEGIN:VEVENT\r
+SUMMARY:Team\r
+  sync\\, weekly\r
+DTSTART;TZID=Europe/Paris:20300101T090000\r
+DURATION:PT30M\r
+BEGIN:VALARM\r
+DESCRIPTION:Reminder\r
+END:VALARM\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+SUMMARY:Open slot\r
+DTSTART:20300102T100000Z\r
+DTEND:20300102T110000Z\r
+STATUS:TENTATIVE\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+SUMMARY:Broken\r
+DTSTART:2030-01-03\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+
+
+class CalendarParserTests(SimpleTestCase):
+
+    def test_ics(self):
+        rows = list(parse_ics(ICS_SAMPLE.splitlines(keepends=True)))
+        self.assertEqual([row for row, _ in rows], [1, 2, 3])
+        first = rows[0][1]
+        self.assertEqual(first['title'], 'Team sync, weekly')
+        self.assertIsNone(first['description'])
+        self.assertEqual(first['start_time'].isoformat(), '2030-01-01T09:00:00+01:00')
+        self.assertEqual(first['end_time'] - first['start_time'], timedelta(minutes=30))
+        self.assertEqual(rows[1][1]['status'], Event.StatusChoices.SWAPPABLE)
+        self.assertIsInstance(rows[2][1], ValueError)
+
+    def test_jsonl(self):
+        rows = dict(parse_jsonl([
+            b'{"title": "A", "start_time": "2030-01-01T10:00:00Z", "end_time": "2030-01-01T11:00:00Z"}\n',
+            b'\n',
+            b'{"title": "B", "start_time": "2030-01-01T12:00:00Z", "end_time": "2030-01-01T11:00:00Z"}\n',
+            b'not json\n',
+        ]))
+        self.assertEqual(set(rows), {1, 3, 4})
+        self.assertEqual(rows[1]['title'], 'A')
+        self.assertEqual(str(rows[3]), 'End time must be after start time')
+        self.assertTrue(str(rows[4]).startswith('Invalid JSON'))
+
+
+class CalendarImportTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.client = self.client_for(self.alice)
+        self.url = reverse('api:import_calendar')
+
+    def jsonl(self, *events):
+        return b''.join(
+            json.dumps({'title': title, 'start_time': start.isoformat(), 'end_time': end.isoformat()}).encode() + b'\n'
+            for title, start, end in events
+        )
+
+    def test_ics_import(self):
+        response = self.client.post(self.url, ICS_SAMPLE, content_type='text/calendar')
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (2, 1))
+        self.assertEqual([row['status'] for row in body['rows']], ['created', 'created', 'error'])
+        self.assertEqual(Event.objects.filter(owner=self.alice).count(), 2)
+
+    def test_overlaps_within_batch_and_with_existing(self):
+        existing = self.make_events(self.alice, 1, status=Event.StatusChoices.BUSY)[0]
+        start = existing.start_time
+        hour = timedelta(hours=1)
+        upload = self.jsonl(
+            ('Clashes with existing', start + hour / 2, start + 2 * hour),
+            ('Free', start + 3 * hour, start + 4 * hour),
+            ('Clashes with row 2', start + 3.5 * hour, start + 5 * hour),
+            ('Ends as existing starts', start - hour, start),
+        )
+        response = self.assertMaxQueries(
+            13, lambda: self.client.post(self.url, upload, content_type='application/x-ndjson')
+        )
+        rows = response.json()['rows']
+        self.assertEqual(rows[0]['error'], f'Overlaps existing event {existing.id}')
+        self.assertEqual(rows[1]['status'], 'created')
+        self.assertEqual(rows[2]['error'], 'Overlaps row 2')
+        self.assertEqual(rows[3]['status'], 'created')
+
+    def test_large_import_uses_chunked_inserts(self):
+        start = timezone.now() + timedelta(days=1)
+        upload = self.jsonl(*(
+            (f'Event {i}', start + timedelta(hours=i), start + timedelta(hours=i, minutes=30))
+            for i in range(5000)
+        ))
+        with self.settings(EVENT_IMPORT_CHUNK_SIZE=1000):
+            response = self.assertMaxQueries(
+                17, lambda: self.client.post(self.url, upload, content_type='application/x-ndjson')
+            )
+        self.assertEqual(response.json()['created'], 5000)
+
+    def test_row_limit_and_media_type(self):
+        with self.settings(EVENT_IMPORT_MAX_ROWS=1):
+            response = self.client.post(self.url, ICS_SAMPLE, content_type='text/calendar')
+        self.assertEqual(response.status_code, 413)
+        response = self.client.post(self.url, ICS_SAMPLE, content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+
+
+class EventWindowTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        # One-hour events every two hours, starting a day from now
+        self.mine = self.make_events(self.alice, 10, status=Event.StatusChoices.BUSY)
+        self.theirs = self.make_events(self.bob, 10)
+        self.client = self.client_for(self.alice)
+
+    def window(self, events, first, last):
+        """Query string covering events[first] through events[last]"""
+        return '?' + urlencode({
+            'start': (events[first].start_time + timedelta(minutes=30)).isoformat(),
+            'end': (events[last].end_time - timedelta(minutes=30)).isoformat(),
+        })
+
+    def test_event_list(self):
+        response = self.client.get(reverse('api:event_list_create') + self.window(self.mine, 2, 4))
+        self.assertEqual([event['id'] for event in response.json()], [event.id for event in self.mine[2:5]])
+
+    def test_marketplace_cached_and_paginated(self):
+        url = reverse('api:swappable_slots') + self.window(self.theirs, 5, 7)
+        expected = [event.id for event in self.theirs[5:8]]
+        self.assertEqual([slot['id'] for slot in self.client.get(url).json()], expected)
+        page = self.client.get(url + '&page_size=2').json()
+        self.assertEqual([slot['id'] for slot in page['results']], expected[:2])
+        self.assertEqual([slot['id'] for slot in self.client.get(page['next']).json()['results']], expected[2:])
+
+    def test_open_ended_window(self):
+        start = self.theirs[8].start_time.isoformat()
+        response = self.client.get(reverse('api:swappable_slots'), {'start': start})
+        self.assertEqual(len(response.json()), 2)
+
+    def test_invalid_window(self):
+        response = self.client.get(reverse('api:swappable_slots'), {'end': 'soon'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('end', response.json())
+
+
+class SearchTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.client = self.client_for(self.alice)
+        self.start = timezone.now() + timedelta(days=1)
+
+    def event(self, owner, hours, title, description=None, status=Event.StatusChoices.SWAPPABLE):
+        return Event.objects.create(
+            title=title, description=description, owner=owner, status=status,
+            start_time=self.start + timedelta(hours=hours), end_time=self.start + timedelta(hours=hours + 1)
+        )
+
+    def ids(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [item['id'] for item in (body['results'] if 'results' in body else body)]
+
+    def test_marketplace_search(self):
+        standup = self.event(self.bob, 0, 'Team standup', 'Daily planning meetings')
+        review = self.event(self.bob, 2, 'Design review')
+        self.event(self.bob, 4, 'Dentist', 'Cleaning')
+        self.event(self.bob, 6, 'Lunch', status=Event.StatusChoices.BUSY)
+        url = reverse('api:swappable_slots')
+
+        # Stemmed words of the description, then a typo in the title
+        self.assertEqual(self.ids(url, q='meeting'), [standup.id])
+        self.assertEqual(self.ids(url, q='reviw'), [review.id])
+        self.assertEqual(self.ids(url, q='team OR design'), [standup.id, review.id])
+        self.assertEqual(self.ids(url, q='lunch'), [])
+        # Combined with the window and with pagination
+        self.assertEqual(self.ids(url, q='team OR design', start=(self.start + timedelta(hours=1)).isoformat()),
+                         [review.id])
+        self.assertEqual(self.ids(url, q='team OR design', page_size=1), [standup.id])
+        # Without ?q= the cached feed is unchanged
+        self.assertEqual(len(self.ids(url)), 3)
+
+    def test_event_list_search_and_status(self):
+        offered = self.event(self.alice, 0, 'Team standup')
+        busy = self.event(self.alice, 2, 'Team retro', status=Event.StatusChoices.BUSY)
+        url = reverse('api:event_list_create')
+        self.assertEqual(self.ids(url, q='team'), [offered.id, busy.id])
+        self.assertEqual(self.ids(url, q='team', status='BUSY'), [busy.id])
+        self.assertEqual(self.ids(url, status='SWAPPABLE'), [offered.id])
+
+    def test_invalid_queries(self):
+        self.assertEqual(self.client.get(reverse('api:swappable_slots'), {'q': 'x' * 1000}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api:event_list_create'), {'status': 'DONE'}).status_code, 400)
+
+
+class CalendarExportTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.client = self.client_for(self.alice)
+        self.events = self.make_events(self.alice, 5, status=Event.StatusChoices.BUSY)
+        self.make_events(self.make_user('bob'), 3)
+        self.url = reverse('api:export_calendar')
+
+    def export(self, query=''):
+        response = self.client.get(self.url + query)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_window(self):
+        # Events are an hour long, two hours apart: this window touches events 1 and 2
+        start = self.events[1].start_time + timedelta(minutes=30)
+        end = self.events[2].start_time + timedelta(minutes=1)
+        query = '?' + urlencode({'format': 'ndjson', 'start': start.isoformat(), 'end': end.isoformat()})
+        response, body = self.export(query)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.events[1].id, self.events[2].id])
+
+    def test_ics_round_trips_through_import(self):
+        response, body = self.export()
+        self.assertIn('attachment; filename="calendar.ics"', response['Content-Disposition'])
+        rows = list(parse_ics(body.splitlines(keepends=True)))
+        self.assertEqual([data['title'] for _, data in rows], [event.title for event in self.events])
+        self.assertEqual(rows[0][1]['start_time'], self.events[0].start_time.replace(microsecond=0))
+
+    def test_invalid_window(self):
+        response = self.client.get(self.url, {'format': 'ndjson', 'start': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {'start': '2030-01-02', 'end': '2030-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RecurrenceTests(SimpleTestCase):
+
+    # A Wednesday
+    START = datetime(2030, 1, 2, 9, tzinfo=dt_timezone.utc)
+    HOUR = timedelta(hours=1)
+
+    def schedule(self, rule, start=START, duration=HOUR):
+        return Schedule(RecurrenceRule.parse(rule), start, duration)
+
+    def test_parse_normalizes(self):
+        self.assertEqual(
+            str(RecurrenceRule.parse('RRULE:freq=weekly;byday=WE,MO,WE;interval=1;until=20300131')),
+            'FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20300131T235959Z'
+        )
+        for rule in ('FREQ=MONTHLY', 'FREQ=DAILY;BYDAY=MO', 'FREQ=DAILY;COUNT=0', 'FREQ=DAILY;BYHOUR=9',
+                     'FREQ=DAILY;COUNT=2;UNTIL=20300101', 'FREQ=WEEKLY;WKST=SU', 'FREQ=DAILY;INTERVAL=x'):
+            with self.subTest(rule=rule), self.assertRaises(RuleError):
+                RecurrenceRule.parse(rule)
+
+    def test_weekly_by_day_skips_days_before_start(self):
+        schedule = self.schedule('FREQ=WEEKLY;BYDAY=MO,WE;COUNT=4')
+        starts = [start for start, _ in schedule.between(None, None)]
+        self.assertEqual([start.day for start in starts], [2, 7, 9, 14])
+        self.assertEqual(schedule.last_end, starts[-1] + self.HOUR)
+        self.assertEqual(schedule.min_gap, timedelta(days=2))
+        self.assertEqual(schedule.find(starts[2]), 2)
+        self.assertIsNone(schedule.find(starts[2] + self.HOUR))
+        self.assertIsNone(schedule.find(starts[-1] + timedelta(days=7)))
+
+    def test_window_far_from_start(self):
+        schedule = self.schedule('FREQ=DAILY;INTERVAL=3')
+        window = datetime(2040, 6, 1, tzinfo=dt_timezone.utc)
+        occurrences = list(schedule.between(window, window + timedelta(days=7)))
+        self.assertEqual(len(occurrences), 2)
+        self.assertTrue(all((start - self.START) % timedelta(days=3) == timedelta(0) for start, _ in occurrences))
+        self.assertIsNone(schedule.last_end)
+
+    def test_until_is_inclusive(self):
+        self.assertEqual(self.schedule('FREQ=DAILY;UNTIL=20300105T090000Z').count, 4)
+
+    def test_first_clash(self):
+        weekly = self.schedule('FREQ=WEEKLY;BYDAY=MO,WE')
+        # Every third day at 09:30 from Thursday first meets a Monday or Wednesday on the 9th
+        clash = first_clash(weekly, self.schedule('FREQ=DAILY;INTERVAL=3', self.START + timedelta(days=1, minutes=30)))
+        self.assertEqual(clash[0][0].day, 9)
+        # Back to back is fine
+        self.assertIsNone(first_clash(weekly, self.schedule('FREQ=DAILY', self.START + self.HOUR)))
+        # The daily series ends before it would reach a Monday
+        self.assertIsNone(first_clash(
+            weekly, self.schedule('FREQ=DAILY;INTERVAL=2;COUNT=2', self.START + timedelta(days=1))
+        ))
+
+
+class EventSeriesTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.client = self.client_for(self.alice)
+        # Mondays at 09:00 UTC, starting in two to three weeks
+        today = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0)
+        self.monday = today + timedelta(days=14 + 7 - today.weekday())
+
+    def create_series(self, client=None, **data):
+        data = {
+            'title': 'Standup', 'start_time': self.monday.isoformat(),
+            'end_time': (self.monday + timedelta(hours=1)).isoformat(), 'rrule': 'FREQ=WEEKLY', **data
+        }
+        return (client or self.client).post(reverse('api:series_list_create'), data, format='json')
+
+    def occurrence_url(self, series_id, start):
+        return reverse('api:series_occurrence', args=[series_id, start.isoformat()])
+
+    def listed(self, weeks=4):
+        response = self.client.get(reverse('api:event_list_create'), {
+            'start': self.monday.isoformat(), 'end': (self.monday + timedelta(weeks=weeks)).isoformat()
+        })
+        return [(event['id'], event['start_time']) for event in response.json()]
+
+    def test_occurrences_expand_within_the_window_only(self):
+        series = self.create_series().json()
+        self.assertIsNone(series['ends_at'])
+        self.assertEqual(EventSeries.objects.count(), 1)
+        self.assertEqual(Event.objects.count(), 0)
+
+        listed = self.listed()
+        self.assertEqual(len(listed), 4)
+        self.assertTrue(all(event_id is None for event_id, _ in listed))
+        self.assertEqual(self.client.get(reverse('api:event_list_create')).json(), [])
+
+    def test_series_and_events_must_not_overlap(self):
+        event = Event.objects.create(
+            title='Dentist', owner=self.alice,
+            start_time=self.monday + timedelta(weeks=10, minutes=30),
+            end_time=self.monday + timedelta(weeks=10, hours=2)
+        )
+        response = self.create_series()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'event {event.id}', response.json()['non_field_errors'][0])
+
+        series = self.create_series(rrule='FREQ=WEEKLY;COUNT=10').json()
+        self.assertEqual(self.create_series(start_time=self.monday.isoformat(), rrule='FREQ=DAILY').status_code, 400)
+        response = self.client.post(reverse('api:event_list_create'), {
+            'title': 'Clash', 'start_time': (self.monday + timedelta(weeks=3)).isoformat(),
+            'end_time': (self.monday + timedelta(weeks=3, hours=1)).isoformat()
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # Free once that occurrence is deleted
+        week3 = self.monday + timedelta(weeks=3)
+        self.assertEqual(self.client.delete(self.occurrence_url(series['id'], week3)).status_code, 204)
+        self.assertEqual(self.client.delete(self.occurrence_url(series['id'], week3)).status_code, 404)
+        response = self.client.post(reverse('api:event_list_create'), {
+            'title': 'Moved in', 'start_time': week3.isoformat(),
+            'end_time': (week3 + timedelta(hours=1)).isoformat()
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([event_id is None for event_id, _ in self.listed()], [True, True, True, False])
+
+    def test_editing_an_occurrence_materializes_it(self):
+        series = self.create_series().json()
+        week2 = self.monday + timedelta(weeks=2)
+        url = self.occurrence_url(series['id'], week2)
+        self.assertIsNone(self.client.get(url).json()['id'])
+
+        response = self.client.patch(url, {'status': 'SWAPPABLE'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        event = Event.objects.get()
+        self.assertEqual((event.series_id, event.recurrence_id, event.status), (series['id'], week2, 'SWAPPABLE'))
+        self.assertEqual(self.client.get(url).json()['id'], event.id)
+        listed = self.listed()
+        self.assertEqual(len(listed), 4)
+        self.assertEqual(listed[2][0], event.id)
+
+        # The materialized occurrence is an ordinary slot on the marketplace
+        bob_client = self.client_for(self.bob)
+        self.assertEqual([slot['id'] for slot in bob_client.get(reverse('api:swappable_slots')).json()], [event.id])
+
+        # Moving it onto another occurrence of the same series is an overlap
+        response = self.client.patch(url, {'start_time': (week2 + timedelta(weeks=1)).isoformat(),
+                                           'end_time': (week2 + timedelta(weeks=1, hours=1)).isoformat()}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # Deleting the event deletes the occurrence rather than bringing it back
+        self.client.delete(reverse('api:event_detail', args=[event.id]))
+        self.assertEqual(len(self.listed()), 3)
+
+    def test_swaps_respect_recurring_events(self):
+        series = self.create_series(client=self.client_for(self.bob)).json()
+        week1 = self.monday + timedelta(weeks=1)
+        mine = Event.objects.create(
+            title='Clashes with bob', owner=self.alice, status=Event.StatusChoices.SWAPPABLE,
+            start_time=week1, end_time=week1 + timedelta(minutes=30)
+        )
+        bob_client = self.client_for(self.bob)
+        bob_client.patch(self.occurrence_url(series['id'], self.monday), {'status': 'SWAPPABLE'}, format='json')
+        theirs = Event.objects.get(series_id=series['id'])
+        response = self.client.post(reverse('api:create_swap_request'), {
+            'my_slot_id': mine.id, 'their_slot_id': theirs.id
+        }, format='json')
+        swap_request_id = response.json()['swap_request']['id']
+
+        response = bob_client.post(reverse('api:respond_to_swap_request', args=[swap_request_id]), {'accept': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.owner_id, self.bob.id)
+
+    def test_import_reports_recurring_clashes(self):
+        series = self.create_series().json()
+        row = {'title': 'Clash', 'start_time': self.monday.isoformat(),
+               'end_time': (self.monday + timedelta(minutes=30)).isoformat()}
+        response = self.client.post(
+            reverse('api:import_calendar'), json.dumps(row), content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.json()['rows'][0]['error'], f"Overlaps recurring event {series['id']}")
+
+    def test_invalid_series(self):
+        response = self.create_series(rrule='FREQ=YEARLY')
+        self.assertIn('rrule', response.json())
+        response = self.create_series(rrule='FREQ=DAILY', end_time=(self.monday + timedelta(hours=25)).isoformat())
+        self.assertEqual(response.status_code, 400)
+
+
+class FreeBusyBitsTests(SimpleTestCase):
+
+    DAY = datetime(2030, 1, 1, tzinfo=dt_timezone.utc)
+
+    def test_partly_covered_buckets_are_busy(self):
+        bits = day_bits(self.DAY + timedelta(hours=9, minutes=10), self.DAY + timedelta(hours=10), self.DAY.date())
+        self.assertEqual(runs(bits, 96), [(36, 40)])
+
+    def test_events_are_clipped_to_the_day(self):
+        bits = day_bits(self.DAY - timedelta(hours=1), self.DAY + timedelta(minutes=30), self.DAY.date())
+        self.assertEqual(bits, 0b11)
+        self.assertEqual(day_bits(self.DAY - timedelta(hours=1), self.DAY, self.DAY.date()), 0)
+
+    def test_runs_with_minimum_length(self):
+        self.assertEqual(runs(0b1100111, 8, min_length=2), [(0, 3), (5, 7)])
+        self.assertEqual(runs(0, 8), [])
+
+
+class FreeBusyTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = self.make_user('alice')
+        self.bob = self.make_user('bob')
+        self.client = self.client_for(self.alice)
+        self.day = (timezone.now() + timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def at(self, hours, days=0):
+        return self.day + timedelta(days=days, hours=hours)
+
+    def stored(self, user):
+        return {
+            row.day: runs(from_bytes(row.bits), 96)
+            for row in FreeBusyDay.objects.filter(owner=user)
+        }
+
+    def periods(self, periods):
+        """Periods as (start, end) hours of self.day"""
+        hour = timedelta(hours=1)
+        return [
+            tuple((parse_datetime(period[key]) - self.day) / hour for key in ('start', 'end'))
+            for period in periods
+        ]
+
+    def query(self, users, **params):
+        return self.client.get(reverse('api:freebusy'), {
+            'users': ','.join(str(user.id) for user in users),
+            'start': self.at(8).isoformat(), 'end': self.at(18).isoformat(), **params
+        })
+
+    def test_bitmaps_follow_event_writes(self):
+        response = self.client.post(reverse('api:event_list_create'), {
+            'title': 'Meeting', 'start_time': self.at(9).isoformat(), 'end_time': self.at(10.5).isoformat()
+        }, format='json')
+        url = reverse('api:event_detail', args=[response.json()['id']])
+        self.assertEqual(self.stored(self.alice), {self.day.date(): [(36, 42)]})
+
+        self.client.patch(url, {'start_time': self.at(9, days=1).isoformat(),
+                                'end_time': self.at(10, days=1).isoformat()}, format='json')
+        self.assertEqual(self.stored(self.alice), {self.day.date() + timedelta(days=1): [(36, 40)]})
+
+        self.client.delete(url)
+        self.assertEqual(self.stored(self.alice), {})
+
+    def test_swaps_move_busy_time(self):
+        mine = Event.objects.create(title='Mine', owner=self.alice, status=Event.StatusChoices.SWAPPABLE,
+                                    start_time=self.at(9), end_time=self.at(10))
+        theirs = Event.objects.create(title='Theirs', owner=self.bob, status=Event.StatusChoices.SWAPPABLE,
+                                      start_time=self.at(14), end_time=self.at(15))
+        swap_request = SwapRequest.objects.create(
+            requester=self.alice, receiver=self.bob, requester_event=mine, receiver_event=theirs
+        )
+        swap_request.accept()
+        self.assertEqual(self.stored(self.alice), {self.day.date(): [(56, 60)]})
+        self.assertEqual(self.stored(self.bob), {self.day.date(): [(36, 40)]})
+
+    def test_common_free_time(self):
+        Event.objects.create(title='A', owner=self.alice, start_time=self.at(9), end_time=self.at(11))
+        Event.objects.create(title='B', owner=self.bob, start_time=self.at(12), end_time=self.at(13.25))
+        EventSeries.objects.create(
+            title='Daily', owner=self.bob, start_time=self.at(15, days=-3), end_time=self.at(16, days=-3),
+            rrule='FREQ=DAILY'
+        )
+        body = self.query([self.alice, self.bob], duration=60).json()
+        self.assertEqual(self.periods(body['busy'][str(self.bob.id)]), [(12, 13.25), (15, 16)])
+        self.assertEqual(self.periods(body['free']), [(8, 9), (11, 12), (13.25, 15), (16, 18)])
+
+    def test_rebuild_matches_incremental(self):
+        self.make_events(self.alice, 30, status=Event.StatusChoices.BUSY)
+        incremental = self.stored(self.alice)
+        rebuild(batch_size=3)
+        self.assertEqual(self.stored(self.alice), incremental)
+
+    def test_invalid_queries(self):
+        self.assertEqual(self.query([self.alice], end='').status_code, 400)
+        self.assertEqual(self.client.get(reverse('api:freebusy'), {
+            'users': '999999', 'start': self.at(8).isoformat(), 'end': self.at(9).isoformat()
+        }).status_code, 400)
+        with self.settings(FREEBUSY_MAX_DAYS=1):
+            self.assertEqual(self.query([self.alice], end=self.at(0, days=3).isoformat()).status_code, 400)
+
+
+class FindSwapCyclesTests(SimpleTestCase):
+
+    def test_three_way_cycle(self):
+        self.assertEqual(find_swap_cycles({1: [2], 2: [3], 3: [1]}), [[1, 2, 3]])
+
+    def test_top_choices_trade_first(self):
+        # 1 prefers 2 over 3; 1<->2 trade, leaving 3 with nobody
+        cycles = find_swap_cycles({1: [2, 3], 2: [1], 3: [1]})
+        self.assertEqual(cycles, [[1, 2]])
+
+    def test_exhausted_nodes_release_their_pointers(self):
+        # 4 accepts nothing, so 1 falls back to its second choice
+        cycles = find_swap_cycles({1: [4, 2], 2: [1], 4: []})
+        self.assertEqual(cycles, [[1, 2]])
+
+    def test_max_length(self):
+        preferences = {1: [2], 2: [3], 3: [4, 1], 4: [1]}
+        self.assertEqual(find_swap_cycles(preferences), [[1, 2, 3, 4]])
+        self.assertEqual(find_swap_cycles(preferences, max_length=3), [[1, 2, 3]])
+
+    def test_cycles_are_disjoint_and_wanted(self):
+        rng = random.Random(1)
+        preferences = {node: rng.sample(range(500), 4) for node in range(500)}
+        seen = set()
+        for cycle in find_swap_cycles(preferences):
+            for i, node in enumerate(cycle):
+                self.assertNotIn(node, seen)
+                self.assertIn(cycle[(i + 1) % len(cycle)], preferences[node])
+                seen.add(node)
+
+
+class SwapMatchingTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.users = [self.make_user(name) for name in ('alice', 'bob', 'carol')]
+        # Same hours, so each user holds exactly one slot after any exchange
+        self.events = [self.make_events(user, 1)[0] for user in self.users]
+
+    def prefer(self, offered, *wanted):
+        SwapPreference.objects.bulk_create([
+            SwapPreference(offered_event=offered, wanted_event=event, rank=rank)
+            for rank, event in enumerate(wanted)
+        ])
+
+    def test_three_way_swap(self):
+        a, b, c = self.events
+        self.prefer(a, b)
+        self.prefer(b, c)
+        self.prefer(c, a)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = run_matching()
+        self.assertEqual(result['cycles_committed'], 1)
+
+        owners = dict(Event.objects.values_list('id', 'owner_id'))
+        alice, bob, carol = self.users
+        self.assertEqual(owners[b.id], alice.id)
+        self.assertEqual(owners[c.id], bob.id)
+        self.assertEqual(owners[a.id], carol.id)
+        self.assertFalse(Event.objects.exclude(status=Event.StatusChoices.BUSY).exists())
+        self.assertFalse(SwapPreference.objects.exists())
+        self.assertEqual(
+            SwapRequest.objects.filter(status=SwapRequest.StatusChoices.ACCEPTED, cycle__size=3).count(), 3
+        )
+
+    def test_stale_cycle_is_skipped(self):
+        a, b, c = self.events
+        self.prefer(a, b)
+        self.prefer(b, c)
+        self.prefer(c, a)
+        graph = load_preferences()
+        # Carol takes her slot off the market after the graph was loaded
+        Event.objects.filter(id=c.id).update(status=Event.StatusChoices.BUSY)
+        with mock.patch('api.matching.load_preferences', return_value=graph):
+            result = run_matching()
+        self.assertEqual((result['cycles_found'], result['cycles_committed']), (1, 0))
+        self.assertEqual(Event.objects.get(id=a.id).owner_id, self.users[0].id)
+
+    def test_other_integrity_errors_propagate(self):
+        a, b, c = self.events
+        self.prefer(a, b)
+        self.prefer(b, c)
+        self.prefer(c, a)
+        with mock.patch('api.matching.transfer_events', side_effect=IntegrityError('duplicate key')):
+            with self.assertRaises(IntegrityError):
+                run_matching()
+
+    def test_preferences_endpoint(self):
+        a, b, c = self.events
+        client = self.client_for(self.users[0])
+        url = reverse('api:event_swap_preferences', args=[a.id])
+        response = client.put(url, {'wanted_event_ids': [c.id, b.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get(url).json(), {'wanted_event_ids': [c.id, b.id]})
+
+        response = client.put(url, {'wanted_event_ids': [a.id]}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -1,26 +1,49 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 app_name = 'api'
 
 urlpatterns = [
     # Health check
-    path('health/', views.health_check, name='health_check'),
+    path('health/', read_views.health_check, name='health_check'),
     
     # Authentication endpoints
     path('auth/register/', views.register, name='register'),
     path('auth/login/', views.login, name='login'),
-    path('auth/profile/', views.profile, name='profile'),
+    path('auth/refresh/', views.refresh, name='refresh'),
+    path('auth/profile/', read_views.profile, name='profile'),
     
     # Event/Calendar endpoints
     path('events/', views.EventListCreateView.as_view(), name='event_list_create'),
+    path('events/import/', views.import_calendar, name='import_calendar'),
+    path('events/export/', views.export_calendar, name='export_calendar'),
     path('events/<int:pk>/', views.EventDetailView.as_view(), name='event_detail'),
-    path('swappable-slots/', views.swappable_slots, name='swappable_slots'),
+    path('events/<int:pk>/preferences/', views.event_swap_preferences, name='event_swap_preferences'),
+    path('events/<int:pk>/suggestions/', views.event_suggestions, name='event_suggestions'),
+    path('series/', views.EventSeriesListCreateView.as_view(), name='series_list_create'),
+    path('series/<int:pk>/', views.EventSeriesDetailView.as_view(), name='series_detail'),
+    path(
+        'series/<int:pk>/occurrences/<str:recurrence_id>/',
+        views.series_occurrence, name='series_occurrence'
+    ),
+    path('swappable-slots/', read_views.swappable_slots, name='swappable_slots'),
+    path('freebusy/', views.freebusy, name='freebusy'),
     
     # Swap request endpoints
     path('swap-request/', views.create_swap_request, name='create_swap_request'),
+    path('swap-requests/bulk/', views.bulk_create_swap_requests, name='bulk_create_swap_requests'),
     path('swap-response/<int:request_id>/', views.respond_to_swap_request, name='respond_to_swap_request'),
-    path('swap-requests/incoming/', views.incoming_swap_requests, name='incoming_swap_requests'),
-    path('swap-requests/outgoing/', views.outgoing_swap_requests, name='outgoing_swap_requests'),
+    path('swap-requests/incoming/', read_views.incoming_swap_requests, name='incoming_swap_requests'),
+    path('swap-requests/outgoing/', read_views.outgoing_swap_requests, name='outgoing_swap_requests'),
     path('swap-requests/<int:request_id>/cancel/', views.cancel_swap_request, name='cancel_swap_request'),
+    
+    # Real-time notifications (ASGI only)
+    path('notifications/ticket/', views.notification_ticket, name='notification_ticket'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
 ]
\ No newline at end of file
@@ -0,0 +1,57 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+KEY = 'version:{scope}'
+
+
+def get_cache():
+    return caches[settings.VERSION_CACHE]
+
+
+def get_versions(*scopes):
+    """
+    Current version of each scope, e.g. 'marketplace' or 'events:42'.
+
+    Versions are timestamps rather than counters, so a version key lost to
+    eviction can never make an old cached payload or ETag current again.
+    """
+    cache = get_cache()
+    keys = [KEY.format(scope=scope) for scope in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+        versions.append(version)
+    return versions
+
+
+def get_version(scope):
+    return get_versions(scope)[0]
+
+
+def bump_versions(*scopes):
+    get_cache().set_many({KEY.format(scope=scope): time.time_ns() for scope in scopes}, timeout=None)
+
+
+def bump_on_commit(*scopes):
+    """Bump the scopes once the current transaction commits"""
+    transaction.on_commit(lambda: bump_versions(*scopes))
+
+
+def weak_etag(*parts):
+    """Weak ETag over version numbers and request parameters"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def time_bucket():
+    """Coarse clock so responses with time-derived fields (is_past) still expire"""
+    return int(time.time() // settings.ETAG_TIME_BUCKET)
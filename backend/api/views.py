@@ -1,32 +1,106 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from datetime import datetime, time, timedelta
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse
-from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db import IntegrityError, transaction
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import F, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
+from django.views.decorators.http import condition
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, renderer_classes
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
-from .models import Event, SwapRequest
+from .models import (
+    SEARCH_CONFIG, Event, EventSeries, SwapConflict, SwapPreference, SwapRequest, is_overlap_violation,
+    lock_calendars
+)
 from .serializers import (
-    UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer,
-    EventSerializer, SwappableEventSerializer, SwapRequestSerializer,
-    CreateSwapRequestSerializer, SwapResponseSerializer
+    UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer, TokenRefreshSerializer,
+    EventSerializer, EventSeriesSerializer, SwappableEventSerializer, SwapRequestSerializer,
+    CreateSwapRequestSerializer, BulkCreateSwapRequestSerializer, SwapPreferencesSerializer,
+    SwapResponseSerializer
+)
+from .calendar_io import (
+    ICS_CONTENT_TYPES, JSONL_CONTENT_TYPES, ImportConflict, ImportTooLarge,
+    EXPORT_FIELDS, import_events, parse_ics, parse_jsonl, write_ics, write_ndjson
+)
+from .authentication import (
+    auser_for_access_token, auser_for_stream_ticket, generate_stream_ticket, generate_tokens, refresh_tokens,
+    user_cache
 )
-from .authentication import generate_tokens
+from .freebusy import availability
+from .hashers import password_hash_pool
+from .marketplace import blocking_intervals, exclude_clashing, marketplace_slots_for, without_clashes
+from .notifications import broker, format_sse, notify_on_commit
+from .pagination import MarketplacePagination, SwapRequestPagination
+from .renderers import ICalendarRenderer, NDJSONRenderer
+from .suggestions import suggestions_for
+from .versioning import bump_on_commit, get_versions, time_bucket, weak_etag
 
 User = get_user_model()
 
 
+def user_etag(request, *scopes):
+    """
+    Weak ETag from version counters, so If-None-Match can be answered
+    with a 304 before any query or serialization runs
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    versions = get_versions(*(scope.format(user=user.id) for scope in scopes))
+    return weak_etag(user.id, versions, time_bucket(), request.GET.urlencode())
+
+
+def events_etag(request, *args, **kwargs):
+    return user_etag(request, 'events:{user}')
+
+
+def marketplace_etag(request, *args, **kwargs):
+    if wants_compatible(request):
+        # The filtered feed also depends on the caller's own calendar
+        return user_etag(request, 'marketplace', 'events:{user}')
+    return user_etag(request, 'marketplace')
+
+
+def wants_compatible(request):
+    """?compatible=true: only slots that fit the caller's calendar"""
+    return request.GET.get('compatible', '').lower() in ('1', 'true', 'yes')
+
+
+def suggestions_etag(request, *args, **kwargs):
+    return user_etag(request, 'marketplace', 'events:{user}')
+
+
+def swap_requests_etag(request, *args, **kwargs):
+    return user_etag(request, 'swaps:{user}', 'users')
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check(request):
     """Health check endpoint"""
-    return JsonResponse({
+    return JsonResponse(health_data())
+
+
+def health_data():
+    return {
         'status': 'healthy',
-        'timestamp': timezone.now().isoformat()
-    })
+        'timestamp': timezone.now().isoformat(),
+        'user_cache': user_cache.stats(),
+        'password_hash_pool': password_hash_pool.stats()
+    }
 
 
 @api_view(['POST'])
@@ -65,6 +139,26 @@ def login(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def refresh(request):
+    """Exchange a refresh token for new tokens without re-checking the password"""
+    serializer = TokenRefreshSerializer(data=request.data)
+    if serializer.is_valid():
+        try:
+            tokens = refresh_tokens(serializer.validated_data['refresh_token'])
+        except AuthenticationFailed as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        return Response({
+            'message': 'Token refreshed successfully',
+            'tokens': tokens
+        }, status=status.HTTP_200_OK)
+    
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['GET', 'PUT'])
 @permission_classes([IsAuthenticated])
 def profile(request):
@@ -87,7 +181,43 @@ class EventListCreateView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Event.objects.filter(owner=self.request.user)
+        queryset = Event.objects.filter(owner=self.request.user).select_related('owner')
+        if self.request.method == 'GET':
+            # ?start=/?end= limit the list to events overlapping that window,
+            # ?status= to one status and ?q= to events matching a search
+            queryset = in_window(queryset, *self.window)
+            if self.status_filter:
+                queryset = queryset.filter(status=self.status_filter)
+            queryset = search(queryset, parse_search(self.request.query_params))
+        return queryset
+
+    @cached_property
+    def status_filter(self):
+        value = self.request.query_params.get('status')
+        if value and value not in Event.StatusChoices.values:
+            raise ValidationError({'status': f"Must be one of {', '.join(Event.StatusChoices.values)}"})
+        return value or None
+
+    @cached_property
+    def window(self):
+        return parse_window(self.request.query_params)
+
+    @method_decorator(condition(etag_func=events_etag))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        events = self.get_queryset()
+        start, end = self.window
+        expand = self.status_filter in (None, Event.StatusChoices.BUSY) and not parse_search(request.query_params)
+        if start and end and expand:
+            # Recurring events are expanded for bounded windows only; their
+            # occurrences are BUSY and are not searched
+            events = sorted(
+                [*events, *EventSeries.expand(request.user, start, end)],
+                key=lambda event: event.start_time
+            )
+        return Response(self.get_serializer(events, many=True).data)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -99,7 +229,7 @@ class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Event.objects.filter(owner=self.request.user)
+        return Event.objects.filter(owner=self.request.user).select_related('owner')
 
     def update(self, request, *args, **kwargs):
         """Override update to handle status changes"""
@@ -115,27 +245,358 @@ class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        return super().update(request, *args, **kwargs)
+        try:
+            return super().update(request, *args, **kwargs)
+        except SwapConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
 
     def partial_update(self, request, *args, **kwargs):
         """Handle PATCH requests for partial updates"""
         kwargs['partial'] = True
         return self.update(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Before the row lock; the free/busy refresh needs it anyway
+            lock_calendars([instance.owner_id])
+            # A deleted occurrence must not reappear from its series
+            if instance.series_id:
+                instance.series.add_exdate(instance.recurrence_id)
+            instance.delete()
+
+
+class EventSeriesListCreateView(generics.ListCreateAPIView):
+    """List and create the user's recurring events"""
+    serializer_class = EventSeriesSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return EventSeries.objects.filter(owner=self.request.user).select_related('owner')
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+
+class EventSeriesDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Retrieve, update, and delete the user's recurring events"""
+    serializer_class = EventSeriesSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return EventSeries.objects.filter(owner=self.request.user).select_related('owner')
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            lock_calendars([instance.owner_id])
+            # Edited occurrences still in the calendar go with the series;
+            # ones swapped to someone else stay theirs
+            instance.overrides.filter(owner=instance.owner).delete()
+            instance.delete()
+
+
+@api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def series_occurrence(request, pk, recurrence_id):
+    """
+    One occurrence of a recurring event, addressed by its original start.
+    Editing it, e.g. marking it swappable, first turns it into an Event row;
+    deleting it adds it to the series' exdates.
+    """
+    moment = parse_datetime(recurrence_id)
+    if moment is None or timezone.is_naive(moment):
+        return Response(
+            {'error': 'The occurrence must be given as an ISO datetime with a UTC offset'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    not_found = Response({'error': 'Occurrence not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'GET':
+        series = EventSeries.objects.filter(id=pk, owner=request.user).select_related('owner').first()
+        if series is None:
+            return not_found
+        event = series.overrides.filter(recurrence_id=moment, owner=request.user).select_related('owner').first()
+        if event is None and series.has_occurrence(moment):
+            event = series.occurrence_event(moment)
+        return Response(EventSerializer(event).data) if event else not_found
+
+    try:
+        with transaction.atomic():
+            # Read the series under the lock, so exdates are current
+            lock_calendars([request.user.id])
+            series = EventSeries.objects.filter(id=pk, owner=request.user).select_related('owner').first()
+            if series is None:
+                return not_found
+
+            if request.method == 'DELETE':
+                event = series.overrides.filter(recurrence_id=moment).first()
+                if (event is None and not series.has_occurrence(moment)) or (event and event.owner_id != request.user.id):
+                    return not_found
+                series.add_exdate(moment)
+                if event:
+                    event.delete()
+                return Response(status=status.HTTP_204_NO_CONTENT)
+
+            event = series.materialize(moment)
+            if event is None:
+                return not_found
+            serializer = EventSerializer(event, data=request.data, partial=request.method == 'PATCH')
+            serializer.is_valid(raise_exception=True)
+            if serializer.validated_data.get('status') == Event.StatusChoices.SWAPPABLE and event.is_past():
+                transaction.set_rollback(True)
+                return Response(
+                    {'error': 'Cannot mark past events as swappable'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            serializer.save()
+    except SwapConflict as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response(serializer.data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_calendar(request):
+    """
+    Bulk-import events from an iCalendar (text/calendar) or JSON-lines
+    (application/x-ndjson) request body, parsed as it streams in
+    """
+    content_type = request.content_type.split(';')[0].strip().lower()
+    if content_type in ICS_CONTENT_TYPES:
+        parse = parse_ics
+    elif content_type in JSONL_CONTENT_TYPES:
+        parse = parse_jsonl
+    else:
+        return Response(
+            {'error': 'Upload text/calendar or application/x-ndjson'},
+            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+
+    stream = request.stream
+    if stream is None:
+        return Response({'error': 'The upload is empty'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        report = import_events(request.user, parse(stream))
+    except ImportTooLarge as e:
+        return Response({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except ImportConflict as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+    return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST)
+
+
+def parse_window(params):
+    """
+    Optional ?start=/?end= window (ISO datetimes or dates) as aware datetimes.
+    Raises ValidationError for unparseable or inverted bounds.
+    """
+    window = []
+    for name in ('start', 'end'):
+        value = params.get(name)
+        parsed = None
+        if value:
+            try:
+                parsed = parse_datetime(value)
+                if parsed is None and (day := parse_date(value)) is not None:
+                    parsed = datetime.combine(day, time.min)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                raise ValidationError({name: f'Invalid date or datetime: {value}'})
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+        window.append(parsed)
+    start, end = window
+    if start and end and end <= start:
+        raise ValidationError({'end': 'End must be after start'})
+    return start, end
+
+
+def in_window(queryset, start, end):
+    """
+    Events overlapping [start, end); either bound may be open. Written as a
+    range overlap (&&) so it can use the GiST indexes on Event.span().
+    """
+    if not (start or end):
+        return queryset
+    return queryset.annotate(span=Event.span()).filter(span__overlap=DateTimeTZRange(start, end, '[)'))
+
+
+def parse_search(params):
+    """Optional ?q= search text; raises ValidationError if it is too long"""
+    text = params.get('q', '').strip()
+    if len(text) > settings.SEARCH_MAX_LENGTH:
+        raise ValidationError({'q': f'At most {settings.SEARCH_MAX_LENGTH} characters'})
+    return text
+
+
+def search(queryset, text):
+    """
+    Events whose title or description match text as a web search query
+    ("quoted phrases", or, -word), or whose title has a word similar to
+    text, which forgives typos. Marketplace slots are matched through the
+    GIN indexes on Event.search_document() and on title's trigrams.
+    """
+    if not text:
+        return queryset
+    return queryset.annotate(document=Event.search_document()).filter(
+        Q(document=SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch'))
+        | Q(title__trigram_word_similar=text)
+    )
+
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def freebusy(request):
+    """
+    Busy periods of each of ?users= (ids, default: you) and the periods of
+    at least ?duration= minutes when all of them are free, within the
+    required ?start=/?end= window. Periods are whole 15-minute buckets.
+    """
+    start, end = parse_window(request.query_params)
+    if not (start and end):
+        raise ValidationError({'window': 'Both start and end are required'})
+    if end - start > timedelta(days=settings.FREEBUSY_MAX_DAYS):
+        raise ValidationError({'window': f'At most {settings.FREEBUSY_MAX_DAYS} days can be queried at once'})
+
+    try:
+        user_ids = sorted({int(user_id) for user_id in request.query_params.get('users', '').split(',') if user_id})
+        duration = timedelta(minutes=int(request.query_params.get('duration', 15)))
+    except ValueError:
+        raise ValidationError({'detail': 'users must be comma-separated ids and duration a number of minutes'})
+    user_ids = user_ids or [request.user.id]
+    if len(user_ids) > settings.FREEBUSY_MAX_USERS:
+        raise ValidationError({'users': f'At most {settings.FREEBUSY_MAX_USERS} users can be queried at once'})
+    missing = set(user_ids) - set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    if missing:
+        raise ValidationError({'users': f"Unknown users: {', '.join(map(str, sorted(missing)))}"})
+
+    return Response(availability(user_ids, start, end, min_free=duration))
+
+
+@api_view(['GET'])
+@renderer_classes([ICalendarRenderer, NDJSONRenderer])
+@permission_classes([IsAuthenticated])
+def export_calendar(request):
+    """
+    Stream the user's events as iCalendar (default, or ?format=ics) or
+    JSON lines (?format=ndjson), optionally limited to a ?start=/?end= window
+    """
+    start, end = parse_window(request.query_params)
+    events = in_window(Event.objects.filter(owner=request.user), start, end).order_by(
+        'start_time', 'id'
+    ).values(*EXPORT_FIELDS)
+    # Server-side cursor: memory stays flat however many events the user has
+    rows = events.iterator(chunk_size=settings.EVENT_EXPORT_CHUNK_SIZE)
+
+    renderer = request.accepted_renderer
+    chunks = write_ndjson(rows) if renderer.format == 'ndjson' else write_ics(rows)
+    if isinstance(request._request, ASGIRequest):
+        # Django 4.2 buffers sync iterators under ASGI; hand it an async one
+        chunks = iterate_in_thread(chunks)
+    response = StreamingHttpResponse(chunks, content_type=f'{renderer.media_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="calendar.{renderer.format}"'
+    return response
+
+
+async def iterate_in_thread(iterator):
+    """Async view of a blocking iterator, advanced on the request's sync thread"""
+    done = object()
+    while (item := await sync_to_async(next)(iterator, done)) is not done:
+        yield item
+
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def event_swap_preferences(request, pk):
+    """Get or replace the ranked events the user would accept for one of their events"""
+    try:
+        event = Event.objects.get(id=pk, owner=request.user)
+    except Event.DoesNotExist:
+        return Response({'error': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'PUT':
+        if event.status != Event.StatusChoices.SWAPPABLE:
+            return Response(
+                {'error': 'Only swappable events can be offered'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = SwapPreferencesSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'wanted_event_ids': serializer.save(event)})
+
+    wanted = SwapPreference.objects.filter(offered_event=event).values_list('wanted_event_id', flat=True)
+    return Response({'wanted_event_ids': list(wanted)})
+
+
+@condition(etag_func=suggestions_etag)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def event_suggestions(request, pk):
+    """The ?limit= marketplace slots best to swap one of the user's swappable events for, best first"""
+    try:
+        event = Event.objects.get(id=pk, owner=request.user)
+    except Event.DoesNotExist:
+        return Response({'error': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
+    if event.status != Event.StatusChoices.SWAPPABLE:
+        return Response(
+            {'error': 'Only swappable events can be offered'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        limit = int(request.query_params.get('limit', settings.SUGGESTIONS_LIMIT))
+    except ValueError:
+        raise ValidationError({'limit': 'Must be a number'})
+    limit = max(1, min(limit, settings.SUGGESTIONS_MAX_LIMIT))
+    return Response(suggestions_for(event, limit))
+
+
+@condition(etag_func=marketplace_etag)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def swappable_slots(request):
     """Get all swappable slots from other users"""
+    return Response(swappable_slots_data(request))
+
+
+def swappable_slots_data(request):
+    """Marketplace payload, shared by the sync and async views"""
     # Get all swappable events that are not owned by the current user
     # and are not in the past
+    start, end = parse_window(request.GET)
+    text = parse_search(request.GET)
     swappable_events = Event.objects.filter(
         status=Event.StatusChoices.SWAPPABLE,
         end_time__gt=timezone.now()
-    ).exclude(owner=request.user).order_by('start_time')
+    ).exclude(owner=request.user).select_related('owner').order_by('start_time', 'id')
+    swappable_events = search(in_window(swappable_events, start, end), text)
+    compatible = wants_compatible(request)
+    if compatible:
+        swappable_events = exclude_clashing(swappable_events, request.user)
     
-    serializer = SwappableEventSerializer(swappable_events, many=True)
-    return Response(serializer.data)
+    # Cursor pagination is opt-in via ?cursor= or ?page_size=
+    paginator = MarketplacePagination()
+    page = paginator.paginate_queryset(swappable_events, request)
+    if page is not None or text:
+        # Search results come from the indexes rather than the cache
+        events = page if page is not None else list(swappable_events)
+        if compatible and events:
+            # Recurring occurrences are not rows the anti-join can see; the
+            # next cursor still follows the last row read, so at worst a
+            # page comes back short
+            blocking = blocking_intervals(
+                request.user, events[0].start_time, max(event.end_time for event in events), recurring_only=True
+            )
+            events = without_clashes(
+                events, blocking, span=lambda event: (event.start_time.timestamp(), event.end_time.timestamp())
+            )
+        data = SwappableEventSerializer(events, many=True).data
+        return paginator.get_paginated_data(data) if page is not None else data
+    
+    # The full list comes from the shared marketplace cache
+    return marketplace_slots_for(request.user, start, end, compatible=compatible)
 
 
 @api_view(['POST'])
@@ -151,17 +612,17 @@ def create_swap_request(request):
         
         try:
             with transaction.atomic():
-                # Get the events
-                my_event = Event.objects.select_for_update().get(
-                    id=my_slot_id,
-                    owner=request.user,
-                    status=Event.StatusChoices.SWAPPABLE
-                )
-                
-                their_event = Event.objects.select_for_update().get(
-                    id=their_slot_id,
+                # Plain reads: both status flips below are compare-and-set
+                # updates, so a concurrent change surfaces as a 409 instead of
+                # every request for a hot slot queueing on its row lock
+                events = Event.objects.filter(
+                    id__in=[my_slot_id, their_slot_id],
                     status=Event.StatusChoices.SWAPPABLE
-                )
+                ).select_related('owner').in_bulk()
+                my_event = events.get(my_slot_id)
+                their_event = events.get(their_slot_id)
+                if my_event is None or my_event.owner_id != request.user.id or their_event is None:
+                    raise Event.DoesNotExist
                 
                 # Don't allow swapping with own events
                 if their_event.owner == request.user:
@@ -183,6 +644,10 @@ def create_swap_request(request):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
+                # Update both events to SWAP_PENDING status, in id order
+                for event in sorted((my_event, their_event), key=lambda event: event.id):
+                    event.compare_and_set(status=Event.StatusChoices.SWAP_PENDING)
+                
                 # Create the swap request
                 swap_request = SwapRequest.objects.create(
                     requester=request.user,
@@ -192,11 +657,10 @@ def create_swap_request(request):
                     message=message
                 )
                 
-                # Update both events to SWAP_PENDING status
-                my_event.status = Event.StatusChoices.SWAP_PENDING
-                their_event.status = Event.StatusChoices.SWAP_PENDING
-                my_event.save()
-                their_event.save()
+                notify_on_commit(
+                    [swap_request.requester_id, swap_request.receiver_id], 'swap_request.created',
+                    swap_request_id=swap_request.id, status=swap_request.status
+                )
                 
                 serializer = SwapRequestSerializer(swap_request)
                 return Response({
@@ -204,6 +668,9 @@ def create_swap_request(request):
                     'swap_request': serializer.data
                 }, status=status.HTTP_201_CREATED)
                 
+        except SwapConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+                
         except Event.DoesNotExist as e:
             if my_slot_id and not Event.objects.filter(id=my_slot_id, owner=request.user).exists():
                 return Response(
@@ -225,6 +692,103 @@ def create_swap_request(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_create_swap_requests(request):
+    """
+    Create many swap requests in one call, e.g. one slot offered against
+    several candidates. Each item is checked against the state of the events
+    before the batch and gets its own result; valid items are created even
+    if others fail.
+    """
+    serializer = BulkCreateSwapRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    items = serializer.validated_data['requests']
+
+    with transaction.atomic():
+        # Lock every involved event in one query, in id order, so concurrent
+        # batches and single requests always acquire row locks in the same order
+        event_ids = {item[key] for item in items for key in ('my_slot_id', 'their_slot_id')}
+        events = {
+            event.id: event
+            for event in Event.objects.select_for_update(of=('self',), no_key=True).filter(
+                id__in=event_ids
+            ).select_related('owner').order_by('id')
+        }
+        pending = set(SwapRequest.objects.filter(
+            requester_event_id__in=[item['my_slot_id'] for item in items],
+            receiver_event_id__in=[item['their_slot_id'] for item in items],
+            status=SwapRequest.StatusChoices.PENDING
+        ).values_list('requester_event_id', 'receiver_event_id'))
+
+        results = []
+        to_create = []
+        for index, item in enumerate(items):
+            my_event = events.get(item['my_slot_id'])
+            their_event = events.get(item['their_slot_id'])
+            pair = (item['my_slot_id'], item['their_slot_id'])
+            error = None
+            if my_event is None or my_event.owner_id != request.user.id or not my_event.is_swappable():
+                error = 'Your event is not marked as swappable or does not exist'
+            elif their_event is None or not their_event.is_swappable():
+                error = 'Target event is not available for swapping'
+            elif their_event.owner_id == request.user.id:
+                error = 'Cannot swap with your own events'
+            elif pair in pending:
+                error = 'A swap request already exists for these events'
+
+            if error:
+                results.append({'index': index, 'status': 'error', 'error': error})
+                continue
+            pending.add(pair)
+            results.append({'index': index, 'status': 'created'})
+            to_create.append(SwapRequest(
+                requester=request.user,
+                receiver=their_event.owner,
+                requester_event=my_event,
+                receiver_event=their_event,
+                message=item.get('message', '')
+            ))
+
+        created = SwapRequest.objects.bulk_create(to_create)
+        if created:
+            touched = {swap_request.requester_event_id for swap_request in created} | \
+                {swap_request.receiver_event_id for swap_request in created}
+            Event.objects.filter(id__in=touched).update(
+                status=Event.StatusChoices.SWAP_PENDING,
+                updated_at=timezone.now(),
+                version=F('version') + 1
+            )
+            for event_id in touched:
+                events[event_id].status = Event.StatusChoices.SWAP_PENDING
+                events[event_id].version += 1
+
+            for swap_request in created:
+                notify_on_commit(
+                    [swap_request.requester_id, swap_request.receiver_id], 'swap_request.created',
+                    swap_request_id=swap_request.id, status=swap_request.status
+                )
+            # bulk_create and update() bypass the signals that keep caches fresh
+            parties = SwapRequest.parties_for_events(touched)
+            bump_on_commit(
+                'marketplace',
+                *(f'events:{owner_id}' for owner_id in {events[event_id].owner_id for event_id in touched}),
+                *(f'swaps:{user_id}' for user_id in parties)
+            )
+
+    created_data = iter(SwapRequestSerializer(created, many=True).data)
+    for result in results:
+        if result['status'] == 'created':
+            result['swap_request'] = next(created_data)
+
+    return Response({
+        'created': len(created),
+        'failed': len(results) - len(created),
+        'results': results
+    }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def respond_to_swap_request(request, request_id):
@@ -258,6 +822,17 @@ def respond_to_swap_request(request, request_id):
                 'swap_request': SwapRequestSerializer(swap_request).data
             }, status=status.HTTP_200_OK)
             
+        except IntegrityError as e:
+            if not is_overlap_violation(e):
+                raise
+            return Response(
+                {'error': 'This swap would overlap an existing event'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        except SwapConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+            
         except Exception as e:
             return Response(
                 {'error': str(e)},
@@ -267,28 +842,57 @@ def respond_to_swap_request(request, request_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def list_swap_requests(request, **filters):
+    """Serialize the user's swap requests with optional status filter and pagination"""
+    data, status_code = swap_requests_data(request, **filters)
+    return Response(data, status=status_code)
+
+
+def swap_requests_data(request, **filters):
+    """Swap request list payload and status code"""
+    swap_requests, error = swap_requests_queryset(request, **filters)
+    if error:
+        return error, status.HTTP_400_BAD_REQUEST
+    
+    paginator = SwapRequestPagination()
+    page = paginator.paginate_queryset(swap_requests, request)
+    if page is not None:
+        serializer = SwapRequestSerializer(page, many=True)
+        return paginator.get_paginated_data(serializer.data), status.HTTP_200_OK
+    
+    serializer = SwapRequestSerializer(swap_requests, many=True)
+    return serializer.data, status.HTTP_200_OK
+
+
+def swap_requests_queryset(request, **filters):
+    """The user's swap requests with the ?status= filter applied, and an error body if it is invalid"""
+    swap_requests = SwapRequest.objects.filter(**filters).select_related(
+        'requester', 'receiver',
+        'requester_event__owner', 'receiver_event__owner'
+    ).order_by('-created_at', '-id')
+    
+    status_filter = request.GET.get('status')
+    if status_filter:
+        if status_filter not in SwapRequest.StatusChoices.values:
+            return None, {'error': f'Invalid status: {status_filter}'}
+        swap_requests = swap_requests.filter(status=status_filter)
+    return swap_requests, None
+
+
+@condition(etag_func=swap_requests_etag)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def incoming_swap_requests(request):
     """Get incoming swap requests for the user"""
-    swap_requests = SwapRequest.objects.filter(
-        receiver=request.user
-    ).order_by('-created_at')
-    
-    serializer = SwapRequestSerializer(swap_requests, many=True)
-    return Response(serializer.data)
+    return list_swap_requests(request, receiver=request.user)
 
 
+@condition(etag_func=swap_requests_etag)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def outgoing_swap_requests(request):
     """Get outgoing swap requests from the user"""
-    swap_requests = SwapRequest.objects.filter(
-        requester=request.user
-    ).order_by('-created_at')
-    
-    serializer = SwapRequestSerializer(swap_requests, many=True)
-    return Response(serializer.data)
+    return list_swap_requests(request, requester=request.user)
 
 
 @api_view(['POST'])
@@ -314,8 +918,60 @@ def cancel_swap_request(request, request_id):
             'swap_request': SwapRequestSerializer(swap_request).data
         }, status=status.HTTP_200_OK)
         
+    except SwapConflict as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        
     except Exception as e:
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def notification_ticket(request):
+    """Issue a short-lived, single-use ?ticket= for the notification stream"""
+    return Response({
+        'ticket': generate_stream_ticket(request.user),
+        'expires_in': settings.NOTIFICATION_TICKET_LIFETIME
+    }, status=status.HTTP_201_CREATED)
+
+
+async def notification_stream(request):
+    """
+    Server-Sent Events stream of swap request notifications for the user.
+
+    EventSource cannot set headers, so browsers pass a ticket from
+    notification_ticket as ?ticket= rather than their access token, which
+    would end up in proxy and access logs; other clients may still send
+    the Authorization header. Needs the ASGI server; see swap_calendar/asgi.py.
+    """
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    ticket = request.GET.get('ticket')
+    if not ticket and not auth_header.startswith('Bearer '):
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+    try:
+        if ticket:
+            user = await auser_for_stream_ticket(ticket)
+        else:
+            user = await auser_for_access_token(auth_header.removeprefix('Bearer '))
+    except AuthenticationFailed as e:
+        return JsonResponse({'error': str(e.detail)}, status=401)
+
+    async def events():
+        async with broker.subscribe(user.id) as queue:
+            yield ': connected\n\n'
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATION_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Comment frames keep proxies from closing an idle stream
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(message)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -2,6 +2,9 @@
 ASGI config for swap_calendar project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+This is the production entry point (see Procfile): besides the regular API it
+serves the long-lived /api/notifications/stream/ Server-Sent Events
+connections, which a sync WSGI worker cannot hold open.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'api',
@@ -77,6 +78,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'swap_calendar.wsgi.application'
+ASGI_APPLICATION = 'swap_calendar.asgi.application'
 
 
 # Database
@@ -89,17 +91,71 @@ database_config = dj_database_url.parse(
 
 # Ensure the engine is explicitly set
 database_config['ENGINE'] = 'django.db.backends.postgresql'
-database_config['CONN_MAX_AGE'] = 600
+# Under ASGI each request gets its own sync thread, so a persistent connection
+# would never be reused; connections are pooled by the -pooler endpoint instead
+database_config['CONN_MAX_AGE'] = config('CONN_MAX_AGE', default=0, cast=int)
 database_config['CONN_HEALTH_CHECKS'] = True
 
 DATABASES = {
     'default': database_config
 }
 
+# Cache
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) in production so
+# every worker sees the same entries.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='swap-calendar'),
+    }
+}
+
+# Shared serialized marketplace (api.marketplace), invalidated on writes
+MARKETPLACE_CACHE = config('MARKETPLACE_CACHE', default='default')
+MARKETPLACE_CACHE_TTL = config('MARKETPLACE_CACHE_TTL', default=300, cast=int)
+
+# Version counters behind cache invalidation and ETags (api.versioning)
+VERSION_CACHE = config('VERSION_CACHE', default='default')
+ETAG_TIME_BUCKET = config('ETAG_TIME_BUCKET', default=60, cast=int)
+
+# Swap notifications over Server-Sent Events (api.notifications). The local
+# broker only reaches streams held by the same process.
+NOTIFICATION_BROKER = config('NOTIFICATION_BROKER', default='api.notifications.LocalBroker')
+NOTIFICATION_KEEPALIVE = config('NOTIFICATION_KEEPALIVE', default=15, cast=int)
+# Seconds a POST /api/notifications/ticket/ ticket can be used to open the stream
+NOTIFICATION_TICKET_LIFETIME = config('NOTIFICATION_TICKET_LIFETIME', default=30, cast=int)
+
+# Async read endpoints (api.async_views), served under ASGI
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=True, cast=bool)
+
+# Longest ?q= search text for the marketplace and event list
+SEARCH_MAX_LENGTH = config('SEARCH_MAX_LENGTH', default=200, cast=int)
+
+# Ranked slots for GET /api/events/<id>/suggestions/ (api/suggestions.py)
+SUGGESTIONS_LIMIT = config('SUGGESTIONS_LIMIT', default=10, cast=int)
+SUGGESTIONS_MAX_LIMIT = config('SUGGESTIONS_MAX_LIMIT', default=100, cast=int)
+
+# Multi-party swap matching (api.matching): longest exchange cycle, 0 for no limit
+SWAP_MATCHING_MAX_CYCLE = config('SWAP_MATCHING_MAX_CYCLE', default=0, cast=int)
+
 # Custom User Model
 AUTH_USER_MODEL = 'api.User'
 
 
+# Password hashing
+# New hashes use scrypt; older PBKDF2 hashes keep working and are upgraded on
+# the next successful login. Hashing runs in a bounded per-process pool
+# (api.hashers.PasswordHashPool); logins beyond workers + queue get a 503.
+PASSWORD_HASHERS = [
+    'api.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', default=2 ** 14, cast=int)
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=2, cast=int)
+PASSWORD_HASH_QUEUE = config('PASSWORD_HASH_QUEUE', default=8, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -158,6 +214,23 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Pagination (keyset pagination for list endpoints, see api/pagination.py)
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=50, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=200, cast=int)
+
+# Largest batch accepted by POST /api/swap-requests/bulk/
+SWAP_REQUEST_BULK_LIMIT = config('SWAP_REQUEST_BULK_LIMIT', default=100, cast=int)
+
+# Calendar import (POST /api/events/import/, api/calendar_io.py)
+EVENT_IMPORT_MAX_ROWS = config('EVENT_IMPORT_MAX_ROWS', default=100000, cast=int)
+EVENT_IMPORT_CHUNK_SIZE = config('EVENT_IMPORT_CHUNK_SIZE', default=2000, cast=int)
+# Rows fetched per server-side cursor round-trip by GET /api/events/export/
+EVENT_EXPORT_CHUNK_SIZE = config('EVENT_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Largest GET /api/freebusy/ query (api/freebusy.py)
+FREEBUSY_MAX_USERS = config('FREEBUSY_MAX_USERS', default=50, cast=int)
+FREEBUSY_MAX_DAYS = config('FREEBUSY_MAX_DAYS', default=62, cast=int)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
@@ -172,4 +245,7 @@ CORS_ALLOW_CREDENTIALS = True
 JWT_SECRET_KEY = config('JWT_SECRET_KEY', default=SECRET_KEY)
 JWT_ALGORITHM = config('JWT_ALGORITHM', default='HS256')
 JWT_ACCESS_TOKEN_LIFETIME = config('JWT_ACCESS_TOKEN_LIFETIME', default=3600, cast=int)
-JWT_REFRESH_TOKEN_LIFETIME = config('JWT_REFRESH_TOKEN_LIFETIME', default=86400, cast=int)
\ No newline at end of file
+JWT_REFRESH_TOKEN_LIFETIME = config('JWT_REFRESH_TOKEN_LIFETIME', default=86400, cast=int)
+# Per-process cache of authenticated users (see api.authentication.UserCache)
+JWT_USER_CACHE_SIZE = config('JWT_USER_CACHE_SIZE', default=10000, cast=int)
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=60, cast=int)